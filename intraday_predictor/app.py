@@ -1,17 +1,47 @@
 """
 HTTP API for testing: trigger next-day predictions (same as 4 PM batch)
 and optionally send results by email.
+
+`python app.py` runs Flask's development server. For production use the
+create_app factory through wsgi.py (gunicorn -c gunicorn.conf.py wsgi:app,
+or waitress-serve wsgi:app).
 """
+import base64
+import binascii
+import io
+import json
 import logging
-from datetime import date
+import threading
+from datetime import date, datetime
+from typing import Any
 
-from flask import Flask, jsonify, request
+from flask import Blueprint, Flask, Response, jsonify, request, stream_with_context
 
-from database import init_db
-from email_notifier import send_analysis_email, send_prediction_email
+from config import NIFTY_200_TICKERS
+from daily_pipeline import group_by_profile, run_daily_pipeline
+from database import (
+    HISTORY_TABLES,
+    ROLLUP_SCOPE_ALL,
+    delete_profile,
+    enqueue_retrain,
+    get_model_param_history,
+    get_model_params_version,
+    get_performance_rollups,
+    get_profiles,
+    get_query_stats,
+    get_retrain_jobs,
+    get_skipped_tickers,
+    get_ticker_failures,
+    init_db,
+    iter_history,
+    iter_history_arrow,
+    save_profile,
+)
+from email_notifier import send_analysis_email
 from performance_analyzer import analyze_predictions
-from prediction_engine import generate_predictions
-from trading_days import next_trading_day
+from profiler import ProfilerBusy, RunProfiler
+from retrainer import process_retrain_queue
+from trading_calendar import session_closed, sessions
 
 logging.basicConfig(
     level=logging.INFO,
@@ -19,40 +49,77 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
+api = Blueprint("api", __name__)
+
+# Rows per page of /predictions, /model-metrics and /features (JSON mode)
+HISTORY_PAGE_SIZE = 500
+HISTORY_MAX_PAGE_SIZE = 5000
+
+_retrain_lock = threading.Lock()
+
+
+def _drain_retrain_queue():
+    try:
+        process_retrain_queue()
+    except Exception:
+        logger.exception("Retrain worker failed")
+    finally:
+        _retrain_lock.release()
 
 
-def _run_full_job():
-    """Same logic as the 4 PM batch: analyze today + predict tomorrow."""
-    today = date.today()
-    # Module 2: Analyze today's predictions vs actuals
-    analysis_results = analyze_predictions(today)
-    # Module 1: Generate predictions for next trading day
-    target_date = next_trading_day(today)
-    predictions = generate_predictions(target_date, prediction_date=today)
-    return today, analysis_results, target_date, predictions
+def _kick_retrain_worker():
+    """Drain the retrain queue in a background thread (at most one at a time)."""
+    if _retrain_lock.acquire(blocking=False):
+        threading.Thread(target=_drain_retrain_queue, name="retrain-worker", daemon=True).start()
 
 
-@app.route("/predict", methods=["GET", "POST"])
+@api.route("/predict", methods=["GET", "POST"])
 def predict():
     """
     Generate stock predictions for the next trading day (same as scheduled job).
-    Optionally send the result by email.
+    Optionally send the result by email. Shares the scheduled job's
+    checkpoints, so a repeat call the same day resumes or returns the stored
+    result instead of redoing the work.
 
     Query or JSON body:
       send_email: "true" | "false" (default false)
+      force: "true" to ignore today's checkpoints and the prediction cache
+             and redo every stage
+      profile: "true" to profile the run (see profiler.py); the response
+               gains a "profile" summary with the report directory. Combine
+               with force, or a resumed run profiles almost nothing.
+
+    Called before the market close, the result is built from partial bars
+    and marked "provisional": nothing is stored, checkpointed or emailed.
     """
     send_email = False
+    force = False
+    profile = False
     if request.method == "POST" and request.is_json:
         send_email = request.json.get("send_email", False)
+        force = request.json.get("force", False)
+        profile = request.json.get("profile", False)
     else:
         send_email = request.args.get("send_email", "false").lower() in ("true", "1", "yes")
+        force = request.args.get("force", "false").lower() in ("true", "1", "yes")
+        profile = request.args.get("profile", "false").lower() in ("true", "1", "yes")
 
+    prof = None
     try:
-        analysis_date, analysis_results, target_date, predictions = _run_full_job()
+        if profile:
+            prof = RunProfiler("predict")
+            with prof:
+                run = run_daily_pipeline(date.today(), send_emails=send_email, force=force)
+        else:
+            run = run_daily_pipeline(date.today(), send_emails=send_email, force=force)
+    except ProfilerBusy as e:
+        return jsonify({"error": str(e)}), 409
     except Exception as e:
         logger.exception("Job failed")
         return jsonify({"error": str(e)}), 500
+    _kick_retrain_worker()
+    analysis_date, analysis_results = run["run_date"], run["analysis_results"]
+    target_date, predictions = run["target_date"], run["predictions"]
 
     # Serializable payload (date and floats)
     payload = {
@@ -60,59 +127,78 @@ def predict():
         "target_date": target_date.isoformat(),
         "prediction_count": len(predictions),
         "analysis_count": len(analysis_results),
-        "predictions": [
-            {
-                "stock": p["stock"],
-                "predicted_entry": p["predicted_entry"],
-                "predicted_target": p["predicted_target"],
-                "predicted_sl": p["predicted_sl"],
-                "score": p.get("score"),
-                "atr": p.get("atr"),
-            }
-            for p in predictions
-        ],
+        "predictions": [_prediction_json(p) for p in predictions],
+        "profiles": {
+            name: [_prediction_json(p) for p in preds] for name, preds in run["profile_predictions"].items()
+        },
     }
 
-    if send_email:
-        send_analysis_email(analysis_results, analysis_date)
-        send_prediction_email(predictions, target_date)
-        payload["emails_sent"] = {"analysis": True, "prediction": True}
-    else:
-        payload["emails_sent"] = {"analysis": False, "prediction": False}
+    payload["resumed_stages"] = run["resumed"]
+    payload["emails_sent"] = run["emails_sent"]
+    payload["provisional"] = run["provisional"]
+    if prof is not None:
+        payload["profile"] = prof.summary
 
     return jsonify(payload)
 
 
-@app.route("/analyze", methods=["GET", "POST"])
+def _prediction_json(p: dict) -> dict:
+    return {
+        "stock": p["stock"],
+        "predicted_entry": p["predicted_entry"],
+        "predicted_target": p["predicted_target"],
+        "predicted_sl": p["predicted_sl"],
+        "score": p.get("score"),
+        "atr": p.get("atr"),
+        "strategy": p.get("strategy"),
+    }
+
+
+@api.route("/analyze", methods=["GET", "POST"])
 def analyze():
     """
     Analyze today's predictions vs actual outcomes and optionally send the report by email.
+    Only unresolved predictions are fetched and evaluated, so repeat calls are cheap.
 
     Query or JSON body:
       send_email: "true" | "false" (default false)
+      force: "true" to re-evaluate predictions that already have an outcome
+
+    Called before the market close, the outcomes are provisional: reported
+    but not saved, and model_metrics is left for the post-close run.
     """
     send_email = False
+    force = False
     if request.method == "POST" and request.is_json:
         send_email = request.json.get("send_email", False)
+        force = request.json.get("force", False)
     else:
         send_email = request.args.get("send_email", "false").lower() in ("true", "1", "yes")
+        force = request.args.get("force", "false").lower() in ("true", "1", "yes")
 
     try:
         today = date.today()
-        results = analyze_predictions(today)
+        results = analyze_predictions(today, force=force)
     except Exception as e:
         logger.exception("Analyze job failed")
         return jsonify({"error": str(e)}), 500
+    _kick_retrain_worker()
 
     if send_email:
-        send_analysis_email(results, today)
+        recipients = {p["name"]: p["recipients"] for p in get_profiles()}
+        for name, rows in group_by_profile(results).items():
+            send_analysis_email(rows, today, profile=name, recipients=recipients.get(name))
 
     payload = {
         "analysis_date": today.isoformat(),
+        # Before the close outcomes come from partial bars and are not saved
+        "provisional": not session_closed(today),
         "count": len(results),
         "results": [
             {
                 "stock": r["stock"],
+                "profile": r["profile"],
+                "strategy": r["strategy"],
                 "predicted_entry": r["predicted_entry"],
                 "actual_high": r["actual_high"],
                 "actual_low": r["actual_low"],
@@ -126,21 +212,340 @@ def analyze():
     return jsonify(payload)
 
 
-@app.route("/health", methods=["GET"])
+@api.route("/performance", methods=["GET"])
+def performance():
+    """
+    Precomputed rolling win rates (5/20/60 sessions), globally or for one stock.
+
+    Query:
+      stock: ticker such as "RELIANCE.NS" (default: whole book; "all" for every scope)
+    """
+    stock = request.args.get("stock")
+    if stock == "all":
+        rows = get_performance_rollups()
+    else:
+        rows = get_performance_rollups(stock or ROLLUP_SCOPE_ALL)
+    return jsonify(
+        {
+            "rollups": [
+                {
+                    "scope": r["scope"],
+                    "window_days": r["window_days"],
+                    "win_rate": r["win_rate"],
+                    "total": r["total"],
+                    "target_hit": r["target_hit"],
+                    "sl_hit": r["sl_hit"],
+                    "no_entry": r["no_entry"],
+                    "stagnant": r["stagnant"],
+                    "as_of": str(r["as_of"]) if r["as_of"] else None,
+                }
+                for r in rows
+            ]
+        }
+    )
+
+
+@api.route("/retrain", methods=["GET", "POST"])
+def retrain():
+    """
+    POST: queue a retrain and start the background worker; returns 202 at once.
+    GET: recent retrain jobs and their results.
+    """
+    if request.method == "POST":
+        job_id = enqueue_retrain("api")
+        _kick_retrain_worker()
+        return jsonify({"job_id": job_id, "status": "queued"}), 202
+    return jsonify({"jobs": [{k: (str(v) if k.endswith("_at") and v else v) for k, v in j.items()} for j in get_retrain_jobs()]})
+
+
+@api.route("/params", methods=["GET"])
+def params():
+    """Live model parameters with their version, plus recent versions."""
+    current = get_model_params_version()
+    history = get_model_param_history()
+    for v in history:
+        v["created_at"] = str(v["created_at"])
+    return jsonify({"version": current["version"] if current else None, "params": current["params"] if current else None, "history": history})
+
+
+@api.route("/profiles", methods=["GET", "POST"])
+def profiles():
+    """
+    GET: every profile (default first) with its overrides, merged params and
+    email recipients.
+    POST (JSON): create or replace a named profile, e.g.
+      {"name": "aggressive", "params": {"atr_multiplier": 1.2, "prediction_count": 8},
+       "recipients": ["desk@example.com"]}
+    """
+    if request.method == "POST":
+        body = request.get_json(silent=True) or {}
+        try:
+            profile = save_profile(body.get("name", ""), body.get("params") or {}, body.get("recipients"))
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        profile["updated_at"] = str(profile["updated_at"])
+        return jsonify(profile), 201
+    rows = get_profiles()
+    for p in rows:
+        p["updated_at"] = str(p["updated_at"]) if p["updated_at"] else None
+    return jsonify({"profiles": rows})
+
+
+@api.route("/profiles/<name>", methods=["DELETE"])
+def remove_profile(name: str):
+    """Delete a named profile (its stored predictions are kept)."""
+    if not delete_profile(name):
+        return jsonify({"error": f"no profile {name!r}"}), 404
+    return jsonify({"deleted": name})
+
+
+@api.route("/tickers/failures", methods=["GET"])
+def ticker_failures():
+    """Tickers failing to download: skipped (until their next probe) and every failure row."""
+    return jsonify({
+        "skipped": sorted(get_skipped_tickers(date.today())),
+        "failures": get_ticker_failures(),
+    })
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def _encode_cursor(row: dict, keys: tuple[str, str]) -> str:
+    date_col, tie_col = keys
+    return base64.urlsafe_b64encode(json.dumps([str(row[date_col])[:10], row[tie_col]]).encode()).decode()
+
+
+def _decode_cursor(cursor: str, keys: tuple[str, str]) -> tuple[str, Any]:
+    day, tie = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if keys[1] == "id" and not isinstance(tie, int):
+        raise ValueError("cursor id must be an integer")
+    return date.fromisoformat(day).isoformat(), tie
+
+
+def _require_msgpack():
+    try:
+        import msgpack
+    except ImportError as e:
+        raise RuntimeError("msgpack responses need msgpack (pip install msgpack)") from e
+    return msgpack
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write target for the Arrow stream writer; drain() hands back what was written since the last call."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._parts.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        out = b"".join(self._parts)
+        self._parts.clear()
+        return out
+
+
+def _arrow_stream(schema, batches):
+    import pyarrow as pa
+
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        yield sink.drain()  # the schema message, before the first query chunk is read
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()  # end-of-stream marker
+
+
+def _msgpack_stream(chunks):
+    msgpack = _require_msgpack()
+    for rows in chunks:
+        columns = {k: [_json_value(r[k]) for r in rows] for k in rows[0]}
+        yield msgpack.packb(columns, use_bin_type=True)
+
+
+# Response formats of the history endpoints: format= value -> media type.
+# Accept can ask for any of these media types instead.
+_HISTORY_FORMATS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "msgpack": "application/x-msgpack",
+}
+_HISTORY_ACCEPT = {**{mime: fmt for fmt, mime in _HISTORY_FORMATS.items()}, "application/msgpack": "msgpack"}
+
+
+def _history_response(table: str, filter_names: tuple[str, ...]):
+    """
+    Shared by /predictions, /model-metrics and /features: rows in (date,
+    tie-breaker) order, as one page of JSON with a next_cursor, or every
+    matching row streamed as NDJSON, an Arrow IPC stream (one record batch per
+    database chunk) or msgpack (one {column: values} map per chunk). Pick the
+    format with format= or the Accept header. Streams read the database in
+    chunks, so memory stays flat however many rows they return.
+    """
+    args = request.args
+    keys = HISTORY_TABLES[table]
+    try:
+        start = date.fromisoformat(args["from"]) if args.get("from") else None
+        end = date.fromisoformat(args["to"]) if args.get("to") else None
+        after = _decode_cursor(args["cursor"], keys) if args.get("cursor") else None
+        limit = int(args["limit"]) if args.get("limit") else None
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError) as e:
+        return jsonify({"error": f"bad query parameter: {e}"}), 400
+    if limit is not None and limit < 1:
+        return jsonify({"error": f"limit must be at least 1, got {limit}"}), 400
+    filters = {name: args[name] for name in filter_names if args.get(name)}
+
+    fmt = args.get("format") or _HISTORY_ACCEPT.get(request.accept_mimetypes.best_match(list(_HISTORY_ACCEPT)), "json")
+    if fmt not in _HISTORY_FORMATS:
+        return jsonify({"error": f"unknown format {fmt!r} (use {', '.join(_HISTORY_FORMATS)})"}), 400
+    try:
+        if fmt == "ndjson":
+            body = (
+                "".join(json.dumps({k: _json_value(v) for k, v in r.items()}) + "\n" for r in chunk)
+                for chunk in iter_history(table, start, end, after, filters, limit)
+            )
+        elif fmt == "arrow":
+            body = _arrow_stream(*iter_history_arrow(table, start, end, after, filters, limit))
+        elif fmt == "msgpack":
+            _require_msgpack()
+            body = _msgpack_stream(iter_history(table, start, end, after, filters, limit, chunk_size=10_000))
+    except RuntimeError as e:  # optional library missing
+        return jsonify({"error": str(e)}), 406
+    if fmt != "json":
+        return Response(stream_with_context(body), mimetype=_HISTORY_FORMATS[fmt])
+
+    limit = min(limit or HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE)
+    # One row past the page tells whether there is a next one
+    rows = [r for chunk in iter_history(table, start, end, after, filters, limit + 1) for r in chunk]
+    next_cursor = _encode_cursor(rows[limit - 1], keys) if len(rows) > limit else None
+    return jsonify({
+        "rows": [{k: _json_value(v) for k, v in r.items()} for r in rows[:limit]],
+        "next_cursor": next_cursor,
+    })
+
+
+@api.route("/predictions", methods=["GET"])
+def predictions_history():
+    """
+    Stored predictions with their outcomes, oldest first.
+
+    Query params: from, to (YYYY-MM-DD, target_date), stock, profile,
+    strategy, outcome; limit (page size, at least 1, default 500, max 5000;
+    the whole stream in the streaming formats); cursor (next_cursor of the
+    previous page); format=json|ndjson|arrow|msgpack (or the matching Accept
+    type).
+    """
+    return _history_response("predictions", ("stock", "profile", "strategy", "outcome"))
+
+
+@api.route("/model-metrics", methods=["GET"])
+def model_metrics_history():
+    """Daily model_metrics rows, oldest first. Same paging and formats as /predictions (from/to on eval_date)."""
+    return _history_response("model_metrics", ())
+
+
+@api.route("/features", methods=["GET"])
+def features_history():
+    """
+    Stored daily features, ordered by (session_date, stock). Same paging and
+    formats as /predictions (from/to on session_date; filter with stock).
+    """
+    return _history_response("features", ("stock",))
+
+
+def _prometheus_query_metrics(stats: dict) -> str:
+    # Each metric family is one contiguous group: HELP/TYPE, then all its samples
+    bounds = [f"{b:g}" for b in stats["bucket_bounds_ms"]] + ["+Inf"]
+    labels = [s["statement"][:200].replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for s in stats["statements"]]
+    lines = [
+        "# HELP db_query_duration_ms Database statement latency (execute plus fetch).",
+        "# TYPE db_query_duration_ms histogram",
+    ]
+    for label, s in zip(labels, stats["statements"]):
+        cumulative = 0
+        for bound, n in zip(bounds, s["buckets"]):
+            cumulative += n
+            lines.append(f'db_query_duration_ms_bucket{{statement="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'db_query_duration_ms_sum{{statement="{label}"}} {s["total_ms"]}')
+        lines.append(f'db_query_duration_ms_count{{statement="{label}"}} {s["calls"]}')
+    for name, key, help_text in (
+        ("db_query_rows_total", "rows", "Rows fetched or affected per statement."),
+        ("db_query_errors_total", "errors", "Failed executions per statement."),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        lines += [f'{name}{{statement="{label}"}} {s[key]}' for label, s in zip(labels, stats["statements"])]
+    return "\n".join(lines) + "\n"
+
+
+@api.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Database query stats from every API worker and the scheduler: per
+    statement calls, rows, errors, latency histogram and percentiles, plus
+    the recent slow queries with their plans.
+
+    Query params: format=prometheus for the text exposition format,
+    local=true for this worker only, top=N to keep the N most expensive
+    statements (JSON only).
+    """
+    stats = get_query_stats(all_processes=request.args.get("local", "").lower() not in ("1", "true", "yes"))
+    if request.args.get("format") == "prometheus":
+        return Response(_prometheus_query_metrics(stats), mimetype="text/plain; version=0.0.4")
+    top = request.args.get("top", type=int)
+    if top:
+        stats["statements"] = stats["statements"][:top]
+    return jsonify(stats)
+
+
+@api.route("/health", methods=["GET"])
 def health():
     """Health check for the API."""
     return jsonify({"status": "ok"})
 
 
-def main():
+def _preload():
+    """
+    Warm the read-only state every request uses (the trading calendar and
+    the universe), so forked workers share it. Model params are not cached:
+    the retrain worker can publish a new version at any time, so requests
+    read the live version from the database.
+    """
+    calendar = sessions()
+    logger.info(f"Preloaded {len(NIFTY_200_TICKERS)} tickers, {len(calendar)} calendar sessions")
+
+
+def create_app(preload: bool = True) -> Flask:
+    """
+    Application factory. Initializes the schema once and, with preload, warms
+    the shared state; under gunicorn's preload_app this runs in the master
+    before workers fork.
+    """
     init_db()
     logger.info("Database initialized.")
+    if preload:
+        _preload()
+    flask_app = Flask(__name__)
+    flask_app.register_blueprint(api)
+    return flask_app
+
+
+def main():
     # Use config for host/port so it can be overridden by env if needed
     import os
     host = os.getenv("API_HOST", "0.0.0.0")
     port = int(os.getenv("API_PORT", "5000"))
-    logger.info("Starting API — GET/POST /predict, GET/POST /analyze, GET /health")
-    app.run(host=host, port=port, debug=False)
+    flask_app = create_app()
+    logger.info("Starting API — GET/POST /predict, GET/POST /analyze, GET /performance, GET /predictions, GET /model-metrics, GET /features, GET/POST /retrain, GET /params, GET/POST /profiles, GET /tickers/failures, GET /health")
+    flask_app.run(host=host, port=port, debug=False)
 
 
 if __name__ == "__main__":
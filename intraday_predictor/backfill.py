@@ -0,0 +1,174 @@
+"""
+Range backfill: rebuild predictions and outcomes for every session in a date
+range from one shared download of daily bars.
+
+Each target session is predicted from bars through the previous session's
+close (the same inputs the 4 PM job sees) and resolved against its own daily
+bar. Indicators are computed once per ticker over the whole panel, so the cost
+is one download plus a pass over the data, not one full job per day.
+"""
+import logging
+from datetime import date
+
+import pandas as pd
+
+from config import LOOKBACK_DAYS, NIFTY_200_TICKERS
+from data_fetcher import fetch_daily_panel
+from database import (
+    DEFAULT_PROFILE,
+    DEFAULT_STRATEGY,
+    delete_history_between,
+    get_all_model_params,
+    get_predictions_between,
+    insert_features,
+    insert_model_metrics,
+    insert_predictions,
+    update_prediction_outcomes,
+)
+from diversify import RollingCorrelation, select_diversified
+from performance_analyzer import _classify_outcome, _interval_columns, _win_rate_interval
+from prediction_engine import (
+    _compute_indicators,
+    _feature_frame,
+    _feature_row,
+    _levels_from_indicators,
+    _prediction_row,
+    _strategy_frame,
+    enabled_strategies,
+)
+from trading_calendar import prev_session, sessions_back, sessions_between
+from why_generator import generate_reason
+
+logger = logging.getLogger(__name__)
+
+# Extra sessions loaded before the first prediction date so EMAs/MACD settle
+WARMUP_SESSIONS = LOOKBACK_DAYS + 10
+
+
+def run_backfill(start: date, end: date, tickers: list[str] | None = None, replace: bool = True) -> dict:
+    """
+    Generate and resolve predictions for every session in [start, end].
+
+    Only the default profile's momentum picks are rebuilt (named profiles
+    and other strategies start from the day they are enabled); the stored
+    features carry every enabled strategy's score.
+
+    replace: drop the default profile's momentum predictions and the
+             metrics in the range first, so a parameter change does not
+             leave stale picks behind; other profiles' history is kept.
+    Returns a summary dict (sessions, predictions, resolved).
+    """
+    sessions = sessions_between(start, end)
+    if not sessions:
+        logger.warning(f"No trading sessions between {start} and {end}")
+        return {"sessions": 0, "predictions": 0, "resolved": 0}
+
+    first_prediction_date = prev_session(sessions[0])
+    panel_start = sessions_back(first_prediction_date, WARMUP_SESSIONS)
+    logger.info(f"Backfill {sessions[0]} → {sessions[-1]}: loading panel from {panel_start}")
+    panel = fetch_daily_panel(tickers or NIFTY_200_TICKERS, panel_start, sessions[-1])
+    for df in panel.values():
+        df.index = df.index.date
+
+    params = get_all_model_params()
+    atr_mult = params["atr_multiplier"]
+    rr_ratio = params["risk_reward_ratio"]
+    score_threshold = params["score_threshold"]
+    prediction_count = int(params["prediction_count"])
+
+    strategies = enabled_strategies()
+    indicators = {t: _compute_indicators(df) for t, df in panel.items()}
+    strategy_scores = {t: _strategy_frame(ind, strategies) for t, ind in indicators.items()}
+    features = {
+        t: _feature_frame(ind, score=strategy_scores[t].get(DEFAULT_STRATEGY)) for t, ind in indicators.items()
+    }
+    scores = pd.DataFrame({t: f["score"] for t, f in features.items()})
+    # Correlations advance with the loop: built once up to the first prediction
+    # date, then one rank-one update per session
+    closes = pd.DataFrame({t: df["Close"] for t, df in panel.items()}).sort_index()
+    tracker = RollingCorrelation.from_closes(closes[closes.index <= first_prediction_date])
+
+    predictions: list[dict] = []
+    feature_rows: list[dict] = []
+    for target in sessions:
+        prediction_date = prev_session(target)
+        if prediction_date not in scores.index:
+            logger.warning(f"No bars for {prediction_date} — skipping {target}")
+            continue
+        feature_rows.extend(
+            _feature_row(prediction_date, t, f.loc[prediction_date], strategy_scores[t].loc[prediction_date])
+            for t, f in features.items()
+            if prediction_date in f.index and not pd.isna(f.at[prediction_date, "score"])
+        )
+        day = scores.loc[prediction_date].dropna()
+        ranked = day[day > score_threshold].sort_values(ascending=False, kind="stable")
+        tracker.extend(closes[closes.index <= prediction_date])
+        top = ranked[select_diversified(list(ranked.index), prediction_count, tracker)]
+        for ticker, score in top.items():
+            levels = _levels_from_indicators(indicators[ticker].loc[prediction_date], atr_mult, rr_ratio)
+            predictions.append(_prediction_row(ticker, float(score), levels, target, prediction_date))
+
+    insert_features(feature_rows)
+    if replace:
+        delete_history_between(sessions[0], sessions[-1])
+    if predictions:
+        insert_predictions(predictions)
+
+    ids = {
+        (str(p["target_date"]), p["stock"]): p["id"]
+        for p in get_predictions_between(sessions[0], sessions[-1], profile=DEFAULT_PROFILE, strategy=DEFAULT_STRATEGY)
+    }
+    updates: list[dict] = []
+    counters: dict[str, dict[str, int]] = {}
+    for p in predictions:
+        target = date.fromisoformat(p["target_date"])
+        bars = panel[p["stock"]]
+        if target not in bars.index:
+            continue
+        bar = bars.loc[target]
+        actuals = {
+            "open": float(bar["Open"]),
+            "high": float(bar["High"]),
+            "low": float(bar["Low"]),
+            "close": float(bar["Close"]),
+            "volume": int(bar["Volume"]),
+        }
+        outcome = _classify_outcome(p["predicted_entry"], p["predicted_target"], p["predicted_sl"], actuals)
+        reason = generate_reason(
+            outcome=outcome,
+            ticker=p["stock"],
+            predicted_entry=p["predicted_entry"],
+            predicted_target=p["predicted_target"],
+            predicted_sl=p["predicted_sl"],
+            actuals=actuals,
+            target_date=target,
+            history=bars[bars.index < target],
+            intraday=False,
+        )
+        updates.append({"id": ids[(p["target_date"], p["stock"])], "actuals": actuals, "outcome": outcome, "reason": reason})
+        day = counters.setdefault(p["target_date"], {"TARGET HIT": 0, "STOP LOSS HIT": 0, "NO ENTRY": 0, "STAGNANT": 0})
+        day[outcome] += 1
+
+    if updates:
+        update_prediction_outcomes(updates)
+    # In date order: each session's win-rate interval reads the sessions written before it
+    for eval_date, c in sorted(counters.items()):
+        total = sum(c.values())
+        interval = _win_rate_interval(date.fromisoformat(eval_date), c["TARGET HIT"], total)
+        insert_model_metrics(
+            {
+                "eval_date": eval_date,
+                "total_predictions": total,
+                "target_hit": c["TARGET HIT"],
+                "sl_hit": c["STOP LOSS HIT"],
+                "no_entry": c["NO ENTRY"],
+                "stagnant": c["STAGNANT"],
+                "win_rate": round(c["TARGET HIT"] / total, 4),
+                "retrained": 0,
+                **_interval_columns(interval),
+            }
+        )
+
+    summary = {"sessions": len(sessions), "predictions": len(predictions), "resolved": len(updates)}
+    logger.info(f"Backfill complete: {summary}")
+    return summary
@@ -0,0 +1,80 @@
+"""
+Bootstrap confidence intervals for the win rate.
+
+A session is a handful of trades, so one day's win rate moves 20 points on a
+single trade and says little about the model. win_rate_interval resamples
+the recent sessions with replacement, whole sessions at a time (trades on
+the same day share the market), and reads the interval and the probability
+that the true win rate is below a threshold off the resampled rates. The
+resamples are drawn as one index matrix per chunk, so 100k of them over 20
+sessions take milliseconds. With fewer than MIN_SESSIONS sessions there are
+too few blocks to resample, and single trades are resampled instead (one
+binomial draw per resample).
+"""
+import numpy as np
+
+from config import BOOTSTRAP_CONFIDENCE, BOOTSTRAP_RESAMPLES
+
+MIN_SESSIONS = 5
+# Index-matrix elements drawn per chunk (int64): bounds memory at ~16 MB
+_CHUNK_ELEMENTS = 2_000_000
+
+
+def resample_win_rates(
+    wins: np.ndarray,
+    trades: np.ndarray,
+    resamples: int = BOOTSTRAP_RESAMPLES,
+    rng: np.random.Generator | None = None,
+) -> np.ndarray:
+    """Pooled win rate (wins / trades) of each bootstrap resample of the sessions."""
+    wins = np.asarray(wins, dtype=np.int64)
+    trades = np.asarray(trades, dtype=np.int64)
+    keep = trades > 0
+    wins, trades = wins[keep], trades[keep]
+    rng = rng or np.random.default_rng()
+    n = len(trades)
+    if n == 0:
+        return np.empty(0)
+    if n < MIN_SESSIONS:
+        total = int(trades.sum())
+        return rng.binomial(total, wins.sum() / total, size=resamples) / total
+
+    rates = np.empty(resamples)
+    step = max(1, _CHUNK_ELEMENTS // n)
+    for start in range(0, resamples, step):
+        stop = min(start + step, resamples)
+        idx = rng.integers(0, n, size=(stop - start, n))
+        rates[start:stop] = wins[idx].sum(axis=1) / trades[idx].sum(axis=1)
+    return rates
+
+
+def win_rate_interval(
+    wins: list[int],
+    trades: list[int],
+    threshold: float | None = None,
+    confidence: float = BOOTSTRAP_CONFIDENCE,
+    resamples: int = BOOTSTRAP_RESAMPLES,
+    seed: int | None = None,
+) -> dict | None:
+    """
+    Pooled win rate of the sessions (wins[i] of trades[i]) with its percentile
+    bootstrap interval. Returns {win_rate, ci_low, ci_high, prob_below,
+    sessions, trades}, or None without trades. prob_below is the share of
+    resampled win rates under threshold (None without one).
+    """
+    wins_arr = np.asarray(wins, dtype=np.int64)
+    trades_arr = np.asarray(trades, dtype=np.int64)
+    total = int(trades_arr.sum())
+    if total == 0:
+        return None
+    rates = resample_win_rates(wins_arr, trades_arr, resamples, np.random.default_rng(seed))
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(rates, [alpha, 1 - alpha])
+    return {
+        "win_rate": round(float(wins_arr.sum()) / total, 4),
+        "ci_low": round(float(low), 4),
+        "ci_high": round(float(high), 4),
+        "prob_below": round(float(np.mean(rates < threshold)), 4) if threshold is not None else None,
+        "sessions": int((trades_arr > 0).sum()),
+        "trades": total,
+    }
@@ -14,8 +14,46 @@ POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "")
 POSTGRES_DB = os.getenv("POSTGRES_DB", "predictions")
 USE_POSTGRES = bool(POSTGRES_HOST and POSTGRES_PASSWORD)
 
+# PostgreSQL connection pool, one per process (API worker, scheduler)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+
+# Query profiling: per-statement latency histograms and row counts for every
+# statement run through database._connect. Statements slower than
+# DB_SLOW_QUERY_MS are logged with their EXPLAIN plan (once per statement per
+# process). Each process snapshots its stats to DB_STATS_DIR every
+# DB_STATS_FLUSH_SECONDS and at exit; /metrics and --db-stats merge the
+# snapshots of processes still running. Opt-in (DB_PROFILE=1).
+DB_PROFILE = os.getenv("DB_PROFILE", "0").lower() in ("1", "true", "yes")
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "250"))
+DB_EXPLAIN_SLOW = os.getenv("DB_EXPLAIN_SLOW", "1").lower() in ("1", "true", "yes")
+DB_STATS_FLUSH_SECONDS = 60
+
+# Range-partition predictions by target_date (yearly) on PostgreSQL.
+# Opt-in: converting an existing table copies every row once.
+POSTGRES_PARTITION_PREDICTIONS = os.getenv("POSTGRES_PARTITION_PREDICTIONS", "").lower() in ("1", "true", "yes")
+
+# Local working data (SQLite DB, caches, reports); not committed
+DATA_DIR = BASE_DIR / "data"
+
+# Query stats snapshots, one file per process (see DB_PROFILE)
+DB_STATS_DIR = DATA_DIR / "db_stats"
+
 # SQLite fallback (used when USE_POSTGRES is False)
-DB_PATH = BASE_DIR / "data" / "predictions.db"
+DB_PATH = DATA_DIR / "predictions.db"
+
+# In-process download memo (data_fetcher): entries and lifetime in seconds
+FETCH_CACHE_SIZE = 512
+FETCH_CACHE_TTL = 300
+
+# Pickled multi-ticker daily panels shared by backfill/sweep runs
+PANEL_CACHE_DIR = DATA_DIR / "cache"
+
+# Profiled runs (main.py --now --profile, /predict?profile=1): output
+# directory, stack-sampling interval (s) and tracemalloc traceback depth
+PROFILE_DIR = DATA_DIR / "profiles"
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_TRACEMALLOC_FRAMES = 25
 
 # Nifty 200: Nifty 50 + Nifty Next 50 + Nifty Midcap 100 (Yahoo Finance NSE .NS suffix)
 # Deduplicated to 200 unique tickers.
@@ -75,8 +113,62 @@ ATR_MULTIPLIER = 1.5
 # Lookback period for technical analysis (trading days)
 LOOKBACK_DAYS = 60
 
+# Strategies scored each day (prediction_engine.STRATEGIES: momentum,
+# mean_reversion, gap). Every enabled strategy makes its own picks, tagged in
+# predictions.strategy; indicators are computed once for all of them.
+ENABLED_STRATEGIES = [s.strip() for s in os.getenv("STRATEGIES", "momentum").split(",") if s.strip()]
+
+# Diversified selection: a candidate is skipped when its daily-return
+# correlation with an already-picked name over the last CORRELATION_WINDOW
+# sessions exceeds MAX_PAIR_CORRELATION (1.0 turns the filter off). Below
+# CORRELATION_MIN_SESSIONS of history the plain top-k is used.
+CORRELATION_WINDOW = 60
+CORRELATION_MIN_SESSIONS = 20
+MAX_PAIR_CORRELATION = 0.7
+
+# Rolling performance windows (sessions) kept precomputed globally and per stock
+ROLLUP_WINDOWS = (5, 20, 60)
+
+# Trading calendar: NSE holidays file and the range of years precomputed as sessions
+HOLIDAY_FILE = BASE_DIR / "nse_holidays.txt"
+CALENDAR_START_YEAR = 2000
+CALENDAR_END_YEAR = 2035
+
 # Retraining threshold — retrain if win rate drops below this
 RETRAIN_ACCURACY_THRESHOLD = 0.40
+# How often the scheduler drains the retrain queue
+RETRAIN_POLL_MINUTES = 10
+# A job still 'running' this many seconds after it started is taken to have
+# died with its worker and is marked failed
+RETRAIN_JOB_TIMEOUT = 30 * 60
+# Walk-forward cross-validation of the retrain search (retrainer.py): each
+# fold fits on RETRAIN_TRAIN_SESSIONS sessions of resolved predictions and is
+# scored on the next RETRAIN_TEST_SESSIONS. Folds run on RETRAIN_WORKERS
+# processes (default: every CPU); folds not finished within
+# RETRAIN_TIME_BUDGET seconds are dropped, oldest first.
+RETRAIN_TRAIN_SESSIONS = 40
+RETRAIN_TEST_SESSIONS = 10
+RETRAIN_HISTORY_ROWS = 20_000
+RETRAIN_WORKERS = int(os.getenv("RETRAIN_WORKERS", "0")) or os.cpu_count() or 1
+RETRAIN_TIME_BUDGET = 120
+
+# Bootstrap confidence interval of the win rate (bootstrap.py), over the last
+# BOOTSTRAP_SESSIONS sessions of model_metrics. A retrain is queued only when
+# at least RETRAIN_CONFIDENCE of the resampled win rates fall below
+# RETRAIN_ACCURACY_THRESHOLD.
+BOOTSTRAP_RESAMPLES = 100_000
+BOOTSTRAP_SESSIONS = 20
+BOOTSTRAP_CONFIDENCE = 0.90
+RETRAIN_CONFIDENCE = 0.95
+
+# Negative cache for tickers that return no data: after TICKER_SKIP_AFTER
+# consecutive failed days a ticker is skipped, and re-probed after 1, 2, 4 ...
+# days (at most TICKER_MAX_PROBE_DAYS). A run in which more than
+# TICKER_OUTAGE_FRACTION of the universe fails is treated as an outage and
+# recorded against no one.
+TICKER_SKIP_AFTER = 3
+TICKER_MAX_PROBE_DAYS = 64
+TICKER_OUTAGE_FRACTION = 0.5
 
 EMAIL_SENDER = os.getenv("EMAIL_SENDER", "")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD", "")
@@ -84,6 +176,22 @@ EMAIL_RECIPIENT = os.getenv("EMAIL_RECIPIENT", "")
 SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
 SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
 
+# NSE cash session (IST) and the intraday monitor's polling cadence
+MARKET_OPEN = (9, 15)
+MARKET_CLOSE = (15, 30)
+INTRADAY_INTERVAL = "15m"
+INTRADAY_POLL_SECONDS = 60
+
+# Persistent 15m bar store (Yahoo keeps only ~60 days of 15m history)
+INTRADAY_STORE_DIR = DATA_DIR / "intraday"
+INTRADAY_RETENTION_DAYS = 5 * 365
+
+# Production API server (gunicorn.conf.py). /predict runs the whole job, so the timeout is generous.
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "2"))
+WEB_THREADS = int(os.getenv("WEB_THREADS", "4"))
+WEB_TIMEOUT = int(os.getenv("WEB_TIMEOUT", "600"))
+WEB_GRACEFUL_TIMEOUT = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))
+
 SCHEDULE_HOUR = 16  # 4:00 PM IST
 SCHEDULE_MINUTE = 0
 TIMEZONE = "Asia/Kolkata"
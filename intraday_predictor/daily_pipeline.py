@@ -0,0 +1,203 @@
+"""
+The daily cycle as checkpointed stages, shared by main.daily_job and the
+/predict endpoint.
+
+Stages, in order:
+
+    intraday_captured    today's 15m bars saved to the intraday store
+    scored               universe downloaded and features written; a resumed
+                         run reads them back from the features table
+                         (per-ticker progress: universe_fetched)
+    analysis_written     today's predictions resolved, metrics written
+                         (per-ticker progress: analysis_fetched)
+    analysis_emailed
+    predictions_written  tomorrow's picks stored, for every profile
+    predictions_emailed
+
+Named profiles get their own emails; each is checkpointed as
+"<stage>:<profile>" (the default profile keeps the plain stage name).
+
+Each completed stage and each finished ticker inside a stage is recorded in
+the database, so rerunning the same day after a crash or a yfinance outage
+picks up at the first unfinished unit instead of repeating network work.
+"""
+import logging
+from datetime import date
+from typing import Any
+
+from config import NIFTY_200_TICKERS
+from data_fetcher import live_tickers
+from database import (
+    DEFAULT_PROFILE,
+    complete_job_stage,
+    get_features,
+    get_job_stages,
+    get_profiles,
+    get_ticker_progress,
+    record_ticker_progress,
+    reset_job,
+)
+from email_notifier import send_analysis_email, send_prediction_email
+from intraday_store import apply_retention, capture_session
+from performance_analyzer import analyze_predictions
+from prediction_engine import cached_profile_predictions, compute_daily_features, generate_profile_predictions
+from trading_calendar import session_closed
+from trading_days import next_trading_day
+
+logger = logging.getLogger(__name__)
+
+INTRADAY_CAPTURED = "intraday_captured"
+SCORED = "scored"
+ANALYSIS_WRITTEN = "analysis_written"
+ANALYSIS_EMAILED = "analysis_emailed"
+PREDICTIONS_WRITTEN = "predictions_written"
+PREDICTIONS_EMAILED = "predictions_emailed"
+
+UNIVERSE_FETCHED = "universe_fetched"
+ANALYSIS_FETCHED = "analysis_fetched"
+
+
+class StageProgress:
+    """Per-ticker checkpoints of one stage of one run."""
+
+    def __init__(self, run_date: date, stage: str):
+        self.run_date = run_date
+        self.stage = stage
+        self._done = get_ticker_progress(run_date, stage)
+
+    def completed(self) -> dict[str, Any]:
+        """{stock: payload} for every ticker already finished."""
+        return dict(self._done)
+
+    def record(self, entries: dict[str, Any]):
+        record_ticker_progress(self.run_date, self.stage, entries)
+        self._done.update(entries)
+
+
+def group_by_profile(rows: list[dict]) -> dict[str, list[dict]]:
+    """Split prediction or analysis rows by their profile, default first."""
+    out: dict[str, list[dict]] = {DEFAULT_PROFILE: []}
+    for r in rows:
+        out.setdefault(r.get("profile", DEFAULT_PROFILE), []).append(r)
+    return out
+
+
+def _email_profiles(run_date: date, stages: dict, stage: str, by_profile: dict[str, list[dict]], send, when: date) -> bool:
+    """Send one email per profile not yet emailed for this run. Returns whether any was sent."""
+    recipients = {p["name"]: p["recipients"] for p in get_profiles()}
+    sent = False
+    for name, rows in by_profile.items():
+        key = stage if name == DEFAULT_PROFILE else f"{stage}:{name}"
+        if key in stages:
+            continue
+        send(rows, when, profile=name, recipients=recipients.get(name))
+        complete_job_stage(run_date, key)
+        sent = True
+    return sent
+
+
+def run_daily_pipeline(run_date: date, send_emails: bool = True, force: bool = False) -> dict:
+    """
+    Run (or resume) the daily cycle for run_date: analyze run_date's
+    predictions and generate the next session's.
+
+    send_emails: send the analysis and prediction emails (each at most once
+                 per run_date and profile).
+    force: drop run_date's checkpoints first and redo every stage,
+           re-analyzing predictions that already have an outcome and
+           regenerating predictions even when a cached result matches.
+    Before run_date's close everything runs on partial bars and is
+    provisional: returned, but not stored, checkpointed, cached or emailed.
+
+    Returns {run_date, target_date, analysis_results, predictions (default
+    profile), profile_predictions ({profile: predictions}), resumed (stages
+    skipped), emails_sent, provisional}.
+    """
+    if force:
+        reset_job(run_date)
+    stages = get_job_stages(run_date)
+    resumed = list(stages)
+    if resumed:
+        logger.info(f"Resuming daily run for {run_date}; already done: {', '.join(resumed)}")
+    emails_sent = {"analysis": False, "prediction": False}
+    # Before the close run_date's bars are partial: nothing derived from them is
+    # saved or checkpointed, so the post-close run sees the full day.
+    closed = session_closed(run_date)
+
+    # Persist today's 15m bars for the whole universe before Yahoo's window drops them;
+    # the analysis below then reads them from the store.
+    if INTRADAY_CAPTURED not in stages and closed:
+        try:
+            capture_session(run_date, live_tickers(NIFTY_200_TICKERS, run_date))
+            apply_retention()
+            complete_job_stage(run_date, INTRADAY_CAPTURED)
+        except Exception as e:
+            logger.warning(f"Intraday capture failed: {e}")
+
+    # Score the whole universe on today's close once; the "why" explanations
+    # and tomorrow's picks both read these features. A result already
+    # generated for target_date from the same features, params and universe
+    # skips the scan altogether (force bypasses it); a run that already
+    # scored reads the stored features back. Before the close the scan runs
+    # on the partial bar and nothing it produces is kept.
+    target_date = next_trading_day(run_date)
+    features = None
+    cached = None
+    if PREDICTIONS_WRITTEN not in stages:
+        if not closed:
+            features = compute_daily_features(run_date, provisional=True)
+        else:
+            cached = None if force else cached_profile_predictions(target_date, run_date)
+            if cached is None and SCORED in stages:
+                features = get_features(run_date)
+            elif cached is None:
+                features = compute_daily_features(run_date, progress=StageProgress(run_date, UNIVERSE_FETCHED))
+                complete_job_stage(run_date, SCORED, {"tickers": len(features)})
+
+    # --- Module 2: Analyze today's completed session against yesterday's predictions ---
+    # Before the close the outcomes are provisional: the stage stays open and no
+    # analysis email goes out, so the post-close run resolves and reports the full day.
+    if ANALYSIS_WRITTEN in stages:
+        analysis_results = stages[ANALYSIS_WRITTEN]
+    else:
+        logger.info(f"Analyzing predictions for {run_date}")
+        analysis_results = analyze_predictions(
+            run_date, progress=StageProgress(run_date, ANALYSIS_FETCHED), force=force
+        )
+        if closed:
+            complete_job_stage(run_date, ANALYSIS_WRITTEN, analysis_results)
+    if send_emails and closed:
+        emails_sent["analysis"] = _email_profiles(
+            run_date, stages, ANALYSIS_EMAILED, group_by_profile(analysis_results), send_analysis_email, run_date
+        )
+
+    # --- Module 1: Generate predictions for the next session ---
+    if PREDICTIONS_WRITTEN in stages:
+        profile_predictions = stages[PREDICTIONS_WRITTEN]
+        if isinstance(profile_predictions, list):  # checkpoint written before profiles
+            profile_predictions = {DEFAULT_PROFILE: profile_predictions}
+    else:
+        if cached is not None:
+            profile_predictions = cached
+        else:
+            logger.info(f"Generating predictions for {target_date}")
+            profile_predictions = generate_profile_predictions(
+                target_date, prediction_date=run_date, features=features, provisional=not closed
+            )
+        if closed:
+            complete_job_stage(run_date, PREDICTIONS_WRITTEN, profile_predictions)
+    if send_emails and closed:
+        emails_sent["prediction"] = _email_profiles(
+            run_date, stages, PREDICTIONS_EMAILED, profile_predictions, send_prediction_email, target_date
+        )
+
+    return {
+        "run_date": run_date,
+        "target_date": target_date,
+        "analysis_results": analysis_results,
+        "predictions": profile_predictions.get(DEFAULT_PROFILE, []),
+        "profile_predictions": profile_predictions,
+        "resumed": resumed,
+        "emails_sent": emails_sent,
+        "provisional": not closed,
+    }
@@ -1,36 +1,167 @@
+import hashlib
 import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 from datetime import date, timedelta
 
 import pandas as pd
 import yfinance as yf
 
-from config import LOOKBACK_DAYS
+from config import FETCH_CACHE_SIZE, FETCH_CACHE_TTL, INTRADAY_INTERVAL, LOOKBACK_DAYS, PANEL_CACHE_DIR
+from database import get_skipped_tickers
+from intraday_store import read_bars, write_bars
+from trading_calendar import sessions_back
 
 logger = logging.getLogger(__name__)
 
+# Single-flight memo for per-ticker downloads. Concurrent callers asking for the
+# same (ticker, interval, start, end) wait on one in-flight request and share
+# its result; completed results stay in a small LRU for FETCH_CACHE_TTL seconds.
+# Callers always get their own copy, since several of them mutate the index.
+_memo_lock = threading.Lock()
+_memo: "OrderedDict[tuple, tuple[float, pd.DataFrame]]" = OrderedDict()
+_in_flight: dict[tuple, Future] = {}
 
-def fetch_daily_ohlcv(ticker: str, days: int = LOOKBACK_DAYS) -> pd.DataFrame:
-    end = date.today()
-    start = end - timedelta(days=int(days * 1.6))
-    df = yf.download(ticker, start=str(start), end=str(end), interval="1d", progress=False)
+
+def _download(ticker: str, start: date, end: date, interval: str) -> pd.DataFrame:
+    key = (ticker, interval, str(start), str(end))
+    with _memo_lock:
+        hit = _memo.get(key)
+        if hit and hit[0] > time.monotonic():
+            _memo.move_to_end(key)
+            return hit[1].copy()
+        future = _in_flight.get(key)
+        leader = future is None
+        if leader:
+            future = _in_flight[key] = Future()
+
+    if not leader:
+        return future.result().copy()
+
+    try:
+        df = yf.download(ticker, start=str(start), end=str(end), interval=interval, progress=False)
+        if isinstance(df.columns, pd.MultiIndex):
+            df.columns = df.columns.get_level_values(0)
+    except Exception as e:
+        with _memo_lock:
+            _in_flight.pop(key, None)
+        future.set_exception(e)
+        raise
+
+    with _memo_lock:
+        _memo[key] = (time.monotonic() + FETCH_CACHE_TTL, df)
+        _memo.move_to_end(key)
+        while len(_memo) > FETCH_CACHE_SIZE:
+            _memo.popitem(last=False)
+        _in_flight.pop(key, None)
+    future.set_result(df)
+    return df.copy()
+
+
+def clear_fetch_cache():
+    with _memo_lock:
+        _memo.clear()
+
+
+def live_tickers(tickers: list[str], on: date | None = None) -> list[str]:
+    """tickers minus those the failure registry is skipping (see database.record_ticker_results)."""
+    skipped = get_skipped_tickers(on or date.today())
+    if not skipped:
+        return list(tickers)
+    live = [t for t in tickers if t not in skipped]
+    if len(live) < len(tickers):
+        logger.info(f"Skipping {len(tickers) - len(live)} tickers with no recent data: {', '.join(sorted(skipped & set(tickers)))}")
+    return live
+
+
+def fetch_daily_ohlcv(ticker: str, days: int = LOOKBACK_DAYS, through: date | None = None) -> pd.DataFrame:
+    """
+    The last days daily bars of ticker. through is the last session to
+    include; by default the window ends before today (yfinance's end is
+    exclusive), so a session still trading is left out.
+    """
+    end = through + timedelta(days=1) if through else date.today()
+    # Every lookback up to LOOKBACK_DAYS maps to the same window, so the 5/25/30/60-day
+    # requests made for one ticker during a run share a single download.
+    # A few spare sessions absorb holidays missing from the calendar file.
+    start = sessions_back(end, max(days, LOOKBACK_DAYS) + 5)
+    df = _download(ticker, start, end, "1d")
     if df.empty:
         logger.warning(f"No daily data for {ticker}")
         return df
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = df.columns.get_level_values(0)
     df.index = pd.to_datetime(df.index)
     return df.tail(days)
 
 
+def fetch_daily_panel(tickers: list[str], start: date, end: date) -> dict[str, pd.DataFrame]:
+    """
+    Daily OHLCV for many tickers over [start, end] in a single download.
+    Returns {ticker: DataFrame}; tickers without data are left out.
+    """
+    df = yf.download(
+        tickers,
+        start=str(start),
+        end=str(end + timedelta(days=1)),
+        interval="1d",
+        group_by="ticker",
+        threads=True,
+        progress=False,
+    )
+    panel: dict[str, pd.DataFrame] = {}
+    if df.empty:
+        logger.warning(f"No daily data for {len(tickers)} tickers between {start} and {end}")
+        return panel
+    for ticker in tickers:
+        if isinstance(df.columns, pd.MultiIndex):
+            if ticker not in df.columns.get_level_values(0):
+                continue
+            sub = df[ticker]
+        else:
+            sub = df
+        sub = sub.dropna(how="all")
+        if sub.empty:
+            logger.warning(f"No daily data for {ticker}")
+            continue
+        sub.index = pd.to_datetime(sub.index)
+        panel[ticker] = sub
+    return panel
+
+
+def load_daily_panel(tickers: list[str], start: date, end: date) -> dict[str, pd.DataFrame]:
+    """
+    fetch_daily_panel backed by a pickle under PANEL_CACHE_DIR, so repeated
+    research runs over the same range and universe download it only once.
+    Ranges ending today are not cached (the last bar may still change).
+    """
+    universe = hashlib.sha1(",".join(tickers).encode()).hexdigest()[:10]
+    path = PANEL_CACHE_DIR / f"panel_{start}_{end}_{universe}.pkl"
+    if path.exists():
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    panel = fetch_daily_panel(tickers, start, end)
+    if panel and end < date.today():
+        PANEL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            pickle.dump(panel, f)
+    return panel
+
+
 def fetch_intraday_ohlcv(ticker: str, target_date: date) -> pd.DataFrame:
+    """15m bars for one session, from the local store when captured, else Yahoo."""
+    stored = read_bars(target_date, ticker)
+    if stored is not None:
+        return stored
     start = target_date
     end = target_date + timedelta(days=1)
-    df = yf.download(ticker, start=str(start), end=str(end), interval="15m", progress=False)
+    df = _download(ticker, start, end, INTRADAY_INTERVAL)
     if df.empty:
         logger.warning(f"No 15m data for {ticker} on {target_date}")
-        return df
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = df.columns.get_level_values(0)
+    elif target_date < date.today():
+        # A past session is complete — keep it before Yahoo's 15m window drops it
+        write_bars(target_date, ticker, df)
     return df
 
 
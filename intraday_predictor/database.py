@@ -1,13 +1,38 @@
+import atexit
+import json
+import logging
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import deque
 from contextlib import contextmanager
-from datetime import date, datetime
-from typing import Any, Optional
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
 
 from config import (
     ATR_MULTIPLIER,
+    DB_EXPLAIN_SLOW,
     DB_PATH,
+    DB_POOL_MAX,
+    DB_POOL_MIN,
+    DB_PROFILE,
+    DB_SLOW_QUERY_MS,
+    DB_STATS_DIR,
+    DB_STATS_FLUSH_SECONDS,
     PREDICTION_COUNT,
+    RETRAIN_JOB_TIMEOUT,
     RISK_REWARD_RATIO,
+    ROLLUP_WINDOWS,
+    TICKER_MAX_PROBE_DAYS,
+    TICKER_SKIP_AFTER,
     USE_POSTGRES,
+    POSTGRES_PARTITION_PREDICTIONS,
     POSTGRES_HOST,
     POSTGRES_PORT,
     POSTGRES_USER,
@@ -15,6 +40,23 @@ from config import (
     POSTGRES_DB,
 )
 
+logger = logging.getLogger(__name__)
+
+# Profile whose parameters live in model_params: the one retraining tunes and
+# whose predictions feed model_metrics and the performance rollups. Named
+# profiles (profiles table) override some of its parameters.
+DEFAULT_PROFILE = "default"
+
+# Strategy whose score is the features table's score column; the one
+# model_metrics, the rollups and retraining follow (see
+# prediction_engine.STRATEGIES).
+DEFAULT_STRATEGY = "momentum"
+
+# Predictions of the default profile and strategy: the book that
+# model_metrics, the rollups and retraining follow
+_DEFAULT_BOOK_SQL = "profile = ? AND strategy = ?"
+_DEFAULT_BOOK_ARGS = (DEFAULT_PROFILE, DEFAULT_STRATEGY)
+
 # Default model param keys (stored in model_params table)
 DEFAULT_MODEL_PARAMS = {
     "atr_multiplier": ATR_MULTIPLIER,
@@ -23,18 +65,58 @@ DEFAULT_MODEL_PARAMS = {
     "prediction_count": PREDICTION_COUNT,
 }
 
+# Profile override keys "score_threshold.<strategy>": one strategy's score
+# threshold (strategies score on their own scales; see prediction_engine.Strategy)
+STRATEGY_THRESHOLD_PREFIX = "score_threshold."
+
+
+# Per-process PostgreSQL pool. Connections must never cross a fork, so the
+# pool remembers the pid that created it and is rebuilt in a forked child.
+_POOL = None
+_POOL_PID: Optional[int] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _get_pool():
+    global _POOL, _POOL_PID
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_PID != os.getpid():
+            from psycopg2.extras import RealDictCursor
+            from psycopg2.pool import ThreadedConnectionPool
+            _POOL = ThreadedConnectionPool(
+                DB_POOL_MIN,
+                DB_POOL_MAX,
+                host=POSTGRES_HOST,
+                port=POSTGRES_PORT,
+                user=POSTGRES_USER,
+                password=POSTGRES_PASSWORD,
+                dbname=POSTGRES_DB,
+                cursor_factory=RealDictCursor,
+            )
+            _POOL_PID = os.getpid()
+        return _POOL
+
+
+def reset_pool():
+    """
+    Forget the pool without closing it. For a freshly forked worker: the
+    inherited sockets belong to the parent, and closing them here would end
+    the parent's sessions.
+    """
+    global _POOL, _POOL_PID
+    with _POOL_LOCK:
+        _POOL = None
+        _POOL_PID = None
 
-def _get_postgres_conn():
-    import psycopg2
-    from psycopg2.extras import RealDictCursor
-    return psycopg2.connect(
-        host=POSTGRES_HOST,
-        port=POSTGRES_PORT,
-        user=POSTGRES_USER,
-        password=POSTGRES_PASSWORD,
-        dbname=POSTGRES_DB,
-        cursor_factory=RealDictCursor,
-    )
+
+def close_pool():
+    """Close every pooled connection (process shutdown, or before forking workers)."""
+    global _POOL, _POOL_PID
+    with _POOL_LOCK:
+        if _POOL is not None and _POOL_PID == os.getpid():
+            _POOL.closeall()
+        _POOL = None
+        _POOL_PID = None
 
 
 def init_db():
@@ -42,6 +124,9 @@ def init_db():
         _init_postgres()
     else:
         _init_sqlite()
+    _apply_migrations()
+    if USE_POSTGRES and POSTGRES_PARTITION_PREDICTIONS:
+        partition_predictions()
 
 
 def _init_postgres():
@@ -157,29 +242,1075 @@ def _init_sqlite():
         conn.close()
 
 
+# ---------------------------------------------------------------------------
+# Schema migrations
+# ---------------------------------------------------------------------------
+# Each entry is (version, description, postgres_statements, sqlite_statements).
+# init_db() applies pending versions in order and records them in
+# schema_migrations, so every migration runs exactly once per database.
+# A statement may also be a callable taking the open cursor, for steps that
+# need Python logic rather than plain DDL.
+
+_PG_PREDICTION_INDEXES = [
+    # get_predictions_with_outcomes: newest resolved rows, served from the index alone
+    """CREATE INDEX IF NOT EXISTS idx_predictions_resolved_recent
+       ON predictions (target_date DESC, id DESC)
+       INCLUDE (stock, predicted_entry, predicted_target, predicted_sl, actual_high, actual_low, outcome)
+       WHERE outcome IS NOT NULL AND actual_high IS NOT NULL AND actual_low IS NOT NULL""",
+    # Predictions still waiting for the post-mortem
+    """CREATE INDEX IF NOT EXISTS idx_predictions_unresolved
+       ON predictions (target_date) WHERE outcome IS NULL""",
+    # Per-stock history lookups
+    "CREATE INDEX IF NOT EXISTS idx_predictions_stock_date ON predictions (stock, target_date DESC)",
+]
+
+# Columns of the predictions uniqueness constraint (must contain target_date
+# so it stays valid on the partitioned table).
+_PREDICTIONS_UNIQUE_COLS = ("target_date", "stock", "profile", "strategy")
+_PREDICTIONS_UNIQUE_NAME = "predictions_target_date_stock_profile_strategy_key"
+
+
+def _sqlite_rebuild_predictions_unique(cur, old_cols: tuple[str, ...], new_cols: tuple[str, ...]):
+    """
+    SQLite cannot alter a table constraint: rebuild predictions with
+    UNIQUE(new_cols) in place of UNIQUE(old_cols), keeping ids and every index.
+    """
+    cur.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'predictions'")
+    table_sql = cur.fetchone()["sql"]
+    cur.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'predictions' AND sql IS NOT NULL")
+    index_sqls = [r["sql"] for r in cur.fetchall()]
+    new_sql = re.sub(
+        r"UNIQUE\s*\(\s*" + r"\s*,\s*".join(old_cols) + r"\s*\)",
+        f"UNIQUE({', '.join(new_cols)})",
+        table_sql,
+    )
+    # A table renamed by an earlier rebuild is stored as CREATE TABLE "predictions"
+    cur.execute(re.sub(r'CREATE TABLE\s+"?predictions"?', "CREATE TABLE predictions_rebuild", new_sql, count=1))
+    cur.execute("INSERT INTO predictions_rebuild SELECT * FROM predictions")
+    cur.execute("DROP TABLE predictions")
+    cur.execute("ALTER TABLE predictions_rebuild RENAME TO predictions")
+    for index_sql in index_sqls:
+        cur.execute(index_sql)
+
+
+_MIGRATIONS = [
+    (
+        1,
+        "query indexes for outcome history, per-stock lookups and model_metrics",
+        _PG_PREDICTION_INDEXES + [
+            "CREATE INDEX IF NOT EXISTS idx_model_metrics_eval_date ON model_metrics (eval_date DESC) INCLUDE (win_rate)",
+        ],
+        [
+            # SQLite has no INCLUDE; a wide partial index gives the same covering scan
+            """CREATE INDEX IF NOT EXISTS idx_predictions_resolved_recent
+               ON predictions (target_date DESC, id DESC, stock, predicted_entry, predicted_target,
+                               predicted_sl, actual_high, actual_low, outcome)
+               WHERE outcome IS NOT NULL AND actual_high IS NOT NULL AND actual_low IS NOT NULL""",
+            """CREATE INDEX IF NOT EXISTS idx_predictions_unresolved
+               ON predictions (target_date) WHERE outcome IS NULL""",
+            "CREATE INDEX IF NOT EXISTS idx_predictions_stock_date ON predictions (stock, target_date DESC)",
+            "CREATE INDEX IF NOT EXISTS idx_model_metrics_eval_date ON model_metrics (eval_date DESC, win_rate)",
+        ],
+    ),
+    (
+        2,
+        "incrementally maintained outcome counts and rolling win-rate aggregates",
+        [
+            """CREATE TABLE IF NOT EXISTS outcome_daily (
+                   session_date DATE NOT NULL,
+                   scope TEXT NOT NULL,
+                   target_hit INTEGER NOT NULL DEFAULT 0,
+                   sl_hit INTEGER NOT NULL DEFAULT 0,
+                   no_entry INTEGER NOT NULL DEFAULT 0,
+                   stagnant INTEGER NOT NULL DEFAULT 0,
+                   total INTEGER NOT NULL DEFAULT 0,
+                   PRIMARY KEY (scope, session_date)
+               )""",
+            """CREATE TABLE IF NOT EXISTS performance_rollups (
+                   scope TEXT NOT NULL,
+                   window_days INTEGER NOT NULL,
+                   target_hit INTEGER NOT NULL,
+                   sl_hit INTEGER NOT NULL,
+                   no_entry INTEGER NOT NULL,
+                   stagnant INTEGER NOT NULL,
+                   total INTEGER NOT NULL,
+                   win_rate REAL,
+                   as_of DATE,
+                   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                   PRIMARY KEY (scope, window_days)
+               )""",
+            # Predates profiles: every row then belonged to the default profile
+            lambda cur: _rebuild_performance_rollups(cur, default_book=False),
+        ],
+        [
+            """CREATE TABLE IF NOT EXISTS outcome_daily (
+                   session_date DATE NOT NULL,
+                   scope TEXT NOT NULL,
+                   target_hit INTEGER NOT NULL DEFAULT 0,
+                   sl_hit INTEGER NOT NULL DEFAULT 0,
+                   no_entry INTEGER NOT NULL DEFAULT 0,
+                   stagnant INTEGER NOT NULL DEFAULT 0,
+                   total INTEGER NOT NULL DEFAULT 0,
+                   PRIMARY KEY (scope, session_date)
+               )""",
+            """CREATE TABLE IF NOT EXISTS performance_rollups (
+                   scope TEXT NOT NULL,
+                   window_days INTEGER NOT NULL,
+                   target_hit INTEGER NOT NULL,
+                   sl_hit INTEGER NOT NULL,
+                   no_entry INTEGER NOT NULL,
+                   stagnant INTEGER NOT NULL,
+                   total INTEGER NOT NULL,
+                   win_rate REAL,
+                   as_of DATE,
+                   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                   PRIMARY KEY (scope, window_days)
+               )""",
+            # Predates profiles: every row then belonged to the default profile
+            lambda cur: _rebuild_performance_rollups(cur, default_book=False),
+        ],
+    ),
+    (
+        3,
+        "updated_at watermarks for incremental exports",
+        [
+            "ALTER TABLE predictions ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP",
+            "ALTER TABLE model_metrics ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP",
+            "UPDATE predictions SET updated_at = created_at WHERE updated_at IS NULL",
+            "UPDATE model_metrics SET updated_at = created_at WHERE updated_at IS NULL",
+            "CREATE INDEX IF NOT EXISTS idx_predictions_updated_at ON predictions (updated_at)",
+            "CREATE INDEX IF NOT EXISTS idx_model_metrics_updated_at ON model_metrics (updated_at)",
+        ],
+        [
+            "ALTER TABLE predictions ADD COLUMN updated_at TIMESTAMP",
+            "ALTER TABLE model_metrics ADD COLUMN updated_at TIMESTAMP",
+            "UPDATE predictions SET updated_at = created_at WHERE updated_at IS NULL",
+            "UPDATE model_metrics SET updated_at = created_at WHERE updated_at IS NULL",
+            "CREATE INDEX IF NOT EXISTS idx_predictions_updated_at ON predictions (updated_at)",
+            "CREATE INDEX IF NOT EXISTS idx_model_metrics_updated_at ON model_metrics (updated_at)",
+        ],
+    ),
+    (
+        4,
+        "intraday monitor state and transition log",
+        [
+            """CREATE TABLE IF NOT EXISTS intraday_state (
+                   prediction_id INTEGER PRIMARY KEY,
+                   target_date DATE NOT NULL,
+                   stock TEXT NOT NULL,
+                   state TEXT NOT NULL,
+                   final INTEGER NOT NULL DEFAULT 0,
+                   entered_at TIMESTAMP,
+                   exited_at TIMESTAMP,
+                   last_bar_at TIMESTAMP,
+                   day_open REAL,
+                   day_high REAL,
+                   day_low REAL,
+                   day_close REAL,
+                   day_volume BIGINT,
+                   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+               )""",
+            """CREATE TABLE IF NOT EXISTS intraday_events (
+                   id SERIAL PRIMARY KEY,
+                   prediction_id INTEGER NOT NULL,
+                   event_at TIMESTAMP NOT NULL,
+                   from_state TEXT NOT NULL,
+                   to_state TEXT NOT NULL,
+                   price REAL,
+                   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+               )""",
+            "CREATE INDEX IF NOT EXISTS idx_intraday_state_date ON intraday_state (target_date)",
+            "CREATE INDEX IF NOT EXISTS idx_intraday_events_prediction ON intraday_events (prediction_id, event_at)",
+        ],
+        [
+            """CREATE TABLE IF NOT EXISTS intraday_state (
+                   prediction_id INTEGER PRIMARY KEY,
+                   target_date DATE NOT NULL,
+                   stock TEXT NOT NULL,
+                   state TEXT NOT NULL,
+                   final INTEGER NOT NULL DEFAULT 0,
+                   entered_at TIMESTAMP,
+                   exited_at TIMESTAMP,
+                   last_bar_at TIMESTAMP,
+                   day_open REAL,
+                   day_high REAL,
+                   day_low REAL,
+                   day_close REAL,
+                   day_volume INTEGER,
+                   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+               )""",
+            """CREATE TABLE IF NOT EXISTS intraday_events (
+                   id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   prediction_id INTEGER NOT NULL,
+                   event_at TIMESTAMP NOT NULL,
+                   from_state TEXT NOT NULL,
+                   to_state TEXT NOT NULL,
+                   price REAL,
+                   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+               )""",
+            "CREATE INDEX IF NOT EXISTS idx_intraday_state_date ON intraday_state (target_date)",
+            "CREATE INDEX IF NOT EXISTS idx_intraday_events_prediction ON intraday_events (prediction_id, event_at)",
+        ],
+    ),
+    (
+        5,
+        "versioned model params and retrain job queue",
+        [
+            "ALTER TABLE model_params ADD COLUMN IF NOT EXISTS version INTEGER",
+            """CREATE TABLE IF NOT EXISTS model_param_versions (
+                   version SERIAL PRIMARY KEY,
+                   params TEXT NOT NULL,
+                   source TEXT NOT NULL,
+                   metrics TEXT,
+                   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+               )""",
+            """CREATE TABLE IF NOT EXISTS retrain_jobs (
+                   id SERIAL PRIMARY KEY,
+                   reason TEXT,
+                   status TEXT NOT NULL DEFAULT 'pending',
+                   requested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                   started_at TIMESTAMP,
+                   finished_at TIMESTAMP,
+                   result TEXT,
+                   error TEXT
+               )""",
+            "CREATE INDEX IF NOT EXISTS idx_retrain_jobs_status ON retrain_jobs (status, id)",
+            lambda cur: _publish_params(cur, _current_params(cur), "initial"),
+        ],
+        [
+            "ALTER TABLE model_params ADD COLUMN version INTEGER",
+            """CREATE TABLE IF NOT EXISTS model_param_versions (
+                   version INTEGER PRIMARY KEY AUTOINCREMENT,
+                   params TEXT NOT NULL,
+                   source TEXT NOT NULL,
+                   metrics TEXT,
+                   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+               )""",
+            """CREATE TABLE IF NOT EXISTS retrain_jobs (
+                   id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   reason TEXT,
+                   status TEXT NOT NULL DEFAULT 'pending',
+                   requested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                   started_at TIMESTAMP,
+                   finished_at TIMESTAMP,
+                   result TEXT,
+                   error TEXT
+               )""",
+            "CREATE INDEX IF NOT EXISTS idx_retrain_jobs_status ON retrain_jobs (status, id)",
+            lambda cur: _publish_params(cur, _current_params(cur), "initial"),
+        ],
+    ),
+    (
+        6,
+        "daily feature store; score and atr on predictions",
+        [
+            """CREATE TABLE IF NOT EXISTS features (
+                   session_date DATE NOT NULL,
+                   stock TEXT NOT NULL,
+                   close REAL,
+                   volume BIGINT,
+                   atr REAL,
+                   rsi REAL,
+                   macd REAL,
+                   macd_signal REAL,
+                   vol_sma20 REAL,
+                   vol_ratio REAL,
+                   ema9 REAL,
+                   ema20 REAL,
+                   ema21 REAL,
+                   ema_gap_prev REAL,
+                   high_20 REAL,
+                   ema20_dist REAL,
+                   breakout_dist REAL,
+                   score REAL,
+                   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                   PRIMARY KEY (session_date, stock)
+               )""",
+            "CREATE INDEX IF NOT EXISTS idx_features_stock_date ON features (stock, session_date)",
+            "ALTER TABLE predictions ADD COLUMN IF NOT EXISTS score REAL",
+            "ALTER TABLE predictions ADD COLUMN IF NOT EXISTS atr REAL",
+        ],
+        [
+            """CREATE TABLE IF NOT EXISTS features (
+                   session_date DATE NOT NULL,
+                   stock TEXT NOT NULL,
+                   close REAL,
+                   volume INTEGER,
+                   atr REAL,
+                   rsi REAL,
+                   macd REAL,
+                   macd_signal REAL,
+                   vol_sma20 REAL,
+                   vol_ratio REAL,
+                   ema9 REAL,
+                   ema20 REAL,
+                   ema21 REAL,
+                   ema_gap_prev REAL,
+                   high_20 REAL,
+                   ema20_dist REAL,
+                   breakout_dist REAL,
+                   score REAL,
+                   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                   PRIMARY KEY (session_date, stock)
+               )""",
+            "CREATE INDEX IF NOT EXISTS idx_features_stock_date ON features (stock, session_date)",
+            "ALTER TABLE predictions ADD COLUMN score REAL",
+            "ALTER TABLE predictions ADD COLUMN atr REAL",
+        ],
+    ),
+    (
+        7,
+        "daily job checkpoints",
+        [
+            """CREATE TABLE IF NOT EXISTS job_stages (
+                   run_date DATE NOT NULL,
+                   stage TEXT NOT NULL,
+                   payload TEXT,
+                   completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                   PRIMARY KEY (run_date, stage)
+               )""",
+            """CREATE TABLE IF NOT EXISTS job_ticker_progress (
+                   run_date DATE NOT NULL,
+                   stage TEXT NOT NULL,
+                   stock TEXT NOT NULL,
+                   payload TEXT,
+                   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                   PRIMARY KEY (run_date, stage, stock)
+               )""",
+        ],
+        [
+            """CREATE TABLE IF NOT EXISTS job_stages (
+                   run_date DATE NOT NULL,
+                   stage TEXT NOT NULL,
+                   payload TEXT,
+                   completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                   PRIMARY KEY (run_date, stage)
+               )""",
+            """CREATE TABLE IF NOT EXISTS job_ticker_progress (
+                   run_date DATE NOT NULL,
+                   stage TEXT NOT NULL,
+                   stock TEXT NOT NULL,
+                   payload TEXT,
+                   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                   PRIMARY KEY (run_date, stage, stock)
+               )""",
+        ],
+    ),
+    (
+        8,
+        "one model_metrics row per eval_date",
+        [
+            # Reruns used to append duplicates; keep the latest row of each day
+            "DELETE FROM model_metrics WHERE id NOT IN (SELECT MAX(id) FROM model_metrics GROUP BY eval_date)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_model_metrics_eval_date ON model_metrics (eval_date)",
+        ],
+        [
+            "DELETE FROM model_metrics WHERE id NOT IN (SELECT MAX(id) FROM model_metrics GROUP BY eval_date)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_model_metrics_eval_date ON model_metrics (eval_date)",
+        ],
+    ),
+    (
+        9,
+        "named parameter profiles; predictions unique per (target_date, stock, profile)",
+        [
+            """CREATE TABLE IF NOT EXISTS profiles (
+                   name TEXT PRIMARY KEY,
+                   params TEXT NOT NULL,
+                   recipients TEXT,
+                   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+               )""",
+            f"ALTER TABLE predictions ADD COLUMN IF NOT EXISTS profile TEXT NOT NULL DEFAULT '{DEFAULT_PROFILE}'",
+            "ALTER TABLE predictions DROP CONSTRAINT IF EXISTS predictions_target_date_stock_key",
+            "ALTER TABLE predictions ADD CONSTRAINT predictions_target_date_stock_profile_key "
+            "UNIQUE (target_date, stock, profile)",
+        ],
+        [
+            """CREATE TABLE IF NOT EXISTS profiles (
+                   name TEXT PRIMARY KEY,
+                   params TEXT NOT NULL,
+                   recipients TEXT,
+                   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+               )""",
+            f"ALTER TABLE predictions ADD COLUMN profile TEXT NOT NULL DEFAULT '{DEFAULT_PROFILE}'",
+            lambda cur: _sqlite_rebuild_predictions_unique(
+                cur, ("target_date", "stock"), ("target_date", "stock", "profile")
+            ),
+        ],
+    ),
+    (
+        10,
+        "strategy registry: predictions unique per (target_date, stock, profile, strategy), features.strategy_scores",
+        [
+            f"ALTER TABLE predictions ADD COLUMN IF NOT EXISTS strategy TEXT NOT NULL DEFAULT '{DEFAULT_STRATEGY}'",
+            "ALTER TABLE predictions DROP CONSTRAINT IF EXISTS predictions_target_date_stock_profile_key",
+            f"ALTER TABLE predictions ADD CONSTRAINT {_PREDICTIONS_UNIQUE_NAME} UNIQUE ({', '.join(_PREDICTIONS_UNIQUE_COLS)})",
+            "ALTER TABLE features ADD COLUMN IF NOT EXISTS strategy_scores TEXT",
+        ],
+        [
+            f"ALTER TABLE predictions ADD COLUMN strategy TEXT NOT NULL DEFAULT '{DEFAULT_STRATEGY}'",
+            lambda cur: _sqlite_rebuild_predictions_unique(
+                cur, ("target_date", "stock", "profile"), _PREDICTIONS_UNIQUE_COLS
+            ),
+            "ALTER TABLE features ADD COLUMN strategy_scores TEXT",
+        ],
+    ),
+    (
+        11,
+        "ticker failure registry (negative cache for dead / delisted symbols)",
+        [
+            """CREATE TABLE IF NOT EXISTS ticker_failures (
+                   stock TEXT PRIMARY KEY,
+                   failures INTEGER NOT NULL,
+                   first_failed DATE NOT NULL,
+                   last_failed DATE NOT NULL,
+                   next_probe DATE,
+                   last_error TEXT,
+                   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+               )""",
+        ],
+        [
+            """CREATE TABLE IF NOT EXISTS ticker_failures (
+                   stock TEXT PRIMARY KEY,
+                   failures INTEGER NOT NULL,
+                   first_failed DATE NOT NULL,
+                   last_failed DATE NOT NULL,
+                   next_probe DATE,
+                   last_error TEXT,
+                   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+               )""",
+        ],
+    ),
+    (
+        12,
+        "bootstrap win-rate interval on model_metrics",
+        [
+            "ALTER TABLE model_metrics ADD COLUMN IF NOT EXISTS win_rate_ci_low REAL",
+            "ALTER TABLE model_metrics ADD COLUMN IF NOT EXISTS win_rate_ci_high REAL",
+            "ALTER TABLE model_metrics ADD COLUMN IF NOT EXISTS ci_sessions INTEGER",
+            "ALTER TABLE model_metrics ADD COLUMN IF NOT EXISTS degradation_prob REAL",
+        ],
+        [
+            "ALTER TABLE model_metrics ADD COLUMN win_rate_ci_low REAL",
+            "ALTER TABLE model_metrics ADD COLUMN win_rate_ci_high REAL",
+            "ALTER TABLE model_metrics ADD COLUMN ci_sessions INTEGER",
+            "ALTER TABLE model_metrics ADD COLUMN degradation_prob REAL",
+        ],
+    ),
+    (
+        13,
+        "keyset pagination indexes on (date, id) for the history endpoints",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_predictions_target_date_id ON predictions (target_date, id)",
+            "CREATE INDEX IF NOT EXISTS idx_model_metrics_eval_date_id ON model_metrics (eval_date, id)",
+        ],
+        [
+            "CREATE INDEX IF NOT EXISTS idx_predictions_target_date_id ON predictions (target_date, id)",
+            "CREATE INDEX IF NOT EXISTS idx_model_metrics_eval_date_id ON model_metrics (eval_date, id)",
+        ],
+    ),
+    (
+        14,
+        "prediction result cache and features.updated_at (the cache's data as-of)",
+        [
+            "ALTER TABLE features ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP",
+            """CREATE TABLE IF NOT EXISTS prediction_cache (
+                   target_date DATE PRIMARY KEY,
+                   prediction_date DATE NOT NULL,
+                   cache_key TEXT NOT NULL,
+                   data_as_of TEXT,
+                   params_version INTEGER,
+                   universe_hash TEXT,
+                   result TEXT NOT NULL,
+                   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+               )""",
+        ],
+        [
+            "ALTER TABLE features ADD COLUMN updated_at TIMESTAMP",
+            """CREATE TABLE IF NOT EXISTS prediction_cache (
+                   target_date DATE PRIMARY KEY,
+                   prediction_date DATE NOT NULL,
+                   cache_key TEXT NOT NULL,
+                   data_as_of TEXT,
+                   params_version INTEGER,
+                   universe_hash TEXT,
+                   result TEXT NOT NULL,
+                   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+               )""",
+        ],
+    ),
+]
+
+
+def _apply_migrations() -> list[int]:
+    """Apply pending schema migrations. Returns the versions applied."""
+    applied: list[int] = []
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cur.execute("SELECT version FROM schema_migrations")
+        done = {int(r["version"]) for r in cur.fetchall()}
+        for version, description, pg_statements, sqlite_statements in _MIGRATIONS:
+            if version in done:
+                continue
+            logger.info(f"Applying schema migration {version}: {description}")
+            for stmt in pg_statements if USE_POSTGRES else sqlite_statements:
+                if callable(stmt):
+                    stmt(cur)
+                else:
+                    cur.execute(stmt)
+            if USE_POSTGRES:
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                    (version, description),
+                )
+            else:
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, description) VALUES (?, ?)",
+                    (version, description),
+                )
+            # Commit per version so a failure leaves earlier migrations recorded
+            conn.commit()
+            applied.append(version)
+    return applied
+
+
+def get_schema_version() -> int:
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT MAX(version) AS v FROM schema_migrations")
+        row = cur.fetchone()
+    return int(row["v"]) if row and row["v"] is not None else 0
+
+
+
+
+def _predictions_is_partitioned(cur) -> bool:
+    cur.execute(
+        "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = 'predictions' AND n.nspname = current_schema()"
+    )
+    row = cur.fetchone()
+    return bool(row) and row["relkind"] == "p"
+
+
+def partition_predictions(first_year: Optional[int] = None, last_year: Optional[int] = None):
+    """
+    PostgreSQL only: convert predictions into a table range-partitioned by
+    target_date with one partition per year plus a DEFAULT partition.
+
+    Safe to call repeatedly: an already-partitioned table only gets any
+    missing yearly partitions up to last_year (default: next year).
+    """
+    if not USE_POSTGRES:
+        logger.info("Partitioning is only supported on PostgreSQL — skipping.")
+        return
+    last_year = last_year or date.today().year + 1
+    with _connect() as conn:
+        cur = conn.cursor()
+        if not _predictions_is_partitioned(cur):
+            cur.execute("SELECT MIN(target_date) AS lo FROM predictions")
+            row = cur.fetchone()
+            lo = row["lo"] if row else None
+            first_year = first_year or (lo.year if lo else date.today().year)
+            logger.info(f"Partitioning predictions by target_date ({first_year}–{last_year})")
+            cur.execute("ALTER TABLE predictions RENAME TO predictions_legacy")
+            # Free the constraint names for the new table, and remember the
+            # secondary indexes so they can be rebuilt on the partitioned parent
+            cur.execute(
+                "SELECT conname FROM pg_constraint "
+                "WHERE conrelid = 'predictions_legacy'::regclass AND contype IN ('p', 'u')"
+            )
+            for r in cur.fetchall():
+                cur.execute(f'ALTER TABLE predictions_legacy RENAME CONSTRAINT "{r["conname"]}" TO "{r["conname"]}_legacy"')
+            cur.execute(
+                "SELECT indexdef FROM pg_indexes "
+                "WHERE tablename = 'predictions_legacy' AND schemaname = current_schema() "
+                "AND indexdef NOT LIKE 'CREATE UNIQUE INDEX%'"
+            )
+            index_defs = [r["indexdef"] for r in cur.fetchall()]
+            cur.execute(
+                "CREATE TABLE predictions (LIKE predictions_legacy INCLUDING DEFAULTS) "
+                "PARTITION BY RANGE (target_date)"
+            )
+            cur.execute("ALTER TABLE predictions ADD PRIMARY KEY (id, target_date)")
+            cur.execute(
+                f"ALTER TABLE predictions ADD CONSTRAINT {_PREDICTIONS_UNIQUE_NAME} "
+                f"UNIQUE ({', '.join(_PREDICTIONS_UNIQUE_COLS)})"
+            )
+            cur.execute("CREATE TABLE IF NOT EXISTS predictions_default PARTITION OF predictions DEFAULT")
+            _create_year_partitions(cur, first_year, last_year)
+            cur.execute("INSERT INTO predictions SELECT * FROM predictions_legacy")
+            # Keep the id sequence alive when the legacy table is dropped
+            cur.execute("ALTER SEQUENCE predictions_id_seq OWNED BY NONE")
+            cur.execute("DROP TABLE predictions_legacy")
+            cur.execute("ALTER SEQUENCE predictions_id_seq OWNED BY predictions.id")
+            for index_def in index_defs:
+                cur.execute(index_def.replace(".predictions_legacy ", ".predictions "))
+        else:
+            _create_year_partitions(cur, first_year or date.today().year, last_year)
+
+
+def _create_year_partitions(cur, first_year: int, last_year: int):
+    for year in range(first_year, last_year + 1):
+        cur.execute(
+            f"CREATE TABLE IF NOT EXISTS predictions_y{year} PARTITION OF predictions "
+            f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+        )
+
+
+# ---------------------------------------------------------------------------
+# Query profiling
+# ---------------------------------------------------------------------------
+# _connect hands out a thin proxy around the driver connection whose cursors
+# time every statement. A statement's latency runs from execute() through the
+# fetches that follow it (SQLite steps lazily, so most of a SELECT's cost is
+# in fetchall), and is recorded when the cursor moves on to the next
+# statement, is closed, or the connection is released. Stats are keyed by the
+# statement text with whitespace collapsed and placeholder/VALUES lists
+# folded, so "IN (?, ?, ?)" of any length is one entry.
+
+# Histogram bucket upper bounds (ms); the last bucket is open-ended
+QUERY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+_SLOW_LOG_SIZE = 50
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+_WS_RE = re.compile(r"\s+")
+_PARAM_LIST_RE = re.compile(r"(?:\?|%s)(?:\s*,\s*(?:\?|%s))+")
+_VALUES_RE = re.compile(r"\bVALUES\b", re.IGNORECASE)
+_VALUES_END_RE = re.compile(r"\)\s*(?=ON CONFLICT\b|RETURNING\b|$)", re.IGNORECASE)
+
+_STATS_LOCK = threading.Lock()
+_STATS: dict[str, dict] = {}
+_SLOW_QUERIES: deque = deque(maxlen=_SLOW_LOG_SIZE)
+_EXPLAINED: set[str] = set()
+_STATS_PID: Optional[int] = None
+_STATS_SINCE: Optional[str] = None
+_STATS_FILE: Optional[str] = None
+_STATS_FLUSHED_AT = 0.0
+
+
+@lru_cache(maxsize=2048)
+def _normalize_text(text: str) -> str:
+    text = _WS_RE.sub(" ", text).strip()
+    return _PARAM_LIST_RE.sub("…", text)
+
+
+def _normalize_statement(query) -> str:
+    if isinstance(query, bytes):
+        # execute_values pages arrive pre-rendered: fold the literal rows
+        text = query.decode("utf-8", errors="replace")
+        m = _VALUES_RE.search(text)
+        if m:
+            tail = list(_VALUES_END_RE.finditer(text, m.end()))
+            rest = text[tail[0].end():] if tail else ""
+            text = f"{text[:m.end()]} (…){' ' + rest if rest else ''}"
+        return _normalize_text(text)
+    return _normalize_text(query)
+
+
+def _ensure_stats_process():
+    # Called with _STATS_LOCK held. A forked worker starts from empty stats
+    # instead of re-reporting what the master ran before the fork.
+    global _STATS_PID, _STATS_SINCE, _STATS_FILE, _STATS_FLUSHED_AT
+    if _STATS_PID != os.getpid():
+        _STATS.clear()
+        _SLOW_QUERIES.clear()
+        _EXPLAINED.clear()
+        _STATS_PID = os.getpid()
+        _STATS_SINCE = _utcnow()
+        _STATS_FILE = f"{_STATS_PID}-{uuid.uuid4().hex[:8]}.json"
+        _STATS_FLUSHED_AT = time.monotonic()
+
+
+def _record_query(statement: str, elapsed_ms: float, rows: int, error: bool = False) -> bool:
+    """Add one execution to the stats; returns True when it was slow and not yet explained."""
+    flush = False
+    with _STATS_LOCK:
+        _ensure_stats_process()
+        s = _STATS.get(statement)
+        if s is None:
+            s = _STATS[statement] = {
+                "calls": 0, "errors": 0, "rows": 0, "total_ms": 0.0, "max_ms": 0.0,
+                "buckets": [0] * (len(QUERY_BUCKETS_MS) + 1),
+            }
+        s["calls"] += 1
+        s["errors"] += int(error)
+        s["rows"] += rows
+        s["total_ms"] += elapsed_ms
+        s["max_ms"] = max(s["max_ms"], elapsed_ms)
+        s["buckets"][bisect_left(QUERY_BUCKETS_MS, elapsed_ms)] += 1
+        slow = elapsed_ms >= DB_SLOW_QUERY_MS and not error
+        if slow:
+            _SLOW_QUERIES.append({"at": _utcnow(), "ms": round(elapsed_ms, 2), "rows": rows, "statement": statement})
+        explain = slow and DB_EXPLAIN_SLOW and statement not in _EXPLAINED
+        if explain:
+            _EXPLAINED.add(statement)
+        if time.monotonic() - _STATS_FLUSHED_AT >= DB_STATS_FLUSH_SECONDS:
+            flush = True
+    if slow:
+        logger.warning(f"Slow query ({elapsed_ms:.0f} ms, {rows} rows): {statement[:500]}")
+    if flush:
+        flush_query_stats()
+    return explain
+
+
+def _explain(raw_conn, query, params):
+    """Log the plan of a slow statement, without disturbing the caller's transaction."""
+    text = query.decode("utf-8", errors="replace") if isinstance(query, bytes) else query
+    if not text.lstrip().upper().startswith(_EXPLAINABLE):
+        return
+    cur = raw_conn.cursor()
+    try:
+        if USE_POSTGRES:
+            # A failing EXPLAIN must not abort the open transaction
+            cur.execute("SAVEPOINT query_profiler_explain")
+            try:
+                cur.execute("EXPLAIN " + text, params)
+                plan = [next(iter(r.values())) for r in cur.fetchall()]
+            except Exception:
+                cur.execute("ROLLBACK TO SAVEPOINT query_profiler_explain")
+                raise
+            finally:
+                cur.execute("RELEASE SAVEPOINT query_profiler_explain")
+        else:
+            cur.execute("EXPLAIN QUERY PLAN " + text, params or ())
+            plan = [r["detail"] for r in cur.fetchall()]
+    except Exception as e:
+        logger.debug(f"EXPLAIN failed: {e}")
+        return
+    finally:
+        cur.close()
+    plan_text = "\n    ".join(plan)
+    logger.warning(f"Plan for slow query {_normalize_statement(query)[:200]}:\n    {plan_text}")
+    with _STATS_LOCK:
+        for entry in reversed(_SLOW_QUERIES):
+            if entry["statement"] == _normalize_statement(query):
+                entry["plan"] = plan
+                break
+
+
+class _ProfiledCursor:
+    """Cursor proxy that times each statement together with its fetches."""
+
+    def __init__(self, cursor, raw_conn):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_raw_conn", raw_conn)
+        object.__setattr__(self, "_pending", None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+    def _start(self, query, params, run):
+        self._finish()
+        t0 = time.perf_counter()
+        try:
+            result = run()
+        except Exception:
+            _record_query(_normalize_statement(query), (time.perf_counter() - t0) * 1000, 0, error=True)
+            raise
+        rowcount = self._cursor.rowcount
+        # [query, params, elapsed_ms, rows, rows_known_from_rowcount]
+        object.__setattr__(
+            self, "_pending",
+            [query, params, (time.perf_counter() - t0) * 1000, max(rowcount, 0), rowcount is not None and rowcount >= 0],
+        )
+        return self if result is not None else None
+
+    def execute(self, query, params=None):
+        if params is None:
+            return self._start(query, None, lambda: self._cursor.execute(query))
+        return self._start(query, params, lambda: self._cursor.execute(query, params))
+
+    def executemany(self, query, seq):
+        # No EXPLAIN for batches: params=False marks "do not explain"
+        return self._start(query, False, lambda: self._cursor.executemany(query, seq))
+
+    def _fetch(self, fn, count, *args):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        pending = self._pending
+        if pending is not None:
+            pending[2] += (time.perf_counter() - t0) * 1000
+            if not pending[4]:
+                pending[3] += count(result)
+        return result
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone, lambda row: int(row is not None))
+
+    def fetchmany(self, size=None):
+        return self._fetch(self._cursor.fetchmany, len, size if size is not None else self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall, len)
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(1000)
+            if not rows:
+                return
+            yield from rows
+
+    def _finish(self):
+        pending = self._pending
+        if pending is None:
+            return
+        object.__setattr__(self, "_pending", None)
+        query, params, elapsed_ms, rows, _ = pending
+        if _record_query(_normalize_statement(query), elapsed_ms, rows) and params is not False:
+            _explain(self._raw_conn, query, params)
+
+    def close(self):
+        self._finish()
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._finish()
+        return self._cursor.__exit__(*exc)
+
+
+class _ProfiledConnection:
+    """Connection proxy whose cursors are _ProfiledCursor."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._cursors: list[_ProfiledCursor] = []
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs) -> _ProfiledCursor:
+        cur = _ProfiledCursor(self._conn.cursor(*args, **kwargs), self._conn)
+        self._cursors.append(cur)
+        return cur
+
+    def execute(self, query, params=None):
+        """sqlite3's Connection.execute shortcut."""
+        return self.cursor().execute(query, params)
+
+    def finish(self):
+        """Record whatever statements are still open on this connection's cursors."""
+        for cur in self._cursors:
+            cur._finish()
+        self._cursors.clear()
+
+
+def flush_query_stats():
+    """Write this process's query stats snapshot to DB_STATS_DIR."""
+    global _STATS_FLUSHED_AT
+    with _STATS_LOCK:
+        if _STATS_PID != os.getpid() or not _STATS:
+            return
+        snapshot = {
+            "pid": _STATS_PID,
+            "host": socket.gethostname(),
+            "since": _STATS_SINCE,
+            "updated_at": _utcnow(),
+            "statements": {k: dict(v, buckets=list(v["buckets"])) for k, v in _STATS.items()},
+            "slow": list(_SLOW_QUERIES),
+        }
+        path = DB_STATS_DIR / _STATS_FILE
+        _STATS_FLUSHED_AT = time.monotonic()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(snapshot))
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"Could not write query stats to {path}: {e}")
+
+
+atexit.register(flush_query_stats)
+
+
+def reset_query_stats(all_processes: bool = False):
+    """Clear this process's query stats; all_processes also deletes every snapshot file."""
+    global _STATS_PID
+    with _STATS_LOCK:
+        own_file = _STATS_FILE if _STATS_PID == os.getpid() else None
+        _STATS_PID = None
+        _ensure_stats_process()
+    if own_file is not None:
+        (DB_STATS_DIR / own_file).unlink(missing_ok=True)
+    if all_processes and DB_STATS_DIR.exists():
+        for path in DB_STATS_DIR.glob("*.json"):
+            path.unlink(missing_ok=True)
+
+
+def _snapshot_is_live(snapshot: dict) -> bool:
+    """Whether the process that wrote snapshot is still running (on this host)."""
+    if snapshot.get("host", socket.gethostname()) != socket.gethostname():
+        return True  # another machine's process: cannot tell
+    try:
+        os.kill(int(snapshot["pid"]), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, KeyError, TypeError, ValueError):
+        return True
+    return True
+
+
+def _bucket_percentile(buckets: list[int], pct: float) -> Optional[float]:
+    total = sum(buckets)
+    if not total:
+        return None
+    rank = pct / 100 * total
+    seen = 0
+    for i, n in enumerate(buckets):
+        seen += n
+        if seen >= rank:
+            return float(QUERY_BUCKETS_MS[i]) if i < len(QUERY_BUCKETS_MS) else None
+    return None
+
+
+def get_query_stats(all_processes: bool = True) -> dict:
+    """
+    Per-statement query stats: calls, errors, rows, total/mean/max ms,
+    histogram-estimated p50/p90/p99 (bucket upper bounds; None past the last
+    bound) and bucket counts, sorted by total time. all_processes merges the
+    snapshots other processes (API workers, the scheduler) have written;
+    snapshots of processes that have exited (CLI runs, recycled workers,
+    restarted schedulers) are deleted instead, so the totals cover live
+    processes only.
+    """
+    with _STATS_LOCK:
+        _ensure_stats_process()
+        own_file = _STATS_FILE
+        snapshots = [{
+            "since": _STATS_SINCE,
+            "statements": {k: dict(v, buckets=list(v["buckets"])) for k, v in _STATS.items()},
+            "slow": list(_SLOW_QUERIES),
+        }]
+    if all_processes and DB_STATS_DIR.exists():
+        for path in DB_STATS_DIR.glob("*.json"):
+            if path.name == own_file:
+                continue
+            try:
+                snapshot = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            if not _snapshot_is_live(snapshot):
+                path.unlink(missing_ok=True)
+                continue
+            snapshots.append(snapshot)
+
+    merged: dict[str, dict] = {}
+    slow: list[dict] = []
+    for snap in snapshots:
+        slow.extend(snap.get("slow", []))
+        for statement, s in snap["statements"].items():
+            m = merged.setdefault(statement, {
+                "calls": 0, "errors": 0, "rows": 0, "total_ms": 0.0, "max_ms": 0.0,
+                "buckets": [0] * (len(QUERY_BUCKETS_MS) + 1),
+            })
+            for key in ("calls", "errors", "rows", "total_ms"):
+                m[key] += s[key]
+            m["max_ms"] = max(m["max_ms"], s["max_ms"])
+            m["buckets"] = [a + b for a, b in zip(m["buckets"], s["buckets"])]
+
+    statements = []
+    for statement, m in merged.items():
+        statements.append({
+            "statement": statement,
+            "calls": m["calls"],
+            "errors": m["errors"],
+            "rows": m["rows"],
+            "total_ms": round(m["total_ms"], 3),
+            "mean_ms": round(m["total_ms"] / m["calls"], 3) if m["calls"] else None,
+            "max_ms": round(m["max_ms"], 3),
+            "p50_ms": _bucket_percentile(m["buckets"], 50),
+            "p90_ms": _bucket_percentile(m["buckets"], 90),
+            "p99_ms": _bucket_percentile(m["buckets"], 99),
+            "buckets": m["buckets"],
+        })
+    statements.sort(key=lambda s: s["total_ms"], reverse=True)
+    slow.sort(key=lambda q: q["at"], reverse=True)
+    return {
+        "since": min((s["since"] for s in snapshots if s.get("since")), default=None),
+        "processes": len(snapshots),
+        "bucket_bounds_ms": list(QUERY_BUCKETS_MS),
+        "slow_threshold_ms": DB_SLOW_QUERY_MS,
+        "statements": statements,
+        "slow": slow[:_SLOW_LOG_SIZE],
+    }
+
+
 @contextmanager
 def _connect():
     if USE_POSTGRES:
-        conn = _get_postgres_conn()
+        pool = _get_pool()
+        conn = pool.getconn()
+        profiled = _ProfiledConnection(conn) if DB_PROFILE else None
+        broken = False
         try:
-            yield conn
+            yield profiled or conn
+            if profiled:
+                profiled.finish()
             conn.commit()
         except Exception:
-            conn.rollback()
+            broken = bool(conn.closed)
+            if not broken:
+                conn.rollback()
             raise
         finally:
-            conn.close()
+            pool.putconn(conn, close=broken or bool(conn.closed))
     else:
         import sqlite3
         conn = sqlite3.connect(str(DB_PATH))
         conn.row_factory = sqlite3.Row
+        profiled = _ProfiledConnection(conn) if DB_PROFILE else None
         try:
-            yield conn
+            yield profiled or conn
+            if profiled:
+                profiled.finish()
             conn.commit()
         finally:
             conn.close()
 
 
+def _utcnow() -> str:
+    """UTC timestamp that sorts correctly against CURRENT_TIMESTAMP defaults."""
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _sql(query: str) -> str:
+    """Adapt a '?'-placeholder statement to the active driver."""
+    return query.replace("?", "%s") if USE_POSTGRES else query
+
+
+def _iter_query(query: str, params: tuple = (), chunk_size: int = 10_000) -> Iterator[list[dict]]:
+    """
+    Stream a SELECT in chunks of dicts. PostgreSQL uses a server-side (named)
+    cursor, so memory stays bounded by chunk_size however large the result.
+    """
+    with _connect() as conn:
+        if USE_POSTGRES:
+            cur = conn.cursor(name=f"stream_{uuid.uuid4().hex[:12]}")
+            cur.itersize = chunk_size
+        else:
+            cur = conn.cursor()
+        cur.execute(_sql(query), params)
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield [dict(r) for r in rows]
+
+
 def _row_to_dict(row: Any) -> dict:
     if hasattr(row, "keys"):
         return dict(row)
@@ -187,153 +1318,330 @@ def _row_to_dict(row: Any) -> dict:
 
 
 def insert_predictions(rows: list[dict]):
+    now = _utcnow()
+    values = [
+        (
+            r["prediction_date"],
+            r["target_date"],
+            r["stock"],
+            r["predicted_entry"],
+            r["predicted_target"],
+            r["predicted_sl"],
+            r.get("score"),
+            r.get("atr"),
+            now,
+            r.get("profile", DEFAULT_PROFILE),
+            r.get("strategy", DEFAULT_STRATEGY),
+        )
+        for r in rows
+    ]
     with _connect() as conn:
         cur = conn.cursor()
         if USE_POSTGRES:
-            for r in rows:
-                cur.execute(
-                    """INSERT INTO predictions
-                       (prediction_date, target_date, stock, predicted_entry, predicted_target, predicted_sl)
-                       VALUES (%s, %s, %s, %s, %s, %s)
-                       ON CONFLICT (target_date, stock) DO UPDATE SET
-                         prediction_date = EXCLUDED.prediction_date,
-                         predicted_entry = EXCLUDED.predicted_entry,
-                         predicted_target = EXCLUDED.predicted_target,
-                         predicted_sl = EXCLUDED.predicted_sl
-                    """,
-                    (
-                        r["prediction_date"],
-                        r["target_date"],
-                        r["stock"],
-                        r["predicted_entry"],
-                        r["predicted_target"],
-                        r["predicted_sl"],
-                    ),
-                )
+            from psycopg2.extras import execute_values
+            execute_values(
+                cur,
+                """INSERT INTO predictions
+                   (prediction_date, target_date, stock, predicted_entry, predicted_target, predicted_sl,
+                    score, atr, updated_at, profile, strategy)
+                   VALUES %s
+                   ON CONFLICT (target_date, stock, profile, strategy) DO UPDATE SET
+                     prediction_date = EXCLUDED.prediction_date,
+                     predicted_entry = EXCLUDED.predicted_entry,
+                     predicted_target = EXCLUDED.predicted_target,
+                     predicted_sl = EXCLUDED.predicted_sl,
+                     score = EXCLUDED.score,
+                     atr = EXCLUDED.atr,
+                     updated_at = EXCLUDED.updated_at
+                """,
+                values,
+                page_size=1000,
+            )
         else:
+            # Upsert (not INSERT OR REPLACE) so the row keeps its id and any recorded outcome
             cur.executemany(
-                """INSERT OR REPLACE INTO predictions
-                   (prediction_date, target_date, stock, predicted_entry, predicted_target, predicted_sl)
-                   VALUES (?, ?, ?, ?, ?, ?)
+                """INSERT INTO predictions
+                   (prediction_date, target_date, stock, predicted_entry, predicted_target, predicted_sl,
+                    score, atr, updated_at, profile, strategy)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(target_date, stock, profile, strategy) DO UPDATE SET
+                     prediction_date = excluded.prediction_date,
+                     predicted_entry = excluded.predicted_entry,
+                     predicted_target = excluded.predicted_target,
+                     predicted_sl = excluded.predicted_sl,
+                     score = excluded.score,
+                     atr = excluded.atr,
+                     updated_at = excluded.updated_at
                 """,
-                [
-                    (
-                        r["prediction_date"],
-                        r["target_date"],
-                        r["stock"],
-                        r["predicted_entry"],
-                        r["predicted_target"],
-                        r["predicted_sl"],
-                    )
-                    for r in rows
-                ],
+                values,
             )
 
 
-def get_predictions_for_date(target_date: date) -> list[dict]:
+def _prediction_filters(query: str, params: tuple, profile: Optional[str], strategy: Optional[str]) -> tuple[str, tuple]:
+    for column, value in (("profile", profile), ("strategy", strategy)):
+        if value is not None:
+            query += f" AND {column} = ?"
+            params += (value,)
+    return query, params
+
+
+def get_predictions_for_date(
+    target_date: date, profile: Optional[str] = None, strategy: Optional[str] = None
+) -> list[dict]:
+    """Predictions for target_date, for every profile and strategy or only one."""
+    query, params = _prediction_filters(
+        "SELECT * FROM predictions WHERE target_date = ?", (target_date.isoformat(),), profile, strategy
+    )
     with _connect() as conn:
         cur = conn.cursor()
-        if USE_POSTGRES:
-            cur.execute(
-                "SELECT * FROM predictions WHERE target_date = %s",
-                (target_date.isoformat(),),
-            )
-            rows = cur.fetchall()
-        else:
-            rows = cur.execute(
-                "SELECT * FROM predictions WHERE target_date = ?",
-                (target_date.isoformat(),),
-            ).fetchall()
+        cur.execute(_sql(query), params)
+        rows = cur.fetchall()
+    return [dict(r) for r in rows]
+
+
+def get_predictions_between(
+    start: date, end: date, profile: Optional[str] = None, strategy: Optional[str] = None
+) -> list[dict]:
+    query, params = _prediction_filters(
+        "SELECT * FROM predictions WHERE target_date BETWEEN ? AND ?",
+        (start.isoformat(), end.isoformat()),
+        profile,
+        strategy,
+    )
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute(_sql(query + " ORDER BY target_date, id"), params)
+        rows = cur.fetchall()
     return [dict(r) for r in rows]
 
 
+# Tables served by iter_history: (date column, tie-breaker) of their keyset order
+HISTORY_TABLES = {
+    "predictions": ("target_date", "id"),
+    "model_metrics": ("eval_date", "id"),
+    "features": ("session_date", "stock"),
+}
+
+
+def _history_query(
+    table: str,
+    start: Optional[date],
+    end: Optional[date],
+    after: Optional[tuple[str, Any]],
+    filters: Optional[dict[str, Any]],
+    limit: Optional[int],
+) -> tuple[str, tuple]:
+    date_col, tie_col = HISTORY_TABLES[table]
+    query, params = f"SELECT * FROM {table} WHERE 1 = 1", ()
+    if start is not None:
+        query, params = query + f" AND {date_col} >= ?", params + (start.isoformat(),)
+    if end is not None:
+        query, params = query + f" AND {date_col} <= ?", params + (end.isoformat(),)
+    if after is not None:
+        # The leading >= keeps the plan a range scan on (date, tie-breaker)
+        query += f" AND {date_col} >= ? AND ({date_col} > ? OR {tie_col} > ?)"
+        params += (after[0], after[0], after[1])
+    for column, value in (filters or {}).items():
+        query, params = query + f" AND {column} = ?", params + (value,)
+    query += f" ORDER BY {date_col}, {tie_col}"
+    if limit is not None:
+        query, params = query + " LIMIT ?", params + (limit,)
+    return query, params
+
+
+def iter_history(
+    table: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    after: Optional[tuple[str, Any]] = None,
+    filters: Optional[dict[str, Any]] = None,
+    limit: Optional[int] = None,
+    chunk_size: int = 1000,
+) -> Iterator[list[dict]]:
+    """
+    Rows of a HISTORY_TABLES table in (date, tie-breaker) order, streamed in
+    chunks of dicts. after is the (date, tie-breaker) of the last row already
+    returned: keyset pagination, so every page is an index range scan however
+    deep it is. filters maps columns to the value they must equal.
+    """
+    yield from _iter_query(*_history_query(table, start, end, after, filters, limit), chunk_size)
+
+
+def iter_history_arrow(
+    table: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    after: Optional[tuple[str, Any]] = None,
+    filters: Optional[dict[str, Any]] = None,
+    limit: Optional[int] = None,
+    chunk_size: int = 10_000,
+):
+    """
+    iter_history as Arrow: (schema, iterator of RecordBatch), one batch per
+    database chunk, typed like the columnar export. Requires pyarrow.
+    """
+    schema = _arrow_schema(table)
+
+    def batches():
+        for rows in iter_history(table, start, end, after, filters, limit, chunk_size):
+            yield from _rows_to_arrow(rows, schema).to_batches()
+
+    return schema, batches()
+
+
 def update_prediction_outcome(prediction_id: int, actuals: dict, outcome: str, reason: str):
+    with _connect() as conn:
+        _write_outcome(conn.cursor(), prediction_id, actuals, outcome, reason)
+
+
+def update_prediction_outcomes(updates: list[dict]):
+    """Bulk form of update_prediction_outcome: dicts with id, actuals, outcome, reason; one transaction."""
     with _connect() as conn:
         cur = conn.cursor()
-        args = (
-            actuals["open"],
-            actuals["high"],
-            actuals["low"],
-            actuals["close"],
-            actuals.get("volume", 0),
-            outcome,
-            reason,
-            prediction_id,
+        for u in updates:
+            _write_outcome(cur, u["id"], u["actuals"], u["outcome"], u["reason"])
+
+
+def _write_outcome(cur, prediction_id: int, actuals: dict, outcome: str, reason: str):
+    cur.execute(
+        _sql("SELECT target_date, stock, outcome, profile, strategy FROM predictions WHERE id = ?"),
+        (prediction_id,),
+    )
+    previous = cur.fetchone()
+    args = (
+        actuals["open"],
+        actuals["high"],
+        actuals["low"],
+        actuals["close"],
+        actuals.get("volume", 0),
+        outcome,
+        reason,
+        _utcnow(),
+        prediction_id,
+    )
+    if USE_POSTGRES:
+        cur.execute(
+            """UPDATE predictions
+               SET actual_open = %s, actual_high = %s, actual_low = %s, actual_close = %s,
+                   actual_volume = %s, outcome = %s, reason = %s, updated_at = %s
+               WHERE id = %s
+            """,
+            args,
         )
-        if USE_POSTGRES:
-            cur.execute(
-                """UPDATE predictions
-                   SET actual_open = %s, actual_high = %s, actual_low = %s, actual_close = %s,
-                       actual_volume = %s, outcome = %s, reason = %s
-                   WHERE id = %s
-                """,
-                args,
-            )
-        else:
-            cur.execute(
-                """UPDATE predictions
-                   SET actual_open = ?, actual_high = ?, actual_low = ?, actual_close = ?,
-                       actual_volume = ?, outcome = ?, reason = ?
-                   WHERE id = ?
-                """,
-                args,
-            )
+    else:
+        cur.execute(
+            """UPDATE predictions
+               SET actual_open = ?, actual_high = ?, actual_low = ?, actual_close = ?,
+                   actual_volume = ?, outcome = ?, reason = ?, updated_at = ?
+               WHERE id = ?
+            """,
+            args,
+        )
+    if previous and (previous["profile"], previous["strategy"]) == _DEFAULT_BOOK_ARGS:
+        _record_outcome_change(
+            cur, str(previous["target_date"]), previous["stock"], previous["outcome"], outcome
+        )
+
+
+def delete_history_between(start: date, end: date):
+    """
+    Remove the default profile's momentum predictions, model_metrics and
+    cached results for target/eval dates in [start, end]. Other profiles'
+    and strategies' predictions are kept: backfill does not rebuild them.
+    """
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            _sql("""SELECT target_date, stock, outcome FROM predictions
+                    WHERE target_date BETWEEN ? AND ? AND outcome IS NOT NULL AND """ + _DEFAULT_BOOK_SQL),
+            (start.isoformat(), end.isoformat(), *_DEFAULT_BOOK_ARGS),
+        )
+        for r in cur.fetchall():
+            _record_outcome_change(cur, str(r["target_date"]), r["stock"], r["outcome"], None)
+        cur.execute(
+            _sql("DELETE FROM predictions WHERE target_date BETWEEN ? AND ? AND " + _DEFAULT_BOOK_SQL),
+            (start.isoformat(), end.isoformat(), *_DEFAULT_BOOK_ARGS),
+        )
+        cur.execute(
+            _sql("DELETE FROM model_metrics WHERE eval_date BETWEEN ? AND ?"),
+            (start.isoformat(), end.isoformat()),
+        )
+        cur.execute(
+            _sql("DELETE FROM prediction_cache WHERE target_date BETWEEN ? AND ?"),
+            (start.isoformat(), end.isoformat()),
+        )
+
+
+_MODEL_METRICS_COLUMNS = (
+    "eval_date", "total_predictions", "target_hit", "sl_hit", "no_entry", "stagnant", "win_rate", "retrained",
+    "win_rate_ci_low", "win_rate_ci_high", "ci_sessions", "degradation_prob",
+)
 
 
 def insert_model_metrics(metrics: dict):
+    """
+    Write the metrics row for metrics["eval_date"], replacing any earlier one
+    for that day. The win-rate interval columns are optional.
+    """
     with _connect() as conn:
         cur = conn.cursor()
-        if USE_POSTGRES:
-            cur.execute(
-                """INSERT INTO model_metrics
-                   (eval_date, total_predictions, target_hit, sl_hit, no_entry, stagnant, win_rate, retrained)
-                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """,
-                (
-                    metrics["eval_date"],
-                    metrics["total_predictions"],
-                    metrics["target_hit"],
-                    metrics["sl_hit"],
-                    metrics["no_entry"],
-                    metrics["stagnant"],
-                    metrics["win_rate"],
-                    metrics["retrained"],
-                ),
-            )
-        else:
-            cur.execute(
-                """INSERT INTO model_metrics
-                   (eval_date, total_predictions, target_hit, sl_hit, no_entry, stagnant, win_rate, retrained)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    metrics["eval_date"],
-                    metrics["total_predictions"],
-                    metrics["target_hit"],
-                    metrics["sl_hit"],
-                    metrics["no_entry"],
-                    metrics["stagnant"],
-                    metrics["win_rate"],
-                    metrics["retrained"],
-                ),
-            )
+        _upsert_rows(
+            cur,
+            "model_metrics",
+            [*_MODEL_METRICS_COLUMNS, "updated_at"],
+            [(*(metrics.get(c) for c in _MODEL_METRICS_COLUMNS), _utcnow())],
+            ("eval_date",),
+        )
+        _refresh_rollups(cur, ROLLUP_SCOPE_ALL)
 
 
-def get_recent_win_rate(lookback: int = 5) -> Optional[float]:
+def get_model_metrics(eval_date: date) -> Optional[dict]:
     with _connect() as conn:
         cur = conn.cursor()
-        if USE_POSTGRES:
-            cur.execute(
-                "SELECT AVG(win_rate) AS avg_wr FROM (SELECT win_rate FROM model_metrics ORDER BY eval_date DESC LIMIT %s) t",
-                (lookback,),
-            )
-        else:
-            cur.execute(
-                "SELECT AVG(win_rate) AS avg_wr FROM (SELECT win_rate FROM model_metrics ORDER BY eval_date DESC LIMIT ?) t",
-                (lookback,),
-            )
+        cur.execute(_sql("SELECT * FROM model_metrics WHERE eval_date = ?"), (eval_date.isoformat(),))
         row = cur.fetchone()
-    return float(row["avg_wr"]) if row and row["avg_wr"] is not None else None
+    return dict(row) if row else None
+
+
+def get_model_metrics_history(before: date, limit: int, after: Optional[date] = None) -> list[dict]:
+    """
+    The last limit model_metrics rows with eval_date before `before` (and
+    after `after`, if given), oldest first.
+    """
+    where, params = "eval_date < ?", [before.isoformat()]
+    if after is not None:
+        where += " AND eval_date > ?"
+        params.append(after.isoformat())
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            _sql(f"SELECT * FROM model_metrics WHERE {where} ORDER BY eval_date DESC LIMIT ?"),
+            (*params, limit),
+        )
+        rows = cur.fetchall()
+    return [dict(r) for r in reversed(rows)]
+
+
+def get_last_retrain_date(before: date) -> Optional[date]:
+    """
+    The latest day before `before` on which the model changed or a retrain
+    was queued: the later of the last model_metrics row with retrained set
+    and the last parameter publication (other than the initial one).
+    """
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            _sql("SELECT MAX(eval_date) AS d FROM model_metrics WHERE retrained = 1 AND eval_date < ?"),
+            (before.isoformat(),),
+        )
+        queued = cur.fetchone()["d"]
+        cur.execute(
+            _sql("SELECT MAX(created_at) AS d FROM model_param_versions WHERE source <> 'initial' AND created_at < ?"),
+            (before.isoformat(),),
+        )
+        published = cur.fetchone()["d"]
+    days = [date.fromisoformat(str(d)[:10]) for d in (queued, published) if d is not None]
+    return max(days, default=None)
 
 
 def get_model_param(param_name: str) -> Optional[float]:
@@ -348,38 +1656,24 @@ def get_model_param(param_name: str) -> Optional[float]:
 
 
 def set_model_param(param_name: str, value: float):
+    """Change one parameter, publishing the result as a new version."""
     with _connect() as conn:
         cur = conn.cursor()
-        now = datetime.utcnow().isoformat()
-        if USE_POSTGRES:
-            cur.execute(
-                """INSERT INTO model_params (param_name, param_value, updated_at)
-                   VALUES (%s, %s, %s)
-                   ON CONFLICT (param_name) DO UPDATE SET
-                     param_value = EXCLUDED.param_value,
-                     updated_at = EXCLUDED.updated_at
-                """,
-                (param_name, value, now),
-            )
-        else:
-            cur.execute(
-                """INSERT INTO model_params (param_name, param_value, updated_at)
-                   VALUES (?, ?, ?)
-                   ON CONFLICT(param_name) DO UPDATE SET
-                     param_value = excluded.param_value,
-                     updated_at = excluded.updated_at
-                """,
-                (param_name, value, now),
-            )
+        params = _current_params(cur)
+        params[param_name] = value
+        _publish_params(cur, params, f"set:{param_name}")
 
 
 def get_all_model_params() -> dict[str, float]:
     with _connect() as conn:
         cur = conn.cursor()
-        cur.execute("SELECT param_name, param_value FROM model_params")
-        rows = cur.fetchall()
+        return _current_params(cur)
+
+
+def _current_params(cur) -> dict[str, float]:
+    cur.execute("SELECT param_name, param_value FROM model_params")
     out = dict(DEFAULT_MODEL_PARAMS)
-    for r in rows:
+    for r in cur.fetchall():
         out[r["param_name"]] = float(r["param_value"])
     return out
 
@@ -389,25 +1683,952 @@ def get_predictions_with_outcomes(limit: int = 60) -> list[dict]:
         cur = conn.cursor()
         if USE_POSTGRES:
             cur.execute(
-                """SELECT id, target_date, stock, predicted_entry, predicted_target, predicted_sl,
-                          actual_high, actual_low, outcome
+                """SELECT id, prediction_date, target_date, stock, predicted_entry, predicted_target, predicted_sl,
+                          atr, actual_high, actual_low, outcome
                    FROM predictions
                    WHERE outcome IS NOT NULL AND actual_high IS NOT NULL AND actual_low IS NOT NULL
+                     AND profile = %s AND strategy = %s
                    ORDER BY target_date DESC
                    LIMIT %s
                 """,
-                (limit,),
+                (*_DEFAULT_BOOK_ARGS, limit),
             )
         else:
             cur.execute(
-                """SELECT id, target_date, stock, predicted_entry, predicted_target, predicted_sl,
-                          actual_high, actual_low, outcome
+                """SELECT id, prediction_date, target_date, stock, predicted_entry, predicted_target, predicted_sl,
+                          atr, actual_high, actual_low, outcome
                    FROM predictions
                    WHERE outcome IS NOT NULL AND actual_high IS NOT NULL AND actual_low IS NOT NULL
+                     AND profile = ? AND strategy = ?
                    ORDER BY target_date DESC
                    LIMIT ?
                 """,
-                (limit,),
+                (*_DEFAULT_BOOK_ARGS, limit),
+            )
+        rows = cur.fetchall()
+    return [dict(r) for r in rows]
+
+
+# ---------------------------------------------------------------------------
+# Rolling performance aggregates
+# ---------------------------------------------------------------------------
+# outcome_daily holds per-session outcome counts for every stock and for the
+# whole book (scope ROLLUP_SCOPE_ALL), counting only the default profile and
+# strategy's predictions. It is adjusted by deltas whenever an outcome is
+# written, and performance_rollups is refreshed from at most
+# max(ROLLUP_WINDOWS) of those rows, so readers get precomputed numbers and
+# writers never scan the predictions table. A window of N covers the last N
+# sessions in which that scope had resolved predictions.
+
+ROLLUP_SCOPE_ALL = "__all__"
+
+_OUTCOME_COLUMNS = {
+    "TARGET HIT": "target_hit",
+    "STOP LOSS HIT": "sl_hit",
+    "NO ENTRY": "no_entry",
+    "STAGNANT": "stagnant",
+}
+
+
+def _record_outcome_change(cur, session_date: str, stock: str, old: Optional[str], new: Optional[str]):
+    """Apply an outcome transition (old -> new) to the daily counts and rollups."""
+    if old == new:
+        return
+    for scope in (stock, ROLLUP_SCOPE_ALL):
+        cur.execute(
+            _sql("""INSERT INTO outcome_daily (session_date, scope) VALUES (?, ?)
+                    ON CONFLICT (scope, session_date) DO NOTHING"""),
+            (session_date, scope),
+        )
+        for outcome, sign in ((old, -1), (new, 1)):
+            column = _OUTCOME_COLUMNS.get(outcome or "")
+            if column is None:
+                continue
+            cur.execute(
+                _sql(f"""UPDATE outcome_daily
+                         SET {column} = {column} + ?, total = total + ?
+                         WHERE scope = ? AND session_date = ?"""),
+                (sign, sign, scope, session_date),
+            )
+        _refresh_rollups(cur, scope)
+
+
+def _refresh_rollups(cur, scope: str):
+    """Recompute every window for one scope from its most recent daily rows."""
+    cur.execute(
+        _sql("""SELECT session_date, target_hit, sl_hit, no_entry, stagnant, total
+                FROM outcome_daily
+                WHERE scope = ? AND total > 0
+                ORDER BY session_date DESC
+                LIMIT ?"""),
+        (scope, max(ROLLUP_WINDOWS)),
+    )
+    days = [dict(r) for r in cur.fetchall()]
+    now = datetime.utcnow().isoformat()
+    for window in ROLLUP_WINDOWS:
+        recent = days[:window]
+        sums = {c: sum(d[c] for d in recent) for c in ("target_hit", "sl_hit", "no_entry", "stagnant", "total")}
+        win_rate = round(sums["target_hit"] / sums["total"], 4) if sums["total"] else None
+        as_of = str(recent[0]["session_date"]) if recent else None
+        cur.execute(
+            _sql("""INSERT INTO performance_rollups
+                    (scope, window_days, target_hit, sl_hit, no_entry, stagnant, total, win_rate, as_of, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (scope, window_days) DO UPDATE SET
+                      target_hit = excluded.target_hit,
+                      sl_hit = excluded.sl_hit,
+                      no_entry = excluded.no_entry,
+                      stagnant = excluded.stagnant,
+                      total = excluded.total,
+                      win_rate = excluded.win_rate,
+                      as_of = excluded.as_of,
+                      updated_at = excluded.updated_at"""),
+            (
+                scope, window, sums["target_hit"], sums["sl_hit"], sums["no_entry"],
+                sums["stagnant"], sums["total"], win_rate, as_of, now,
+            ),
+        )
+
+
+def _rebuild_performance_rollups(cur, default_book: bool = True):
+    """
+    Rebuild outcome_daily and performance_rollups from the default profile and
+    strategy's predictions (default_book False: every row).
+    """
+    cur.execute("DELETE FROM outcome_daily")
+    cur.execute("DELETE FROM performance_rollups")
+    counts = ", ".join(
+        f"SUM(CASE WHEN outcome = '{o}' THEN 1 ELSE 0 END)" for o in _OUTCOME_COLUMNS
+    )
+    columns = ", ".join(_OUTCOME_COLUMNS.values())
+    where = "outcome IS NOT NULL" + (f" AND {_DEFAULT_BOOK_SQL}" if default_book else "")
+    book_args = _DEFAULT_BOOK_ARGS if default_book else ()
+    cur.execute(
+        _sql(f"""INSERT INTO outcome_daily (session_date, scope, {columns}, total)
+                 SELECT target_date, stock, {counts}, COUNT(*)
+                 FROM predictions WHERE {where}
+                 GROUP BY target_date, stock"""),
+        book_args,
+    )
+    cur.execute(
+        _sql(f"""INSERT INTO outcome_daily (session_date, scope, {columns}, total)
+                 SELECT target_date, ?, {counts}, COUNT(*)
+                 FROM predictions WHERE {where}
+                 GROUP BY target_date"""),
+        (ROLLUP_SCOPE_ALL, *book_args),
+    )
+    cur.execute("SELECT DISTINCT scope FROM outcome_daily")
+    for r in cur.fetchall():
+        _refresh_rollups(cur, r["scope"])
+
+
+def rebuild_performance_rollups():
+    with _connect() as conn:
+        _rebuild_performance_rollups(conn.cursor())
+
+
+def get_rolling_win_rate(window: int, scope: str = ROLLUP_SCOPE_ALL) -> Optional[float]:
+    """Precomputed win rate over the last `window` sessions (see ROLLUP_WINDOWS)."""
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            _sql("SELECT win_rate FROM performance_rollups WHERE scope = ? AND window_days = ?"),
+            (scope, window),
+        )
+        row = cur.fetchone()
+    return float(row["win_rate"]) if row and row["win_rate"] is not None else None
+
+
+def get_performance_rollups(scope: Optional[str] = None) -> list[dict]:
+    """All rollup rows, or only those for one scope (a ticker or ROLLUP_SCOPE_ALL)."""
+    with _connect() as conn:
+        cur = conn.cursor()
+        if scope is None:
+            cur.execute("SELECT * FROM performance_rollups ORDER BY scope, window_days")
+        else:
+            cur.execute(
+                _sql("SELECT * FROM performance_rollups WHERE scope = ? ORDER BY window_days"),
+                (scope,),
+            )
+        rows = cur.fetchall()
+    return [dict(r) for r in rows]
+
+
+# ---------------------------------------------------------------------------
+# Columnar export / import (Parquet or Arrow IPC)
+# ---------------------------------------------------------------------------
+# Rows are streamed in chunks and written as one file per chunk and month,
+# e.g. <dir>/predictions/month=2026-01/part-20260201T103000-00000.parquet.
+# <dir>/_export_state.json keeps the highest COALESCE(updated_at, created_at)
+# exported per table, so the next incremental run only moves rows written
+# since. Requires pyarrow.
+
+EXPORT_TABLES = {
+    # table: date column used for the month partition
+    "predictions": "target_date",
+    "model_metrics": "eval_date",
+}
+
+_EXPORT_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError("Columnar export/import needs pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+def _table_columns(table: str) -> list[tuple[str, str]]:
+    """(name, declared type) for every column of a table, in order."""
+    with _connect() as conn:
+        cur = conn.cursor()
+        if USE_POSTGRES:
+            cur.execute(
+                """SELECT column_name AS name, data_type AS type FROM information_schema.columns
+                   WHERE table_name = %s AND table_schema = current_schema()
+                   ORDER BY ordinal_position""",
+                (table,),
             )
+        else:
+            cur.execute(f"PRAGMA table_info({table})")
+        return [(r["name"], r["type"]) for r in cur.fetchall()]
+
+
+def _arrow_schema(table: str):
+    pa = _require_pyarrow()
+    mapping = [
+        ("timestamp", pa.timestamp("us")),
+        ("date", pa.date32()),
+        ("int", pa.int64()),
+        ("serial", pa.int64()),
+        ("real", pa.float64()),
+        ("double", pa.float64()),
+        ("numeric", pa.float64()),
+    ]
+    fields = []
+    for name, declared in _table_columns(table):
+        declared = declared.lower()
+        arrow_type = next((t for key, t in mapping if key in declared), pa.string())
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def _rows_to_arrow(rows: list[dict], schema):
+    """Build an Arrow table with a fixed schema (SQLite hands back dates as text)."""
+    import pandas as pd
+
+    pa = _require_pyarrow()
+    frame = pd.DataFrame(rows, columns=schema.names)
+    arrays = []
+    for field in schema:
+        col = frame[field.name]
+        if pa.types.is_timestamp(field.type) or pa.types.is_date(field.type):
+            arr = pa.array(pd.to_datetime(col, format="ISO8601"), type=pa.timestamp("us"), from_pandas=True)
+            arrays.append(arr.cast(field.type))
+        elif pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            arrays.append(pa.array(pd.to_numeric(col), type=field.type, from_pandas=True))
+        else:
+            arrays.append(pa.array(col.astype(object).where(col.notna(), None), type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _write_columnar(table, path: Path, fmt: str):
+    pa = _require_pyarrow()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, path, compression="zstd")
+    else:
+        with pa.ipc.new_file(str(path), table.schema) as writer:
+            writer.write_table(table)
+
+
+def export_history(
+    out_dir: Path, fmt: str = "parquet", incremental: bool = True, chunk_size: int = 50_000
+) -> dict[str, int]:
+    """
+    Export predictions and model_metrics as month-partitioned columnar files.
+    incremental: only rows written since the last export into out_dir.
+    Returns rows exported per table.
+    """
+    if fmt not in _EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}' (use {', '.join(_EXPORT_FORMATS)})")
+    _require_pyarrow()
+    import pyarrow.compute as pc
+
+    out_dir = Path(out_dir)
+    state_path = out_dir / "_export_state.json"
+    state = json.loads(state_path.read_text()) if incremental and state_path.exists() else {}
+    run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    exported: dict[str, int] = {}
+
+    for table, date_column in EXPORT_TABLES.items():
+        schema = _arrow_schema(table)
+        since = state.get(table)
+        query = f"SELECT *, COALESCE(updated_at, created_at) AS _watermark FROM {table}"
+        params: tuple = ()
+        if since:
+            query += " WHERE COALESCE(updated_at, created_at) > ?"
+            params = (since,)
+        query += " ORDER BY COALESCE(updated_at, created_at), id"
+
+        count = 0
+        for chunk_no, rows in enumerate(_iter_query(query, params, chunk_size)):
+            since = str(rows[-1]["_watermark"])
+            arrow_table = _rows_to_arrow(rows, schema)
+            months = pc.fill_null(pc.strftime(arrow_table.column(date_column), format="%Y-%m"), "unknown")
+            for month in pc.unique(months).to_pylist():
+                part = arrow_table.filter(pc.equal(months, month))
+                path = out_dir / table / f"month={month}" / f"part-{run_id}-{chunk_no:05d}{_EXPORT_FORMATS[fmt]}"
+                _write_columnar(part, path, fmt)
+            count += len(rows)
+
+        if since:
+            state[table] = since
+        exported[table] = count
+        logger.info(f"Exported {count} {table} rows to {out_dir / table}")
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    state_path.write_text(json.dumps(state, indent=2))
+    return exported
+
+
+def _read_columnar(path: Path):
+    pa = _require_pyarrow()
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+        return pq.read_table(path)
+    with pa.ipc.open_file(str(path)) as reader:
+        return reader.read_all()
+
+
+def _db_value(value: Any) -> Any:
+    if not USE_POSTGRES and isinstance(value, (date, datetime)):
+        return str(value)
+    return value
+
+
+_IMPORT_KEY_DEFAULTS = {"profile": DEFAULT_PROFILE, "strategy": DEFAULT_STRATEGY}
+
+
+def import_history(in_dir: Path, batch_size: int = 10_000) -> dict[str, int]:
+    """
+    Bulk re-import files written by export_history. Predictions are upserted on
+    (target_date, stock, profile, strategy) and model_metrics on eval_date. Files are
+    applied oldest export first, so the latest wins. Exports from before
+    profiles or strategies existed import as the default profile and
+    strategy.
+    """
+    in_dir = Path(in_dir)
+    imported: dict[str, int] = {}
+    for table in EXPORT_TABLES:
+        target_columns = {name for name, _ in _table_columns(table)}
+        key = _PREDICTIONS_UNIQUE_COLS if table == "predictions" else ("eval_date",)
+        files = sorted(
+            (p for ext in _EXPORT_FORMATS.values() for p in (in_dir / table).glob(f"*/*{ext}")),
+            key=lambda p: p.name,
+        )
+        count = 0
+        with _connect() as conn:
+            cur = conn.cursor()
+            for path in files:
+                arrow_table = _read_columnar(path)
+                columns = [c for c in arrow_table.column_names if c in target_columns and c != "id"]
+                # Exports from before profiles / strategies lack those key columns
+                missing_key = [k for k in key if k not in columns and k in _IMPORT_KEY_DEFAULTS]
+                fill = tuple(_IMPORT_KEY_DEFAULTS[k] for k in missing_key)
+                for batch in arrow_table.select(columns).to_batches(max_chunksize=batch_size):
+                    rows = [tuple(_db_value(v) for v in row.values()) + fill for row in batch.to_pylist()]
+                    # Older exports can repeat a key; one statement may touch each key only once
+                    idx = [(columns + missing_key).index(k) for k in key]
+                    rows = list({tuple(r[i] for i in idx): r for r in rows}.values())
+                    _upsert_rows(cur, table, columns + missing_key, rows, key)
+                    count += len(rows)
+        imported[table] = count
+        logger.info(f"Imported {count} {table} rows from {len(files)} files")
+    rebuild_performance_rollups()
+    return imported
+
+
+def _upsert_rows(cur, table: str, columns: list[str], rows: list[tuple], key: tuple[str, ...]):
+    updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c not in key)
+    if USE_POSTGRES:
+        from psycopg2.extras import execute_values
+        execute_values(
+            cur,
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s "
+            f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET {updates}",
+            rows,
+            page_size=1000,
+        )
+    else:
+        cur.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET {updates}",
+            rows,
+        )
+
+
+# ---------------------------------------------------------------------------
+# Daily feature store
+# ---------------------------------------------------------------------------
+# One row per (session_date, stock) for every ticker scored that day: the
+# indicator values as of that session's close plus the score. A prediction's
+# features are the row at (prediction_date, stock). score is the default
+# strategy's; strategy_scores holds every enabled strategy's as JSON
+# ({strategy: score}).
+
+FEATURE_COLUMNS = (
+    "close", "volume", "atr", "rsi", "macd", "macd_signal", "vol_sma20", "vol_ratio", "ema9", "ema20",
+    "ema21", "ema_gap_prev", "high_20", "ema20_dist", "breakout_dist", "score",
+)
+
+
+def insert_features(rows: list[dict]):
+    """Bulk upsert feature rows ({session_date, stock, <FEATURE_COLUMNS>, strategy_scores})."""
+    if not rows:
+        return
+    columns = ["session_date", "stock", *FEATURE_COLUMNS]
+    now = _utcnow()
+    values = [
+        tuple(r.get(c) for c in columns)
+        + (json.dumps(r["strategy_scores"]) if r.get("strategy_scores") else None, now)
+        for r in rows
+    ]
+    with _connect() as conn:
+        _upsert_rows(
+            conn.cursor(), "features", columns + ["strategy_scores", "updated_at"], values, ("session_date", "stock")
+        )
+
+
+def _feature_dict(r) -> dict:
+    out = dict(r)
+    out["strategy_scores"] = json.loads(out["strategy_scores"]) if out.get("strategy_scores") else {}
+    return out
+
+
+def get_features(session_date: date, stocks: Optional[list[str]] = None) -> dict[str, dict]:
+    """Feature rows for one session keyed by stock (optionally only these stocks)."""
+    query = "SELECT * FROM features WHERE session_date = ?"
+    params: tuple = (session_date.isoformat(),)
+    if stocks:
+        query += f" AND stock IN ({', '.join('?' for _ in stocks)})"
+        params += tuple(stocks)
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute(_sql(query), params)
+        rows = cur.fetchall()
+    return {r["stock"]: _feature_dict(r) for r in rows}
+
+
+def get_stock_features(stock: str, start: date, end: date) -> list[dict]:
+    """One stock's feature history for start <= session_date <= end, oldest first."""
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            _sql("SELECT * FROM features WHERE stock = ? AND session_date BETWEEN ? AND ? ORDER BY session_date"),
+            (stock, start.isoformat(), end.isoformat()),
+        )
+        rows = cur.fetchall()
+    return [_feature_dict(r) for r in rows]
+
+
+def get_feature_closes(start: date, end: date) -> list[dict]:
+    """(session_date, stock, close) for every feature row with start <= session_date <= end."""
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            _sql("SELECT session_date, stock, close FROM features WHERE session_date BETWEEN ? AND ? ORDER BY session_date"),
+            (start.isoformat(), end.isoformat()),
+        )
         rows = cur.fetchall()
     return [dict(r) for r in rows]
+
+
+def get_features_as_of(session_date: date) -> Optional[str]:
+    """When session_date's feature rows were last written (None if there are none)."""
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            _sql("SELECT COUNT(*) AS n, MAX(COALESCE(updated_at, created_at)) AS as_of FROM features WHERE session_date = ?"),
+            (session_date.isoformat(),),
+        )
+        row = cur.fetchone()
+    return f"{row['as_of']}/{row['n']}" if row and row["n"] else None
+
+
+# ---------------------------------------------------------------------------
+# Model parameter versions and the retrain queue
+# ---------------------------------------------------------------------------
+# Every parameter change is published as one transaction that writes a
+# model_param_versions row and stamps all model_params rows with its number,
+# so readers (one SELECT) never see half of a retrain's update.
+
+
+def _publish_params(cur, params: dict[str, float], source: str, metrics: Optional[dict] = None) -> int:
+    now = _utcnow()
+    cur.execute(
+        _sql("INSERT INTO model_param_versions (params, source, metrics, created_at) VALUES (?, ?, ?, ?)")
+        + (" RETURNING version" if USE_POSTGRES else ""),
+        (json.dumps(params, sort_keys=True), source, json.dumps(metrics) if metrics else None, now),
+    )
+    version = cur.fetchone()["version"] if USE_POSTGRES else cur.lastrowid
+    _upsert_rows(
+        cur,
+        "model_params",
+        ["param_name", "param_value", "updated_at", "version"],
+        [(name, float(value), now, version) for name, value in params.items()],
+        ("param_name",),
+    )
+    return int(version)
+
+
+def publish_model_params(params: dict[str, float], source: str, metrics: Optional[dict] = None) -> int:
+    """
+    Atomically replace the live parameters. params may be partial; keys not
+    given keep their current value. Returns the new version number.
+    """
+    with _connect() as conn:
+        cur = conn.cursor()
+        merged = {**_current_params(cur), **params}
+        version = _publish_params(cur, merged, source, metrics)
+    logger.info(f"Published model params v{version} ({source}): {merged}")
+    return version
+
+
+def _version_row(r) -> dict:
+    out = dict(r)
+    out["params"] = json.loads(out["params"])
+    out["metrics"] = json.loads(out["metrics"]) if out["metrics"] else None
+    return out
+
+
+def get_model_params_version() -> Optional[dict]:
+    """The live version: {version, params, source, metrics, created_at}."""
+    history = get_model_param_history(limit=1)
+    return history[0] if history else None
+
+
+def get_model_param_history(limit: int = 20) -> list[dict]:
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            _sql("SELECT * FROM model_param_versions ORDER BY version DESC LIMIT ?"),
+            (limit,),
+        )
+        rows = cur.fetchall()
+    return [_version_row(r) for r in rows]
+
+
+def enqueue_retrain(reason: str) -> int:
+    """Queue a retrain; if one is already pending, return that job instead."""
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT id FROM retrain_jobs WHERE status = 'pending' ORDER BY id LIMIT 1")
+        row = cur.fetchone()
+        if row:
+            return int(row["id"])
+        cur.execute(
+            _sql("INSERT INTO retrain_jobs (reason, status, requested_at) VALUES (?, 'pending', ?)")
+            + (" RETURNING id" if USE_POSTGRES else ""),
+            (reason, _utcnow()),
+        )
+        job_id = cur.fetchone()["id"] if USE_POSTGRES else cur.lastrowid
+    logger.info(f"Queued retrain job {job_id} ({reason})")
+    return int(job_id)
+
+
+def _fail_stale_retrain_jobs(cur):
+    # A crash between claim and finish leaves a job 'running' forever
+    cutoff = (datetime.utcnow() - timedelta(seconds=RETRAIN_JOB_TIMEOUT)).strftime("%Y-%m-%d %H:%M:%S.%f")
+    cur.execute(
+        _sql("""UPDATE retrain_jobs SET status = 'failed', finished_at = ?, error = ?
+                WHERE status = 'running' AND started_at < ?"""),
+        (_utcnow(), f"no result after {RETRAIN_JOB_TIMEOUT}s; worker presumed dead", cutoff),
+    )
+    if cur.rowcount:
+        logger.warning(f"Marked {cur.rowcount} stale running retrain job(s) failed")
+
+
+def claim_retrain_job() -> Optional[dict]:
+    """
+    Take the oldest pending job and mark it running; None when the queue is
+    empty. Jobs left running longer than RETRAIN_JOB_TIMEOUT are failed first.
+    """
+    with _connect() as conn:
+        cur = conn.cursor()
+        _fail_stale_retrain_jobs(cur)
+        if USE_POSTGRES:
+            cur.execute(
+                """UPDATE retrain_jobs SET status = 'running', started_at = %s
+                   WHERE id = (SELECT id FROM retrain_jobs WHERE status = 'pending'
+                               ORDER BY id LIMIT 1 FOR UPDATE SKIP LOCKED)
+                   RETURNING *""",
+                (_utcnow(),),
+            )
+            row = cur.fetchone()
+            return dict(row) if row else None
+        cur.execute("SELECT * FROM retrain_jobs WHERE status = 'pending' ORDER BY id LIMIT 1")
+        row = cur.fetchone()
+        if row is None:
+            return None
+        cur.execute(
+            "UPDATE retrain_jobs SET status = 'running', started_at = ? WHERE id = ? AND status = 'pending'",
+            (_utcnow(), row["id"]),
+        )
+        return dict(row) if cur.rowcount == 1 else None
+
+
+def finish_retrain_job(job_id: int, status: str, result: Optional[dict] = None, error: Optional[str] = None):
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            _sql("UPDATE retrain_jobs SET status = ?, finished_at = ?, result = ?, error = ? WHERE id = ?"),
+            (status, _utcnow(), json.dumps(result) if result else None, error, job_id),
+        )
+
+
+def get_retrain_jobs(limit: int = 20) -> list[dict]:
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute(_sql("SELECT * FROM retrain_jobs ORDER BY id DESC LIMIT ?"), (limit,))
+        rows = cur.fetchall()
+    out = []
+    for r in rows:
+        job = dict(r)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        out.append(job)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Named profiles
+# ---------------------------------------------------------------------------
+# A profile is a set of overrides on the live model_params (e.g. a wider stop
+# or more picks) plus its own email recipients. The daily job scores the
+# universe once and ranks it for every profile, so each extra profile costs
+# only its ranking and levels.
+
+
+def _profile_row(r, base: dict[str, float]) -> dict:
+    overrides = json.loads(r["params"]) if r["params"] else {}
+    return {
+        "name": r["name"],
+        "overrides": overrides,
+        "params": {**base, **overrides},
+        "recipients": json.loads(r["recipients"]) if r["recipients"] else None,
+        "updated_at": r["updated_at"],
+    }
+
+
+def get_profiles() -> list[dict]:
+    """
+    Every profile with its merged params, the default (model_params, no
+    overrides) first: [{name, overrides, params, recipients, updated_at}].
+    recipients None means the default EMAIL_RECIPIENTS.
+    """
+    with _connect() as conn:
+        cur = conn.cursor()
+        base = _current_params(cur)
+        cur.execute("SELECT * FROM profiles ORDER BY name")
+        rows = cur.fetchall()
+    default = {"name": DEFAULT_PROFILE, "overrides": {}, "params": base, "recipients": None, "updated_at": None}
+    return [default] + [_profile_row(r, base) for r in rows]
+
+
+def get_profile_params() -> dict[str, dict[str, float]]:
+    """{profile name: merged params}, default first."""
+    return {p["name"]: p["params"] for p in get_profiles()}
+
+
+def save_profile(name: str, overrides: dict[str, float], recipients: Optional[list[str]] = None) -> dict:
+    """
+    Create or replace a named profile. overrides may only name keys of
+    DEFAULT_MODEL_PARAMS or "score_threshold.<strategy>"; the default profile is model_params itself and is
+    changed with set_model_param / publish_model_params instead.
+    """
+    name = name.strip()
+    if not name or name == DEFAULT_PROFILE:
+        raise ValueError(f"invalid profile name {name!r}")
+    unknown = {
+        k for k in overrides
+        if k not in DEFAULT_MODEL_PARAMS and not (k.startswith(STRATEGY_THRESHOLD_PREFIX) and k != STRATEGY_THRESHOLD_PREFIX)
+    }
+    if unknown:
+        raise ValueError(f"unknown parameters: {', '.join(sorted(unknown))}")
+    overrides = {k: float(v) for k, v in overrides.items()}
+    now = _utcnow()
+    with _connect() as conn:
+        cur = conn.cursor()
+        _upsert_rows(
+            cur,
+            "profiles",
+            ["name", "params", "recipients", "updated_at"],
+            [(name, json.dumps(overrides, sort_keys=True), json.dumps(recipients) if recipients else None, now)],
+            ("name",),
+        )
+        base = _current_params(cur)
+        cur.execute(_sql("SELECT * FROM profiles WHERE name = ?"), (name,))
+        row = _profile_row(cur.fetchone(), base)
+    logger.info(f"Saved profile {name}: {overrides}")
+    return row
+
+
+def delete_profile(name: str) -> bool:
+    """Remove a named profile; its past predictions are kept. Returns whether it existed."""
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute(_sql("DELETE FROM profiles WHERE name = ?"), (name,))
+        return cur.rowcount > 0
+
+
+# ---------------------------------------------------------------------------
+# Ticker failure registry
+# ---------------------------------------------------------------------------
+# One row per ticker whose daily download came back empty or failed, counting
+# consecutive failed days (at most one per day). From TICKER_SKIP_AFTER
+# failures on, next_probe is set with an exponential back-off and the ticker
+# is left out of the universe scan until then. A successful download deletes
+# the row.
+
+
+def _probe_after(failures: int) -> Optional[int]:
+    """Days to wait before re-probing a ticker with this many consecutive failures (None: keep trying)."""
+    if failures < TICKER_SKIP_AFTER:
+        return None
+    return min(2 ** (failures - TICKER_SKIP_AFTER), TICKER_MAX_PROBE_DAYS)
+
+
+def record_ticker_results(failed: dict[str, str], succeeded: Iterable[str], on: date) -> list[str]:
+    """
+    Record one scan's outcome: failed is {stock: error}, succeeded the stocks
+    that returned data. Returns the stocks that are now skipped.
+    """
+    succeeded = list(succeeded)
+    newly_skipped: list[str] = []
+    with _connect() as conn:
+        cur = conn.cursor()
+        existing: dict[str, dict] = {}
+        if failed:
+            cur.execute(
+                _sql(f"SELECT * FROM ticker_failures WHERE stock IN ({', '.join('?' for _ in failed)})"),
+                tuple(failed),
+            )
+            existing = {r["stock"]: dict(r) for r in cur.fetchall()}
+        rows = []
+        for stock, error in failed.items():
+            prev = existing.get(stock)
+            if prev and str(prev["last_failed"])[:10] == on.isoformat():
+                failures = prev["failures"]  # already counted today
+            else:
+                failures = (prev["failures"] if prev else 0) + 1
+            wait = _probe_after(failures)
+            next_probe = (on + timedelta(days=wait)).isoformat() if wait else None
+            if wait and (not prev or prev["next_probe"] is None):
+                newly_skipped.append(stock)
+            first = str(prev["first_failed"])[:10] if prev else on.isoformat()
+            rows.append((stock, failures, first, on.isoformat(), next_probe, error[:500], _utcnow()))
+        if rows:
+            _upsert_rows(
+                cur,
+                "ticker_failures",
+                ["stock", "failures", "first_failed", "last_failed", "next_probe", "last_error", "updated_at"],
+                rows,
+                ("stock",),
+            )
+        if succeeded:
+            cur.execute(
+                _sql(f"DELETE FROM ticker_failures WHERE stock IN ({', '.join('?' for _ in succeeded)})"),
+                tuple(succeeded),
+            )
+            if cur.rowcount:
+                logger.info(f"{cur.rowcount} previously failing tickers returned data again")
+    if newly_skipped:
+        logger.warning(f"Skipping tickers with no data for {TICKER_SKIP_AFTER}+ days: {', '.join(newly_skipped)}")
+    return newly_skipped
+
+
+def get_skipped_tickers(on: date) -> set[str]:
+    """Tickers whose next re-probe is after on."""
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute(_sql("SELECT stock FROM ticker_failures WHERE next_probe > ?"), (on.isoformat(),))
+        return {r["stock"] for r in cur.fetchall()}
+
+
+def get_ticker_failures() -> list[dict]:
+    """Every failing ticker, longest-failing first: {stock, failures, first_failed, last_failed, next_probe, last_error}."""
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM ticker_failures ORDER BY failures DESC, stock")
+        rows = cur.fetchall()
+    dates = ("first_failed", "last_failed", "next_probe", "updated_at")
+    return [{k: str(v) if k in dates and v else v for k, v in dict(r).items()} for r in rows]
+
+
+def reset_ticker_failures(stocks: Optional[list[str]] = None):
+    """Forget failures (all, or only these stocks) so they are probed on the next run."""
+    with _connect() as conn:
+        cur = conn.cursor()
+        if stocks:
+            cur.execute(
+                _sql(f"DELETE FROM ticker_failures WHERE stock IN ({', '.join('?' for _ in stocks)})"),
+                tuple(stocks),
+            )
+        else:
+            cur.execute("DELETE FROM ticker_failures")
+
+
+# ---------------------------------------------------------------------------
+# Prediction result cache
+# ---------------------------------------------------------------------------
+# The last generate_profile_predictions result per target_date, stored with
+# the key of the inputs it was generated from (see
+# prediction_engine._prediction_cache_key). A lookup whose key differs, e.g.
+# after a params change, is a miss.
+
+
+def get_prediction_cache(target_date: date) -> Optional[dict]:
+    """The cache row for target_date with result parsed ({profile: predictions}), or None."""
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute(_sql("SELECT * FROM prediction_cache WHERE target_date = ?"), (target_date.isoformat(),))
+        row = cur.fetchone()
+    if not row:
+        return None
+    out = dict(row)
+    out["result"] = json.loads(out["result"])
+    return out
+
+
+def save_prediction_cache(target_date: date, prediction_date: date, key: dict, result: dict[str, list[dict]]):
+    """Replace target_date's cached result; key holds cache_key, data_as_of, params_version and universe_hash."""
+    with _connect() as conn:
+        _upsert_rows(
+            conn.cursor(),
+            "prediction_cache",
+            ["target_date", "prediction_date", "cache_key", "data_as_of", "params_version", "universe_hash", "result", "created_at"],
+            [(
+                target_date.isoformat(),
+                prediction_date.isoformat(),
+                key["cache_key"],
+                key["data_as_of"],
+                key["params_version"],
+                key["universe_hash"],
+                json.dumps(result, default=str),
+                _utcnow(),
+            )],
+            ("target_date",),
+        )
+
+
+# ---------------------------------------------------------------------------
+# Daily job checkpoints
+# ---------------------------------------------------------------------------
+# job_stages records each completed stage of a day's run (with a small JSON
+# payload, e.g. the results an email needs); job_ticker_progress records
+# per-ticker units finished inside a stage. A rerun skips both.
+
+
+def get_job_stages(run_date: date) -> dict[str, Any]:
+    """Completed stages for a run: {stage: payload}."""
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute(_sql("SELECT stage, payload FROM job_stages WHERE run_date = ?"), (run_date.isoformat(),))
+        rows = cur.fetchall()
+    return {r["stage"]: json.loads(r["payload"]) if r["payload"] else None for r in rows}
+
+
+def complete_job_stage(run_date: date, stage: str, payload: Any = None):
+    with _connect() as conn:
+        _upsert_rows(
+            conn.cursor(),
+            "job_stages",
+            ["run_date", "stage", "payload", "completed_at"],
+            [(run_date.isoformat(), stage, json.dumps(payload, default=str) if payload is not None else None, _utcnow())],
+            ("run_date", "stage"),
+        )
+
+
+def get_ticker_progress(run_date: date, stage: str) -> dict[str, Any]:
+    """Finished units of a stage: {stock: payload}."""
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            _sql("SELECT stock, payload FROM job_ticker_progress WHERE run_date = ? AND stage = ?"),
+            (run_date.isoformat(), stage),
+        )
+        rows = cur.fetchall()
+    return {r["stock"]: json.loads(r["payload"]) if r["payload"] else None for r in rows}
+
+
+def record_ticker_progress(run_date: date, stage: str, entries: dict[str, Any]):
+    """Mark stocks finished within a stage, each with an optional JSON payload."""
+    if not entries:
+        return
+    now = _utcnow()
+    with _connect() as conn:
+        _upsert_rows(
+            conn.cursor(),
+            "job_ticker_progress",
+            ["run_date", "stage", "stock", "payload", "updated_at"],
+            [
+                (run_date.isoformat(), stage, stock, json.dumps(payload) if payload is not None else None, now)
+                for stock, payload in entries.items()
+            ],
+            ("run_date", "stage", "stock"),
+        )
+
+
+def reset_job(run_date: date):
+    """Forget every checkpoint of a run so the next one starts from scratch."""
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute(_sql("DELETE FROM job_stages WHERE run_date = ?"), (run_date.isoformat(),))
+        cur.execute(_sql("DELETE FROM job_ticker_progress WHERE run_date = ?"), (run_date.isoformat(),))
+
+
+# ---------------------------------------------------------------------------
+# Intraday monitor state
+# ---------------------------------------------------------------------------
+
+_INTRADAY_STATE_COLUMNS = (
+    "prediction_id", "target_date", "stock", "state", "final", "entered_at", "exited_at",
+    "last_bar_at", "day_open", "day_high", "day_low", "day_close", "day_volume", "updated_at",
+)
+
+
+def save_intraday_states(states: list[dict], events: list[dict]):
+    """Persist tracker snapshots and any state transitions in one transaction."""
+    now = _utcnow()
+    with _connect() as conn:
+        cur = conn.cursor()
+        if states:
+            _upsert_rows(
+                cur,
+                "intraday_state",
+                list(_INTRADAY_STATE_COLUMNS),
+                [tuple(now if c == "updated_at" else s.get(c) for c in _INTRADAY_STATE_COLUMNS) for s in states],
+                ("prediction_id",),
+            )
+        for e in events:
+            cur.execute(
+                _sql("""INSERT INTO intraday_events (prediction_id, event_at, from_state, to_state, price)
+                        VALUES (?, ?, ?, ?, ?)"""),
+                (e["prediction_id"], e["event_at"], e["from_state"], e["to_state"], e.get("price")),
+            )
+
+
+def get_intraday_states(target_date: date) -> dict[int, dict]:
+    """Monitor state per prediction_id for a session."""
+    with _connect() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            _sql("SELECT * FROM intraday_state WHERE target_date = ?"),
+            (target_date.isoformat(),),
+        )
+        rows = cur.fetchall()
+    return {int(r["prediction_id"]): dict(r) for r in rows}
@@ -0,0 +1,267 @@
+"""
+Diversified top-k selection.
+
+Ranking alone happily returns five banks that move together and stop out
+together. RollingCorrelation keeps the daily-return correlation matrix of the
+universe over the last CORRELATION_WINDOW sessions: built in one matrix
+product from a closes panel, then advanced a session at a time with rank-one
+updates of the running sums (Σx and XᵀX), so a new day costs O(n²) instead of
+a rebuild. select_diversified walks the ranked candidates and keeps a name
+only if its correlation with everything already picked stays at or below
+MAX_PAIR_CORRELATION.
+
+The daily job's tracker is fed from the close column of the features table
+and its return window is saved under PANEL_CACHE_DIR, so each run only
+applies the sessions added since the last one.
+"""
+import logging
+import threading
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config import (
+    CORRELATION_MIN_SESSIONS,
+    CORRELATION_WINDOW,
+    MAX_PAIR_CORRELATION,
+    NIFTY_200_TICKERS,
+    PANEL_CACHE_DIR,
+)
+from database import get_feature_closes
+from trading_calendar import sessions_back, sessions_between
+
+logger = logging.getLogger(__name__)
+
+STATE_PATH = PANEL_CACHE_DIR / "correlation.npz"
+
+_lock = threading.Lock()
+_tracker: "RollingCorrelation | None" = None
+
+
+class RollingCorrelation:
+    """Return correlations of a fixed ticker set over a sliding window of sessions."""
+
+    def __init__(self, tickers: list[str], window: int = CORRELATION_WINDOW):
+        self.tickers = list(tickers)
+        self.index = {t: i for i, t in enumerate(self.tickers)}
+        self.window = window
+        n = len(self.tickers)
+        self.as_of: date | None = None  # session of last_close
+        self.dates: list[date] = []  # sessions of the rows in returns
+        self.returns = np.empty((0, n))
+        self.last_close = np.full(n, np.nan)
+        self._sum = np.zeros(n)
+        self._cross = np.zeros((n, n))
+        self._updates = 0
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @classmethod
+    def from_closes(cls, closes: pd.DataFrame, window: int = CORRELATION_WINDOW) -> "RollingCorrelation":
+        """Build from a (session x ticker) closes frame, keeping its last window returns."""
+        tracker = cls(list(closes.columns), window)
+        if closes.empty:
+            return tracker
+        rets = closes.pct_change(fill_method=None).iloc[1:].tail(window)
+        tracker.dates = list(rets.index)
+        tracker.returns = np.nan_to_num(rets.to_numpy(dtype=np.float64), nan=0.0, posinf=0.0, neginf=0.0)
+        tracker.last_close = closes.ffill().iloc[-1].to_numpy(dtype=np.float64)
+        tracker.as_of = closes.index[-1]
+        tracker._resync()
+        return tracker
+
+    def _resync(self):
+        # Exact sums from the stored window; also clears drift from the rank-one updates
+        self._sum = self.returns.sum(axis=0)
+        self._cross = self.returns.T @ self.returns
+        self._updates = 0
+
+    def update(self, session: date, closes: np.ndarray):
+        """Add one session's closes (aligned to tickers, NaN where missing)."""
+        if self.as_of is not None and session <= self.as_of:
+            return
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ret = closes / self.last_close - 1.0
+        ret = np.nan_to_num(ret, nan=0.0, posinf=0.0, neginf=0.0)
+        self.last_close = np.where(np.isnan(closes), self.last_close, closes)
+        self.as_of = session
+
+        self.returns = np.vstack([self.returns, ret])
+        self.dates.append(session)
+        self._sum += ret
+        self._cross += np.outer(ret, ret)
+        if len(self.dates) > self.window:
+            old = self.returns[0]
+            self._sum -= old
+            self._cross -= np.outer(old, old)
+            self.returns = self.returns[1:]
+            self.dates = self.dates[1:]
+        self._updates += 1
+        if self._updates >= self.window:
+            self._resync()
+
+    def extend(self, closes: pd.DataFrame):
+        """Apply every row of a (session x ticker) closes frame newer than as_of."""
+        if self.as_of is not None:
+            closes = closes[closes.index > self.as_of]
+        aligned = closes.reindex(columns=self.tickers).to_numpy(dtype=np.float64)
+        for session, row in zip(closes.index, aligned):
+            self.update(session, row)
+
+    def _correlate(self, idx: np.ndarray | slice) -> np.ndarray:
+        m = len(self.dates)
+        mean = self._sum[idx] / m
+        cross = self._cross[idx][:, idx] if isinstance(idx, slice) else self._cross[np.ix_(idx, idx)]
+        cov = cross / m - np.outer(mean, mean)
+        std = np.sqrt(np.clip(np.diag(cov), 0.0, None))
+        denom = np.outer(std, std)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = np.where(denom > 0, cov / denom, 0.0)
+        np.clip(corr, -1.0, 1.0, out=corr)
+        np.fill_diagonal(corr, 1.0)
+        return corr
+
+    def matrix(self) -> np.ndarray:
+        """Pearson correlation matrix over the current window (0 for flat series)."""
+        if len(self.dates) < 2:
+            return np.eye(len(self.tickers))
+        return self._correlate(slice(None))
+
+    def _lookup(self, tickers: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        known = np.array([t in self.index for t in tickers], dtype=bool)
+        return np.array([self.index.get(t, 0) for t in tickers], dtype=np.intp), known
+
+    def submatrix(self, tickers: list[str]) -> np.ndarray:
+        """Correlations among tickers; names outside the tracker are uncorrelated with everything."""
+        idx, known = self._lookup(tickers)
+        if len(self.dates) < 2 or not known.any():
+            return np.eye(len(tickers))
+        # Only the candidates' block of the running sums, not the full n x n matrix
+        corr = self._correlate(idx)
+        corr[~known, :] = 0.0
+        corr[:, ~known] = 0.0
+        np.fill_diagonal(corr, 1.0)
+        return corr
+
+    def _row(self, i: int, idx: np.ndarray, known: np.ndarray) -> np.ndarray:
+        # Correlation of ticker i with tickers idx, from the running sums: O(len(idx))
+        m = len(self.dates)
+        mean_i = self._sum[i] / m
+        mean = self._sum[idx] / m
+        cov = self._cross[i, idx] / m - mean_i * mean
+        var = np.clip(self._cross[idx, idx] / m - mean * mean, 0.0, None)
+        denom = np.sqrt(max(self._cross[i, i] / m - mean_i * mean_i, 0.0) * var)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            row = np.where(denom > 0, cov / denom, 0.0)
+        row[~known] = 0.0
+        return row
+
+    def save(self, path: Path | None = None):
+        path = path or STATE_PATH
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                tickers=np.array(self.tickers, dtype=str),
+                dates=np.array([d.isoformat() for d in self.dates], dtype=str),
+                as_of=np.array(self.as_of.isoformat() if self.as_of else "", dtype=str),
+                window=np.array(self.window),
+                returns=self.returns,
+                last_close=self.last_close,
+            )
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path | None = None) -> "RollingCorrelation | None":
+        path = path or STATE_PATH
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as z:
+                tracker = cls([str(t) for t in z["tickers"]], int(z["window"]))
+                tracker.dates = [date.fromisoformat(str(d)) for d in z["dates"]]
+                as_of = str(z["as_of"])
+                tracker.as_of = date.fromisoformat(as_of) if as_of else None
+                tracker.returns = z["returns"]
+                tracker.last_close = z["last_close"]
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable correlation state {path}: {e}")
+            return None
+        tracker._resync()
+        return tracker
+
+
+def _closes_frame(start: date, end: date, tickers: list[str]) -> pd.DataFrame:
+    rows = get_feature_closes(start, end)
+    frame = pd.DataFrame(rows, columns=["session_date", "stock", "close"])
+    frame["session_date"] = [date.fromisoformat(str(d)[:10]) for d in frame["session_date"]]
+    closes = frame.pivot(index="session_date", columns="stock", values="close") if len(frame) else pd.DataFrame()
+    return closes.reindex(index=sessions_between(start, end), columns=tickers).astype(np.float64)
+
+
+def correlation_tracker(session_date: date, tickers: list[str] | None = None) -> RollingCorrelation:
+    """
+    The daily tracker advanced to session_date's close. Applies only the
+    sessions since the saved state; rebuilds when the universe changes or
+    the state is older than the window.
+    """
+    global _tracker
+    tickers = sorted(set(tickers or NIFTY_200_TICKERS))
+    with _lock:
+        tracker = _tracker or RollingCorrelation.load()
+        stale = (
+            tracker is None
+            or tracker.tickers != tickers
+            or tracker.window != CORRELATION_WINDOW
+            or tracker.as_of is None
+            or tracker.as_of > session_date
+            or len(sessions_between(tracker.as_of, session_date)) > CORRELATION_WINDOW
+        )
+        if stale:
+            start = sessions_back(session_date, CORRELATION_WINDOW)
+            tracker = RollingCorrelation.from_closes(_closes_frame(start, session_date, tickers))
+            logger.info(f"Correlation matrix rebuilt: {len(tickers)} tickers, {len(tracker)} sessions to {session_date}")
+            tracker.save()
+        elif tracker.as_of < session_date:
+            tracker.extend(_closes_frame(tracker.as_of, session_date, tickers))
+            tracker.save()
+        _tracker = tracker
+        return tracker
+
+
+def select_diversified(
+    candidates: list[str],
+    k: int,
+    tracker: RollingCorrelation | None,
+    max_corr: float = MAX_PAIR_CORRELATION,
+) -> list[str]:
+    """
+    Greedy pick of up to k names from candidates (best first), skipping any
+    whose correlation with a name already picked exceeds max_corr. Falls back
+    to the plain top-k without a tracker or with too little history.
+    """
+    if k <= 0:
+        return []
+    if len(candidates) <= k or max_corr >= 1.0 or tracker is None or len(tracker) < CORRELATION_MIN_SESSIONS:
+        return candidates[:k]
+    idx, known = tracker._lookup(candidates)
+    # worst[j]: highest correlation of candidate j with anything picked so far;
+    # one row of correlations per pick, so this stays O(k·candidates)
+    worst = np.full(len(candidates), -np.inf)
+    picked: list[int] = []
+    for j in range(len(candidates)):
+        if worst[j] > max_corr:
+            continue
+        picked.append(j)
+        if len(picked) == k:
+            break
+        if known[j]:
+            np.maximum(worst, tracker._row(idx[j], idx, known), out=worst)
+    skipped = [candidates[j] for j in range(picked[-1] + 1) if j not in picked]
+    if skipped:
+        logger.info(f"Diversified selection skipped {len(skipped)} correlated names: {', '.join(skipped)}")
+    return [candidates[j] for j in picked]
@@ -1,16 +1,29 @@
 import logging
 import smtplib
 from datetime import date
+from typing import Callable
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
-from config import EMAIL_PASSWORD, EMAIL_RECIPIENT, EMAIL_SENDER, SMTP_PORT, SMTP_SERVER
+from config import (
+    BOOTSTRAP_CONFIDENCE,
+    EMAIL_PASSWORD,
+    EMAIL_RECIPIENT,
+    EMAIL_SENDER,
+    RETRAIN_ACCURACY_THRESHOLD,
+    RETRAIN_CONFIDENCE,
+    ROLLUP_WINDOWS,
+    SMTP_PORT,
+    SMTP_SERVER,
+)
+from database import DEFAULT_PROFILE, DEFAULT_STRATEGY, get_model_metrics, get_rolling_win_rate
 
 logger = logging.getLogger(__name__)
 
 
-def _send_email(subject: str, html_body: str):
-    if not all([EMAIL_SENDER, EMAIL_PASSWORD, EMAIL_RECIPIENT]):
+def _send_email(subject: str, html_body: str, recipients: list[str] | None = None):
+    recipients = recipients or ([EMAIL_RECIPIENT] if EMAIL_RECIPIENT else [])
+    if not all([EMAIL_SENDER, EMAIL_PASSWORD, recipients]):
         logger.warning("Email credentials not configured — printing to console instead.")
         print(f"\n{'='*80}\nSUBJECT: {subject}\n{'='*80}\n")
         print(html_body)
@@ -19,27 +32,43 @@ def _send_email(subject: str, html_body: str):
     msg = MIMEMultipart("alternative")
     msg["Subject"] = subject
     msg["From"] = EMAIL_SENDER
-    msg["To"] = EMAIL_RECIPIENT
+    msg["To"] = ", ".join(recipients)
     msg.attach(MIMEText(html_body, "html"))
 
     with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
         server.starttls()
         server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-        server.sendmail(EMAIL_SENDER, EMAIL_RECIPIENT, msg.as_string())
+        server.sendmail(EMAIL_SENDER, recipients, msg.as_string())
 
     logger.info(f"Email sent: {subject}")
 
 
-def send_prediction_email(predictions: list[dict], target_date: date):
+def _profile_tag(profile: str | None) -> str:
+    return f" [{profile}]" if profile and profile != DEFAULT_PROFILE else ""
+
+
+def _strategy_cells(rows: list[dict]) -> tuple[str, Callable[[dict], str]]:
+    """Header cell and per-row cell for a Strategy column, only when rows mix strategies."""
+    if len({r.get("strategy", DEFAULT_STRATEGY) for r in rows}) < 2:
+        return "", lambda r: ""
+    header = '<th style="padding:10px;border:1px solid #ddd;">Strategy</th>'
+    return header, lambda r: f'<td style="padding:8px;border:1px solid #ddd;">{r.get("strategy", DEFAULT_STRATEGY)}</td>'
+
+
+def send_prediction_email(
+    predictions: list[dict], target_date: date, profile: str | None = None, recipients: list[str] | None = None
+):
+    """profile: named profile the picks belong to (shown in the subject); recipients default to EMAIL_RECIPIENT."""
     if not predictions:
         logger.info("No predictions to email.")
         return
 
+    strategy_header, strategy_cell = _strategy_cells(predictions)
     rows_html = ""
     for p in predictions:
         rows_html += f"""
         <tr>
-            <td style="padding:8px;border:1px solid #ddd;">{p['stock'].replace('.NS','')}</td>
+            <td style="padding:8px;border:1px solid #ddd;">{p['stock'].replace('.NS','')}</td>{strategy_cell(p)}
             <td style="padding:8px;border:1px solid #ddd;text-align:right;">₹{p['predicted_entry']:.2f}</td>
             <td style="padding:8px;border:1px solid #ddd;text-align:right;color:#27ae60;">₹{p['predicted_target']:.2f}</td>
             <td style="padding:8px;border:1px solid #ddd;text-align:right;color:#e74c3c;">₹{p['predicted_sl']:.2f}</td>
@@ -54,7 +83,7 @@ def send_prediction_email(predictions: list[dict], target_date: date):
     <table style="border-collapse:collapse;width:100%;">
         <thead>
             <tr style="background:#2c3e50;color:white;">
-                <th style="padding:10px;border:1px solid #ddd;">Stock</th>
+                <th style="padding:10px;border:1px solid #ddd;">Stock</th>{strategy_header}
                 <th style="padding:10px;border:1px solid #ddd;">Entry (Trigger)</th>
                 <th style="padding:10px;border:1px solid #ddd;">Target</th>
                 <th style="padding:10px;border:1px solid #ddd;">Stop Loss</th>
@@ -69,10 +98,38 @@ def send_prediction_email(predictions: list[dict], target_date: date):
     </p>
     </body></html>
     """
-    _send_email(f"🔮 Stock Predictions — {target_date.strftime('%d %b %Y')}", html)
-
-
-def send_analysis_email(results: list[dict], analysis_date: date):
+    _send_email(f"🔮 Stock Predictions{_profile_tag(profile)} — {target_date.strftime('%d %b %Y')}", html, recipients)
+
+
+def _interval_html(analysis_date: date, profile: str | None) -> str:
+    # model_metrics (and the interval) cover the default profile only
+    if profile not in (None, DEFAULT_PROFILE):
+        return ""
+    m = get_model_metrics(analysis_date)
+    if not m or m.get("win_rate_ci_low") is None:
+        return ""
+    verdict = "retrain queued" if m["retrained"] else "no retrain"
+    return (
+        f"<p><strong>Last {m['ci_sessions']} sessions:</strong> win rate {BOOTSTRAP_CONFIDENCE:.0%} CI "
+        f"{m['win_rate_ci_low']:.0%}–{m['win_rate_ci_high']:.0%}; "
+        f"P(below {RETRAIN_ACCURACY_THRESHOLD:.0%}) = {m['degradation_prob']:.0%} ({verdict})</p>"
+    )
+
+
+def _rolling_html(profile: str | None) -> str:
+    # The rollups, like model_metrics, follow the default profile only
+    if profile not in (None, DEFAULT_PROFILE):
+        return ""
+    rates = [(w, get_rolling_win_rate(w)) for w in ROLLUP_WINDOWS]
+    parts = [f"{w}d {wr:.0%}" for w, wr in rates if wr is not None]
+    if not parts:
+        return ""
+    return f"<p><strong>Rolling win rate:</strong> {' · '.join(parts)}</p>"
+
+
+def send_analysis_email(
+    results: list[dict], analysis_date: date, profile: str | None = None, recipients: list[str] | None = None
+):
     if not results:
         logger.info("No analysis results to email.")
         return
@@ -84,12 +141,13 @@ def send_analysis_email(results: list[dict], analysis_date: date):
         "STAGNANT": "#f39c12",
     }
 
+    strategy_header, strategy_cell = _strategy_cells(results)
     rows_html = ""
     for r in results:
         color = outcome_colors.get(r["outcome"], "#333")
         rows_html += f"""
         <tr>
-            <td style="padding:8px;border:1px solid #ddd;">{r['stock'].replace('.NS','')}</td>
+            <td style="padding:8px;border:1px solid #ddd;">{r['stock'].replace('.NS','')}</td>{strategy_cell(r)}
             <td style="padding:8px;border:1px solid #ddd;text-align:right;">₹{r['predicted_entry']:.2f}</td>
             <td style="padding:8px;border:1px solid #ddd;text-align:right;">₹{r['actual_high']:.2f}</td>
             <td style="padding:8px;border:1px solid #ddd;text-align:right;">₹{r['actual_low']:.2f}</td>
@@ -107,10 +165,12 @@ def send_analysis_email(results: list[dict], analysis_date: date):
     <html><body style="font-family:Arial,sans-serif;max-width:900px;margin:auto;">
     <h2 style="color:#2c3e50;">📊 Performance Report — {analysis_date.strftime('%A, %d %b %Y')}</h2>
     <p><strong>Results:</strong> {wins}/{total} targets hit ({win_rate} accuracy)</p>
+    {_interval_html(analysis_date, profile)}
+    {_rolling_html(profile)}
     <table style="border-collapse:collapse;width:100%;">
         <thead>
             <tr style="background:#2c3e50;color:white;">
-                <th style="padding:10px;border:1px solid #ddd;">Stock</th>
+                <th style="padding:10px;border:1px solid #ddd;">Stock</th>{strategy_header}
                 <th style="padding:10px;border:1px solid #ddd;">Predicted Entry</th>
                 <th style="padding:10px;border:1px solid #ddd;">Actual High</th>
                 <th style="padding:10px;border:1px solid #ddd;">Actual Low</th>
@@ -121,9 +181,10 @@ def send_analysis_email(results: list[dict], analysis_date: date):
         <tbody>{rows_html}</tbody>
     </table>
     <p style="color:#7f8c8d;font-size:12px;margin-top:20px;">
-        Auto-generated post-mortem. Model retrains automatically when win rate drops below 40%.<br>
+        Auto-generated post-mortem. Model retrains automatically when the recent win rate is below
+        {RETRAIN_ACCURACY_THRESHOLD:.0%} with {RETRAIN_CONFIDENCE:.0%} confidence (bootstrap over recent sessions).<br>
         <em>This is an algorithmic system — not financial advice.</em>
     </p>
     </body></html>
     """
-    _send_email(f"📊 Performance Report — {analysis_date.strftime('%d %b %Y')}", html)
+    _send_email(f"📊 Performance Report{_profile_tag(profile)} — {analysis_date.strftime('%d %b %Y')}", html, recipients)
@@ -0,0 +1,37 @@
+"""
+gunicorn settings for the API: gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is loaded once in the master (preload_app) so the data stack,
+calendar and schema checks are shared copy-on-write by the workers. Each
+worker then builds its own DB connection pool after the fork.
+"""
+import os
+
+from config import WEB_GRACEFUL_TIMEOUT, WEB_THREADS, WEB_TIMEOUT, WEB_WORKERS
+
+bind = f"{os.getenv('API_HOST', '0.0.0.0')}:{os.getenv('API_PORT', '5000')}"
+workers = WEB_WORKERS
+threads = WEB_THREADS
+worker_class = "gthread"
+preload_app = True
+timeout = WEB_TIMEOUT
+# SIGTERM: stop accepting, let in-flight requests finish for this long
+graceful_timeout = WEB_GRACEFUL_TIMEOUT
+accesslog = "-"
+
+
+def when_ready(server):
+    # Connections opened while preloading belong to the master; don't hand them to workers
+    from database import close_pool
+    close_pool()
+
+
+def post_fork(server, worker):
+    from database import reset_pool
+    reset_pool()
+
+
+def worker_exit(server, worker):
+    from database import close_pool, flush_query_stats
+    flush_query_stats()
+    close_pool()
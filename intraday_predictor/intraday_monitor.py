@@ -0,0 +1,277 @@
+"""
+Intraday trigger monitor.
+
+Follows the day's predictions bar by bar while the session is open. Each
+prediction has a small state machine:
+
+    WAITING ──high ≥ entry──▶ ENTERED ──low ≤ SL──▶ STOP LOSS HIT
+                                      └─high ≥ target─▶ TARGET HIT
+
+and at the close WAITING becomes NO ENTRY and ENTERED becomes STAGNANT.
+Every bar is applied in O(1) per prediction (running open/high/low/close/
+volume plus the state), transitions are persisted as they happen, and the
+4 PM post-mortem reads the finished outcome instead of re-deriving it from
+daily extremes.
+
+When one bar crosses both the stop and the target, the stop wins, in line
+with _classify_outcome's conservative priority.
+"""
+import logging
+import time
+from datetime import date, datetime, time as dtime, timedelta
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+import pandas as pd
+import pytz
+import yfinance as yf
+
+from config import INTRADAY_INTERVAL, INTRADAY_POLL_SECONDS, MARKET_CLOSE, TIMEZONE
+from database import get_intraday_states, get_predictions_for_date, save_intraday_states
+
+logger = logging.getLogger(__name__)
+
+IST = pytz.timezone(TIMEZONE)
+
+WAITING = "WAITING"
+ENTERED = "ENTERED"
+TARGET_HIT = "TARGET HIT"
+SL_HIT = "STOP LOSS HIT"
+NO_ENTRY = "NO ENTRY"
+STAGNANT = "STAGNANT"
+
+TERMINAL = {TARGET_HIT, SL_HIT, NO_ENTRY, STAGNANT}
+
+# (timestamp, open, high, low, close, volume)
+Bar = tuple[pd.Timestamp, float, float, float, float, float]
+
+
+class PredictionTracker:
+    """State machine plus running day OHLCV for one prediction."""
+
+    def __init__(self, prediction: dict, saved: Optional[dict] = None):
+        self.prediction_id = int(prediction["id"])
+        self.target_date = str(prediction["target_date"])
+        self.stock = prediction["stock"]
+        self.entry = float(prediction["predicted_entry"])
+        self.target = float(prediction["predicted_target"])
+        self.sl = float(prediction["predicted_sl"])
+
+        saved = saved or {}
+        self.state = saved.get("state", WAITING)
+        self.final = bool(saved.get("final", 0))
+        self.entered_at = saved.get("entered_at")
+        self.exited_at = saved.get("exited_at")
+        self.last_bar_at = pd.Timestamp(saved["last_bar_at"]) if saved.get("last_bar_at") else None
+        self.open = saved.get("day_open")
+        self.high = saved.get("day_high")
+        self.low = saved.get("day_low")
+        self.close = saved.get("day_close")
+        self.volume = int(saved.get("day_volume") or 0)
+
+    def on_bar(self, bar: Bar) -> list[dict]:
+        """Apply one completed bar; returns the transitions it caused."""
+        ts, o, h, l, c, v = bar
+        if self.final or (self.last_bar_at is not None and ts <= self.last_bar_at):
+            return []
+        self.last_bar_at = ts
+        if self.open is None:
+            self.open, self.high, self.low = o, h, l
+        else:
+            self.high = max(self.high, h)
+            self.low = min(self.low, l)
+        self.close = c
+        self.volume += int(v or 0)
+
+        events = []
+        if self.state == WAITING and h >= self.entry:
+            events.append(self._move(ENTERED, ts, self.entry))
+            self.entered_at = str(ts)
+        if self.state == ENTERED:
+            if l <= self.sl:
+                events.append(self._move(SL_HIT, ts, self.sl))
+            elif h >= self.target:
+                events.append(self._move(TARGET_HIT, ts, self.target))
+            if self.state in TERMINAL:
+                self.exited_at = str(ts)
+        return events
+
+    def finalize(self, at: datetime) -> list[dict]:
+        """Session over: resolve open states and freeze the day's OHLCV."""
+        if self.final:
+            return []
+        events = []
+        if self.state == WAITING:
+            events.append(self._move(NO_ENTRY, at, None))
+        elif self.state == ENTERED:
+            events.append(self._move(STAGNANT, at, self.close))
+        self.final = True
+        return events
+
+    def _move(self, to_state: str, at, price: Optional[float]) -> dict:
+        event = {
+            "prediction_id": self.prediction_id,
+            "event_at": str(at),
+            "from_state": self.state,
+            "to_state": to_state,
+            "price": price,
+        }
+        logger.info(f"{self.stock}: {self.state} → {to_state} at {at}")
+        self.state = to_state
+        return event
+
+    def snapshot(self) -> dict:
+        return {
+            "prediction_id": self.prediction_id,
+            "target_date": self.target_date,
+            "stock": self.stock,
+            "state": self.state,
+            "final": int(self.final),
+            "entered_at": self.entered_at,
+            "exited_at": self.exited_at,
+            "last_bar_at": str(self.last_bar_at) if self.last_bar_at is not None else None,
+            "day_open": self.open,
+            "day_high": self.high,
+            "day_low": self.low,
+            "day_close": self.close,
+            "day_volume": self.volume,
+        }
+
+
+class IntradayMonitor:
+    """Routes bars to the trackers of one session and persists their progress."""
+
+    def __init__(self, session_date: date):
+        self.session_date = session_date
+        saved = get_intraday_states(session_date)
+        self.trackers: dict[str, list[PredictionTracker]] = {}
+        for p in get_predictions_for_date(session_date):
+            tracker = PredictionTracker(p, saved.get(int(p["id"])))
+            self.trackers.setdefault(p["stock"], []).append(tracker)
+
+    @property
+    def tickers(self) -> list[str]:
+        return list(self.trackers)
+
+    def apply(self, bars: Iterable[tuple[str, Bar]]):
+        """Feed (ticker, bar) pairs, then persist every touched tracker once."""
+        touched: dict[int, PredictionTracker] = {}
+        events: list[dict] = []
+        for ticker, bar in bars:
+            for tracker in self.trackers.get(ticker, ()):
+                events.extend(tracker.on_bar(bar))
+                touched[tracker.prediction_id] = tracker
+        if touched:
+            save_intraday_states([t.snapshot() for t in touched.values()], events)
+
+    def finalize(self):
+        at = _session_close(self.session_date)
+        trackers = [t for ts in self.trackers.values() for t in ts]
+        events = [e for t in trackers for e in t.finalize(at)]
+        save_intraday_states([t.snapshot() for t in trackers], events)
+        logger.info(f"Intraday monitor finalized {len(trackers)} predictions for {self.session_date}")
+
+
+def _session_close(session_date: date) -> datetime:
+    return IST.localize(datetime.combine(session_date, dtime(*MARKET_CLOSE)))
+
+
+def _frame_bars(df: pd.DataFrame) -> Iterator[Bar]:
+    for ts, row in df.iterrows():
+        yield (pd.Timestamp(ts), float(row["Open"]), float(row["High"]), float(row["Low"]),
+               float(row["Close"]), float(row["Volume"]))
+
+
+class YahooBarFeed:
+    """Polls Yahoo for completed bars of all tickers in one request per poll."""
+
+    def __init__(self, tickers: list[str], session_date: date, interval: str = INTRADAY_INTERVAL):
+        self.tickers = tickers
+        self.session_date = session_date
+        self.interval = interval
+        self.bar_length = pd.Timedelta(interval.replace("m", "min"))
+
+    def poll(self) -> list[tuple[str, Bar]]:
+        df = yf.download(
+            self.tickers,
+            start=str(self.session_date),
+            end=str(self.session_date + timedelta(days=1)),
+            interval=self.interval,
+            group_by="ticker",
+            progress=False,
+        )
+        if df.empty:
+            return []
+        now = pd.Timestamp.now(tz=IST)
+        out = []
+        for ticker in self.tickers:
+            if isinstance(df.columns, pd.MultiIndex):
+                # A ticker Yahoo returned nothing for is absent, not empty
+                if ticker not in df.columns.get_level_values(0):
+                    continue
+                sub = df[ticker]
+            else:
+                sub = df
+            sub = sub.dropna(how="all")
+            if sub.empty:
+                continue
+            if sub.index.tz is None:
+                sub.index = sub.index.tz_localize(IST)
+            # The last bar is still forming until its interval has elapsed
+            sub = sub[sub.index + self.bar_length <= now]
+            out.extend((ticker, bar) for bar in _frame_bars(sub))
+        return out
+
+
+class ReplayBarFeed:
+    """
+    Replays a day from local CSVs: <dir>/<TICKER>.csv with a timestamp index
+    column and Open/High/Low/Close/Volume. Bars are emitted in time order.
+    """
+
+    def __init__(self, directory: Path, tickers: list[str]):
+        self.directory = Path(directory)
+        self.tickers = tickers
+
+    def bars(self) -> list[tuple[str, Bar]]:
+        out = []
+        for ticker in self.tickers:
+            path = self.directory / f"{ticker}.csv"
+            if not path.exists():
+                logger.warning(f"Replay: no bars for {ticker} in {self.directory}")
+                continue
+            df = pd.read_csv(path, index_col=0, parse_dates=True)
+            out.extend((ticker, bar) for bar in _frame_bars(df))
+        out.sort(key=lambda x: x[1][0])
+        return out
+
+
+def run_monitor(session_date: date, replay_dir: Optional[Path] = None, poll_seconds: int = INTRADAY_POLL_SECONDS):
+    """
+    Monitor session_date's predictions until the close (live) or the end of
+    the replay, then finalize. Safe to restart: trackers resume from the
+    persisted state and skip bars they have already seen.
+    """
+    monitor = IntradayMonitor(session_date)
+    if not monitor.tickers:
+        logger.info(f"No predictions to monitor for {session_date}")
+        return
+
+    if replay_dir is not None:
+        monitor.apply(ReplayBarFeed(replay_dir, monitor.tickers).bars())
+        monitor.finalize()
+        return
+
+    feed = YahooBarFeed(monitor.tickers, session_date)
+    close_at = _session_close(session_date)
+    logger.info(f"Monitoring {len(monitor.tickers)} tickers until {close_at:%H:%M} IST")
+    # Keep polling after every prediction resolves: the day's OHLCV still feeds the post-mortem
+    while True:
+        try:
+            monitor.apply(feed.poll())
+        except Exception as e:
+            logger.warning(f"Intraday poll failed: {e}")
+        if datetime.now(IST) >= close_at + feed.bar_length:
+            break
+        time.sleep(poll_seconds)
+    monitor.finalize()
@@ -0,0 +1,181 @@
+"""
+Persistent store of 15m intraday bars, partitioned by session date.
+
+Layout under INTRADAY_STORE_DIR:
+
+    2026-01-15/RELIANCE.NS.npz   one ticker's bars, written as they are captured
+    2026-01-15/session.npz       compacted day: every ticker's bars in flat arrays
+                                 plus per-ticker offsets
+
+Each ticker-day is a handful of numpy arrays (UTC epoch-ns timestamps and
+OHLCV), so a day of 200 tickers is a few hundred KB. Readers prefer a loose
+per-ticker file (the most recent write) and fall back to the compacted day.
+"""
+import logging
+import os
+import shutil
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from config import INTRADAY_INTERVAL, INTRADAY_RETENTION_DAYS, INTRADAY_STORE_DIR, TIMEZONE
+from trading_calendar import session_closed
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+_COMPACT_FILE = "session.npz"
+
+
+def _session_dir(session_date: date) -> Path:
+    return INTRADAY_STORE_DIR / session_date.isoformat()
+
+
+def _atomic_savez(path: Path, **arrays):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp, path)
+
+
+def _frame_to_arrays(df: pd.DataFrame) -> dict[str, np.ndarray]:
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is None:
+        index = index.tz_localize(TIMEZONE)
+    return {
+        "ts": index.tz_convert("UTC").as_unit("ns").asi8,
+        "open": df["Open"].to_numpy(dtype=np.float64),
+        "high": df["High"].to_numpy(dtype=np.float64),
+        "low": df["Low"].to_numpy(dtype=np.float64),
+        "close": df["Close"].to_numpy(dtype=np.float64),
+        # A missing volume would cast to INT64_MIN; store it as no volume
+        "volume": df["Volume"].fillna(0).to_numpy(dtype=np.int64),
+    }
+
+
+def _arrays_to_frame(ts, o, h, l, c, v) -> pd.DataFrame:
+    index = pd.DatetimeIndex(pd.to_datetime(ts, unit="ns", utc=True)).tz_convert(TIMEZONE)
+    return pd.DataFrame(dict(zip(_COLUMNS, (o, h, l, c, v))), index=index)
+
+
+def write_bars(session_date: date, ticker: str, df: pd.DataFrame):
+    """Store (or replace) one ticker's bars for a session."""
+    df = df.dropna(subset=["Open", "High", "Low", "Close"])
+    if df.empty:
+        return
+    _atomic_savez(_session_dir(session_date) / f"{ticker}.npz", **_frame_to_arrays(df))
+
+
+def read_bars(session_date: date, ticker: str) -> pd.DataFrame | None:
+    """Stored bars for one ticker-session, or None when the store has none."""
+    directory = _session_dir(session_date)
+    loose = directory / f"{ticker}.npz"
+    if loose.exists():
+        with np.load(loose) as z:
+            return _arrays_to_frame(z["ts"], z["open"], z["high"], z["low"], z["close"], z["volume"])
+    compact = directory / _COMPACT_FILE
+    if compact.exists():
+        with np.load(compact) as z:
+            tickers = list(z["tickers"])
+            if ticker not in tickers:
+                return None
+            i = tickers.index(ticker)
+            lo, hi = z["offsets"][i], z["offsets"][i + 1]
+            return _arrays_to_frame(*(z[k][lo:hi] for k in ("ts", "open", "high", "low", "close", "volume")))
+    return None
+
+
+def stored_tickers(session_date: date) -> set[str]:
+    directory = _session_dir(session_date)
+    if not directory.exists():
+        return set()
+    names = {p.stem for p in directory.glob("*.npz") if p.name != _COMPACT_FILE}
+    compact = directory / _COMPACT_FILE
+    if compact.exists():
+        with np.load(compact) as z:
+            names.update(str(t) for t in z["tickers"])
+    return names
+
+
+def compact(session_date: date):
+    """Fold a session's per-ticker files into one session.npz."""
+    directory = _session_dir(session_date)
+    loose = sorted(p for p in directory.glob("*.npz") if p.name != _COMPACT_FILE)
+    if not loose:
+        return
+    frames = {t: read_bars(session_date, t) for t in sorted(stored_tickers(session_date))}
+    frames = {t: df for t, df in frames.items() if df is not None and not df.empty}
+    parts = [_frame_to_arrays(df) for df in frames.values()]
+    offsets = np.cumsum([0] + [len(p["ts"]) for p in parts])
+    _atomic_savez(
+        directory / _COMPACT_FILE,
+        tickers=np.array(list(frames), dtype=str),
+        offsets=offsets,
+        **{k: np.concatenate([p[k] for p in parts]) for k in ("ts", "open", "high", "low", "close", "volume")},
+    )
+    for p in loose:
+        p.unlink()
+    logger.info(f"Compacted {len(frames)} tickers for {session_date}")
+
+
+def apply_retention(retention_days: int = INTRADAY_RETENTION_DAYS, today: date | None = None) -> int:
+    """Delete sessions older than retention_days. Returns how many were removed."""
+    cutoff = (today or date.today()) - timedelta(days=retention_days)
+    removed = 0
+    if not INTRADAY_STORE_DIR.exists():
+        return 0
+    for directory in INTRADAY_STORE_DIR.iterdir():
+        try:
+            session = date.fromisoformat(directory.name)
+        except ValueError:
+            continue
+        if session < cutoff:
+            shutil.rmtree(directory)
+            removed += 1
+    if removed:
+        logger.info(f"Intraday store: removed {removed} sessions older than {cutoff}")
+    return removed
+
+
+def capture_session(session_date: date, tickers: list[str]) -> int:
+    """
+    Download a finished session's 15m bars for every ticker in one request,
+    store them, and compact the day. Tickers already stored are skipped, so
+    a session still trading is not captured at all (its partial bars would
+    never be replaced). Returns the number of tickers written.
+    """
+    if not session_closed(session_date):
+        logger.info(f"Intraday store: {session_date} has not closed — not capturing")
+        return 0
+    missing = [t for t in tickers if t not in stored_tickers(session_date)]
+    if not missing:
+        return 0
+    df = yf.download(
+        missing,
+        start=str(session_date),
+        end=str(session_date + timedelta(days=1)),
+        interval=INTRADAY_INTERVAL,
+        group_by="ticker",
+        threads=True,
+        progress=False,
+    )
+    written = 0
+    if not df.empty:
+        for ticker in missing:
+            if isinstance(df.columns, pd.MultiIndex):
+                if ticker not in df.columns.get_level_values(0):
+                    continue
+                sub = df[ticker]
+            else:
+                sub = df
+            sub = sub.dropna(how="all")
+            if not sub.empty:
+                write_bars(session_date, ticker, sub)
+                written += 1
+    compact(session_date)
+    logger.info(f"Intraday store: captured {written}/{len(missing)} tickers for {session_date}")
+    return written
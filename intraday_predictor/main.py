@@ -1,15 +1,30 @@
+import argparse
 import logging
 from datetime import date
+from pathlib import Path
 
 import pytz
 from apscheduler.schedulers.blocking import BlockingScheduler
 
-from config import SCHEDULE_HOUR, SCHEDULE_MINUTE, TIMEZONE
-from database import init_db
-from email_notifier import send_analysis_email, send_prediction_email
-from performance_analyzer import analyze_predictions
-from prediction_engine import generate_predictions
-from trading_days import next_trading_day
+from config import MARKET_OPEN, RETRAIN_POLL_MINUTES, SCHEDULE_HOUR, SCHEDULE_MINUTE, TIMEZONE
+from daily_pipeline import run_daily_pipeline
+from database import (
+    close_pool,
+    delete_profile,
+    enqueue_retrain,
+    export_history,
+    get_profiles,
+    get_query_stats,
+    get_ticker_failures,
+    import_history,
+    init_db,
+    reset_query_stats,
+    reset_ticker_failures,
+    save_profile,
+)
+from intraday_monitor import run_monitor
+from retrainer import process_retrain_queue
+from trading_calendar import is_session
 
 logging.basicConfig(
     level=logging.INFO,
@@ -20,38 +35,208 @@ logger = logging.getLogger(__name__)
 IST = pytz.timezone(TIMEZONE)
 
 
-def daily_job():
+def daily_job(force: bool = False):
     today = date.today()
 
-    if today.weekday() >= 5:
-        logger.info(f"Weekend ({today.strftime('%A')}) — skipping.")
+    if not is_session(today):
+        logger.info(f"Market closed ({today.strftime('%A')}, weekend or NSE holiday) — skipping.")
         return
 
     logger.info(f"=== Running daily job for {today} ===")
+    run_daily_pipeline(today, force=force)
+    logger.info("=== Daily job complete ===")
 
-    # --- Module 2: Analyze today's completed session against yesterday's predictions ---
-    analysis_date = today
-    logger.info(f"Analyzing predictions for {analysis_date}")
-    results = analyze_predictions(analysis_date)
-    send_analysis_email(results, analysis_date)
 
-    # --- Module 1: Generate predictions for tomorrow ---
-    target_date = next_trading_day(today)
-    logger.info(f"Generating predictions for {target_date}")
-    predictions = generate_predictions(target_date, prediction_date=today)
-    send_prediction_email(predictions, target_date)
+def monitor_job():
+    today = date.today()
+    if not is_session(today):
+        logger.info("Market closed — no intraday monitoring.")
+        return
+    run_monitor(today)
+
+
+def retrain_job():
+    processed = process_retrain_queue()
+    if processed:
+        logger.info(f"Processed {processed} retrain job(s).")
 
-    logger.info("=== Daily job complete ===")
+
+def _ms(value) -> str:
+    # Histogram percentiles are bucket bounds; None means past the last bound
+    return f"{value:g}" if value is not None else "-"
+
+
+def print_db_stats(top: int):
+    """Query stats merged across processes, most total time first."""
+    stats = get_query_stats()
+    statements = stats["statements"]
+    print(f"Query stats since {stats['since']} ({stats['processes']} processes, {len(statements)} statements)\n")
+    print(f"{'calls':>8} {'total ms':>10} {'mean ms':>9} {'p50':>7} {'p90':>7} {'p99':>7} {'max ms':>9} {'rows':>9} {'err':>4}  statement")
+    for s in statements[:top]:
+        print(
+            f"{s['calls']:>8} {s['total_ms']:>10.1f} {s['mean_ms']:>9.2f} {_ms(s['p50_ms']):>7} {_ms(s['p90_ms']):>7} "
+            f"{_ms(s['p99_ms']):>7} {s['max_ms']:>9.1f} {s['rows']:>9} {s['errors']:>4}  {s['statement'][:120]}"
+        )
+    if stats["slow"]:
+        print(f"\nSlow queries (>= {stats['slow_threshold_ms']:g} ms), most recent first:")
+        for q in stats["slow"][:top]:
+            print(f"  {q['at']}  {q['ms']:>9.1f} ms  {q['rows']:>7} rows  {q['statement'][:120]}")
+            for line in q.get("plan", []):
+                print(f"      {line}")
+
+
+def print_profiles():
+    for p in get_profiles():
+        params = ", ".join(f"{k}={v:g}" + ("*" if k in p["overrides"] else "") for k, v in p["params"].items())
+        recipients = ", ".join(p["recipients"]) if p["recipients"] else "(default recipients)"
+        print(f"{p['name']:<16} {params}\n{'':<16} {recipients}")
+    print("\n* overridden by the profile")
+
+
+def print_dead_tickers():
+    failures = get_ticker_failures()
+    if not failures:
+        print("No failing tickers.")
+        return
+    today = date.today().isoformat()
+    print(f"{'stock':<16} {'failures':>8} {'first failed':>12} {'last failed':>12} {'next probe':>12}  last error")
+    for f in failures:
+        marker = "*" if f["next_probe"] and f["next_probe"] > today else " "
+        print(
+            f"{f['stock']:<16} {f['failures']:>8} {f['first_failed']:>12} {f['last_failed']:>12} "
+            f"{f['next_probe'] or '-':>12}{marker} {(f['last_error'] or '')[:80]}"
+        )
+    print("\n* skipped until the next probe")
+
+
+def _parse_overrides(pairs: list[str]) -> dict[str, float]:
+    overrides = {}
+    for pair in pairs:
+        key, sep, value = pair.partition("=")
+        if not sep:
+            raise SystemExit(f"expected KEY=VALUE, got {pair!r}")
+        overrides[key] = float(value)
+    return overrides
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Intraday predictor: daily job and scheduler.")
+    parser.add_argument("--now", action="store_true", help="run (or resume) today's daily job once and exit")
+    parser.add_argument("--force", action="store_true", help="with --now: ignore today's checkpoints and redo every stage")
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="with --now: record CPU, memory and stack profiles of the run under data/profiles/",
+    )
+    parser.add_argument(
+        "--backfill",
+        nargs=2,
+        metavar=("FROM", "TO"),
+        type=date.fromisoformat,
+        help="rebuild predictions and outcomes for every session in FROM..TO (YYYY-MM-DD) and exit",
+    )
+    parser.add_argument("--monitor", action="store_true", help="track today's predictions on intraday bars and exit at the close")
+    parser.add_argument("--replay", metavar="DIR", help="with --monitor: replay <DIR>/<TICKER>.csv bars instead of polling Yahoo")
+    parser.add_argument("--date", type=date.fromisoformat, help="with --monitor: session to monitor (default today)")
+    parser.add_argument("--export", metavar="DIR", help="export predictions/model_metrics as columnar files and exit")
+    parser.add_argument("--import", dest="import_dir", metavar="DIR", help="bulk re-import an --export directory and exit")
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet", help="file format for --export")
+    parser.add_argument("--full", action="store_true", help="with --export: ignore the last-export watermark")
+    parser.add_argument("--retrain", action="store_true", help="queue a retrain, run the retrain queue and exit")
+    parser.add_argument(
+        "--db-stats",
+        nargs="?",
+        const=20,
+        type=int,
+        metavar="N",
+        help="print the N most expensive statements from every process's query stats and exit",
+    )
+    parser.add_argument(
+        "--reset", action="store_true", help="with --db-stats or --dead-tickers: delete the collected stats/failures afterwards"
+    )
+    parser.add_argument("--dead-tickers", action="store_true", help="list tickers failing to download (and skipped) and exit")
+    parser.add_argument("--profiles", action="store_true", help="list the parameter profiles and exit")
+    parser.add_argument(
+        "--set-profile",
+        nargs="+",
+        metavar=("NAME", "KEY=VALUE"),
+        help="create or replace a named profile overriding model params, e.g. --set-profile wide atr_multiplier=2",
+    )
+    parser.add_argument("--recipients", nargs="+", metavar="EMAIL", help="with --set-profile: the profile's email recipients")
+    parser.add_argument("--delete-profile", metavar="NAME", help="delete a named profile and exit")
+    args = parser.parse_args()
+
+    if args.db_stats is not None:
+        print_db_stats(args.db_stats)
+        if args.reset:
+            reset_query_stats(all_processes=True)
+        return
+
     init_db()
     logger.info("Database initialized.")
 
-    import sys
-    if "--now" in sys.argv:
+    if args.monitor:
+        session = args.date or date.today()
+        run_monitor(session, replay_dir=Path(args.replay) if args.replay else None)
+        return
+
+    if args.export:
+        exported = export_history(Path(args.export), fmt=args.format, incremental=not args.full)
+        logger.info(f"Export complete: {exported}")
+        return
+
+    if args.import_dir:
+        imported = import_history(Path(args.import_dir))
+        logger.info(f"Import complete: {imported}")
+        return
+
+    if args.profiles:
+        print_profiles()
+        return
+
+    if args.dead_tickers:
+        print_dead_tickers()
+        if args.reset:
+            reset_ticker_failures()
+            logger.info("Ticker failures cleared; every ticker is probed on the next run.")
+        return
+
+    if args.set_profile:
+        name, *pairs = args.set_profile
+        try:
+            save_profile(name, _parse_overrides(pairs), args.recipients)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        print_profiles()
+        return
+
+    if args.delete_profile:
+        if not delete_profile(args.delete_profile):
+            raise SystemExit(f"no profile {args.delete_profile!r}")
+        logger.info(f"Deleted profile {args.delete_profile}.")
+        return
+
+    if args.retrain:
+        enqueue_retrain("manual")
+        retrain_job()
+        return
+
+    if args.backfill:
+        from backfill import run_backfill
+        start, end = args.backfill
+        logger.info(f"Backfilling {start} → {end}.")
+        run_backfill(start, end)
+        return
+
+    if args.now:
         logger.info("Running immediately (--now flag).")
-        daily_job()
+        if args.profile:
+            from profiler import RunProfiler
+            with RunProfiler("daily_job") as prof:
+                daily_job(force=args.force)
+            logger.info(f"Profile: {prof.summary['dir']}")
+        else:
+            daily_job(force=args.force)
         return
 
     scheduler = BlockingScheduler(timezone=IST)
@@ -63,6 +248,23 @@ def main():
         day_of_week="mon-fri",
         id="daily_prediction_cycle",
     )
+    scheduler.add_job(
+        monitor_job,
+        "cron",
+        hour=MARKET_OPEN[0],
+        minute=MARKET_OPEN[1],
+        day_of_week="mon-fri",
+        id="intraday_monitor",
+    )
+    # Retrains queued by the post-mortem run here, in their own scheduler thread
+    scheduler.add_job(
+        retrain_job,
+        "interval",
+        minutes=RETRAIN_POLL_MINUTES,
+        id="retrain_queue",
+        max_instances=1,
+        coalesce=True,
+    )
     logger.info(
         f"Scheduler started — job runs Mon-Fri at "
         f"{SCHEDULE_HOUR:02d}:{SCHEDULE_MINUTE:02d} IST."
@@ -72,6 +274,8 @@ def main():
         scheduler.start()
     except (KeyboardInterrupt, SystemExit):
         logger.info("Scheduler stopped.")
+    finally:
+        close_pool()
 
 
 if __name__ == "__main__":
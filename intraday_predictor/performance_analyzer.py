@@ -3,27 +3,42 @@ Module 2: The Performance Analyzer (Post-Mortem)
 
 Compares yesterday's predictions against actual market data, classifies each
 outcome (NO ENTRY / TARGET HIT / STOP LOSS HIT / STAGNANT), generates
-human-readable technical reasons, and feeds metrics back for retraining decisions.
+human-readable technical reasons, and queues a retrain when accuracy degrades.
+A day's win rate is a handful of trades, so the decision is taken on the
+bootstrap interval of the recent sessions (see bootstrap.py), not on the day.
 """
 
 import logging
 from datetime import date
 
+from bootstrap import MIN_SESSIONS, win_rate_interval
 from data_fetcher import get_day_summary
 from database import (
-    get_all_model_params,
+    DEFAULT_PROFILE,
+    DEFAULT_STRATEGY,
+    enqueue_retrain,
+    get_intraday_states,
+    get_last_retrain_date,
+    get_model_metrics,
+    get_model_metrics_history,
     get_predictions_for_date,
-    get_predictions_with_outcomes,
-    get_recent_win_rate,
     insert_model_metrics,
-    set_model_param,
     update_prediction_outcome,
 )
+from trading_calendar import session_closed
 from why_generator import generate_reason
-from config import ATR_MULTIPLIER, RETRAIN_ACCURACY_THRESHOLD, RISK_REWARD_RATIO
+from config import (
+    BOOTSTRAP_CONFIDENCE,
+    BOOTSTRAP_SESSIONS,
+    RETRAIN_ACCURACY_THRESHOLD,
+    RETRAIN_CONFIDENCE,
+)
 
 logger = logging.getLogger(__name__)
 
+# (profile, strategy) of the predictions model_metrics and the retrain check count
+_DEFAULT_BOOK = (DEFAULT_PROFILE, DEFAULT_STRATEGY)
+
 
 def _classify_outcome(
     predicted_entry: float,
@@ -55,16 +70,51 @@ def _classify_outcome(
     return "STAGNANT"
 
 
-def analyze_predictions(analysis_date: date) -> list[dict]:
+def _result_row(pred: dict, actuals: dict, outcome: str, reason: str) -> dict:
+    return {
+        "stock": pred["stock"],
+        "profile": pred["profile"],
+        "strategy": pred["strategy"],
+        "predicted_entry": pred["predicted_entry"],
+        "predicted_target": pred["predicted_target"],
+        "predicted_sl": pred["predicted_sl"],
+        "actual_open": actuals["open"],
+        "actual_high": actuals["high"],
+        "actual_low": actuals["low"],
+        "actual_close": actuals["close"],
+        "actual_volume": actuals["volume"],
+        "outcome": outcome,
+        "reason": reason,
+    }
+
+
+def analyze_predictions(analysis_date: date, progress=None, force: bool = False) -> list[dict]:
     """
     Runs the post-mortem for a given trading day.
 
+    Incremental: predictions that already have an outcome are reported as
+    stored, without fetching or rewriting anything, so calling this again
+    for the same day is cheap. Metrics are rewritten only when something new
+    was resolved.
+
     Args:
         analysis_date: The date whose predictions we are validating
                        (i.e., the target_date stored in the DB).
+        progress: optional daily_pipeline.StageProgress; fetched actuals are
+                  checkpointed per ticker and reused on a rerun.
+        force: re-evaluate every prediction, including resolved ones.
+
+    Every profile's and strategy's predictions are resolved (each ticker's
+    actuals are fetched once); model_metrics and the retrain check cover only
+    the default profile and strategy.
+
+    Before analysis_date's market close the day's bars are partial: results
+    are classified for the report but nothing is written (no outcomes, no
+    checkpoints, no metrics), so the post-close run resolves the full day.
 
     Returns:
-        List of result dicts ready for the analysis email.
+        List of result dicts ready for the analysis email, each tagged with
+        its profile and strategy.
     """
     predictions = get_predictions_for_date(analysis_date)
     if not predictions:
@@ -73,22 +123,58 @@ def analyze_predictions(analysis_date: date) -> list[dict]:
 
     results: list[dict] = []
     counters = {"TARGET HIT": 0, "STOP LOSS HIT": 0, "NO ENTRY": 0, "STAGNANT": 0}
+    monitored = get_intraday_states(analysis_date)
+    fetched = progress.completed() if progress else {}
+    provisional = not session_closed(analysis_date)
+    if provisional:
+        logger.warning(f"Session {analysis_date} has not closed — reporting provisional outcomes without saving them")
+        progress = None
+
+    resolved_now = 0
 
     for pred in predictions:
         ticker = pred["stock"]
-        logger.info(f"Analyzing {ticker} for {analysis_date}")
-
-        actuals = get_day_summary(ticker, analysis_date)
-        if actuals is None:
-            logger.warning(f"Could not fetch actuals for {ticker} on {analysis_date}")
+        if pred["outcome"] is not None and not force:
+            stored = {
+                "open": pred["actual_open"],
+                "high": pred["actual_high"],
+                "low": pred["actual_low"],
+                "close": pred["actual_close"],
+                "volume": pred["actual_volume"],
+            }
+            if (pred["profile"], pred["strategy"]) == _DEFAULT_BOOK:
+                counters[pred["outcome"]] += 1
+            results.append(_result_row(pred, stored, pred["outcome"], pred["reason"]))
             continue
+        logger.info(f"Analyzing {ticker} for {analysis_date}")
 
-        outcome = _classify_outcome(
-            pred["predicted_entry"],
-            pred["predicted_target"],
-            pred["predicted_sl"],
-            actuals,
-        )
+        tracked = monitored.get(int(pred["id"]))
+        if tracked and tracked["final"] and tracked["day_high"] is not None:
+            # The intraday monitor already resolved this one bar by bar
+            actuals = {
+                "open": tracked["day_open"],
+                "high": tracked["day_high"],
+                "low": tracked["day_low"],
+                "close": tracked["day_close"],
+                "volume": int(tracked["day_volume"] or 0),
+            }
+            outcome = tracked["state"]
+        else:
+            actuals = fetched.get(ticker) or get_day_summary(ticker, analysis_date)
+            if actuals is None:
+                logger.warning(f"Could not fetch actuals for {ticker} on {analysis_date}")
+                continue
+            if ticker not in fetched:
+                fetched[ticker] = actuals  # other profiles may hold the same ticker
+                if progress:
+                    progress.record({ticker: actuals})
+
+            outcome = _classify_outcome(
+                pred["predicted_entry"],
+                pred["predicted_target"],
+                pred["predicted_sl"],
+                actuals,
+            )
 
         reason = generate_reason(
             outcome=outcome,
@@ -100,31 +186,23 @@ def analyze_predictions(analysis_date: date) -> list[dict]:
             target_date=analysis_date,
         )
 
-        update_prediction_outcome(pred["id"], actuals, outcome, reason)
-        counters[outcome] += 1
-
-        results.append(
-            {
-                "stock": ticker,
-                "predicted_entry": pred["predicted_entry"],
-                "predicted_target": pred["predicted_target"],
-                "predicted_sl": pred["predicted_sl"],
-                "actual_open": actuals["open"],
-                "actual_high": actuals["high"],
-                "actual_low": actuals["low"],
-                "actual_close": actuals["close"],
-                "actual_volume": actuals["volume"],
-                "outcome": outcome,
-                "reason": reason,
-            }
-        )
+        if not provisional:
+            update_prediction_outcome(pred["id"], actuals, outcome, reason)
+        if (pred["profile"], pred["strategy"]) == _DEFAULT_BOOK:
+            counters[outcome] += 1
+            resolved_now += 1
+        results.append(_result_row(pred, actuals, outcome, reason))
 
-    total = len(results)
-    if total == 0:
+    total = sum(counters.values())
+    if total == 0 or provisional:
+        return results
+    if resolved_now == 0 and get_model_metrics(analysis_date) is not None:
+        logger.info(f"All {total} predictions for {analysis_date} already analyzed — nothing to do")
         return results
 
     win_rate = round(counters["TARGET HIT"] / total, 4)
-    retrained = _check_and_retrain(win_rate)
+    interval = _win_rate_interval(analysis_date, counters["TARGET HIT"], total)
+    retrained = _check_and_retrain(win_rate, interval)
 
     insert_model_metrics(
         {
@@ -136,6 +214,7 @@ def analyze_predictions(analysis_date: date) -> list[dict]:
             "stagnant": counters["STAGNANT"],
             "win_rate": win_rate,
             "retrained": int(retrained),
+            **_interval_columns(interval),
         }
     )
 
@@ -146,22 +225,64 @@ def analyze_predictions(analysis_date: date) -> list[dict]:
     return results
 
 
-def _check_and_retrain(current_win_rate: float) -> bool:
-    """Trigger retraining when accuracy degrades below threshold."""
-    avg_win_rate = get_recent_win_rate(lookback=5)
+def _win_rate_interval(eval_date: date, wins: int, total: int) -> dict | None:
+    """
+    Bootstrap interval of the win rate over eval_date's session and up to
+    BOOTSTRAP_SESSIONS - 1 before it, counting only sessions since the last
+    retrain was queued or new params were published: sessions the current
+    params are not answerable for would otherwise keep queueing retrains
+    until they age out. Seeded by the date, so a rerun of the same day
+    reproduces it.
+    """
+    history = get_model_metrics_history(eval_date, BOOTSTRAP_SESSIONS - 1, after=get_last_retrain_date(eval_date))
+    return win_rate_interval(
+        [r["target_hit"] or 0 for r in history] + [wins],
+        [r["total_predictions"] or 0 for r in history] + [total],
+        threshold=RETRAIN_ACCURACY_THRESHOLD,
+        seed=eval_date.toordinal(),
+    )
+
+
+def _interval_columns(interval: dict | None) -> dict:
+    if interval is None:
+        return {}
+    return {
+        "win_rate_ci_low": interval["ci_low"],
+        "win_rate_ci_high": interval["ci_high"],
+        "ci_sessions": interval["sessions"],
+        "degradation_prob": interval["prob_below"],
+    }
 
-    should_retrain = (
-        avg_win_rate is not None and avg_win_rate < RETRAIN_ACCURACY_THRESHOLD
-    ) or current_win_rate < RETRAIN_ACCURACY_THRESHOLD
 
-    if should_retrain:
+def _check_and_retrain(current_win_rate: float, interval: dict | None) -> bool:
+    """
+    Queue a retrain when the recent win rate is below threshold with
+    probability RETRAIN_CONFIDENCE or more, over at least MIN_SESSIONS
+    sessions. The search itself runs later in
+    retrainer.process_retrain_queue, off the daily job's path.
+    """
+    if interval is None:
+        return False
+    summary = (
+        f"win rate {interval['win_rate']:.1%} over {interval['sessions']} sessions "
+        f"({BOOTSTRAP_CONFIDENCE:.0%} CI {interval['ci_low']:.1%}–{interval['ci_high']:.1%})"
+    )
+    if interval["sessions"] < MIN_SESSIONS:
+        logger.info(f"Recent {summary}: too few sessions since the last retrain to judge it")
+        return False
+    if interval["prob_below"] >= RETRAIN_CONFIDENCE:
         logger.warning(
-            f"Win rate ({current_win_rate:.1%}) below threshold "
-            f"({RETRAIN_ACCURACY_THRESHOLD:.0%}). Triggering retrain."
+            f"Recent {summary} is below {RETRAIN_ACCURACY_THRESHOLD:.0%} "
+            f"with probability {interval['prob_below']:.1%}. Queueing retrain."
         )
-        _retrain_model()
+        enqueue_retrain(f"{summary}, P(below {RETRAIN_ACCURACY_THRESHOLD:.0%}) {interval['prob_below']:.1%}")
         return True
 
+    if current_win_rate < RETRAIN_ACCURACY_THRESHOLD:
+        logger.info(
+            f"Today's win rate ({current_win_rate:.1%}) is below {RETRAIN_ACCURACY_THRESHOLD:.0%}, but the recent "
+            f"{summary} is not significantly below it (P {interval['prob_below']:.1%}) — not retraining."
+        )
     return False
 
 
@@ -174,17 +295,20 @@ def _simulate_outcome(
     atr_mult_new: float,
     rr_new: float,
     atr_mult_used: float,
+    atr: float | None = None,
 ) -> str:
     """
     Re-classify outcome using new ATR multiplier and risk-reward.
-    Back-derives ATR from (entry - sl) = atr_mult_used * atr, then applies new levels.
+    Uses the ATR stored with the prediction; rows written before predictions
+    kept it fall back to back-deriving from (entry - sl) = atr_mult_used * atr.
     """
     if actual_high < entry:
         return "NO ENTRY"
-    atr_implied = (entry - sl) / atr_mult_used if atr_mult_used > 0 else 0
-    if atr_implied <= 0:
+    if atr is None:
+        atr = (entry - sl) / atr_mult_used if atr_mult_used > 0 else 0
+    if atr <= 0:
         return "NO ENTRY"
-    sl_new = entry - (atr_mult_new * atr_implied)
+    sl_new = entry - (atr_mult_new * atr)
     risk_new = entry - sl_new
     target_new = entry + (rr_new * risk_new)
     if actual_low <= sl_new:
@@ -193,63 +317,3 @@ def _simulate_outcome(
         return "TARGET HIT"
     return "STAGNANT"
 
-
-def _retrain_model():
-    """
-    Retrain by re-optimizing ATR multiplier and risk-reward ratio using recent
-    predictions with outcomes. Simulates outcomes over a parameter grid and
-    persists the best-performing pair.
-    """
-    rows = get_predictions_with_outcomes(limit=60)
-    if len(rows) < 10:
-        logger.warning(
-            "RETRAIN: Insufficient historical outcomes (%s). Need at least 10. Skipping.",
-            len(rows),
-        )
-        return
-
-    params = get_all_model_params()
-    atr_mult_used = params.get("atr_multiplier", ATR_MULTIPLIER)
-    rr_used = params.get("risk_reward_ratio", RISK_REWARD_RATIO)
-
-    atr_grid = [1.2, 1.35, 1.5, 1.65, 1.8, 2.0]
-    rr_grid = [1.5, 1.75, 2.0, 2.25, 2.5]
-
-    best_wr = -1.0
-    best_atr = atr_mult_used
-    best_rr = rr_used
-
-    for atr_mult_new in atr_grid:
-        for rr_new in rr_grid:
-            wins = 0
-            total = 0
-            for r in rows:
-                outcome = _simulate_outcome(
-                    entry=r["predicted_entry"],
-                    sl=r["predicted_sl"],
-                    target=r["predicted_target"],
-                    actual_high=r["actual_high"],
-                    actual_low=r["actual_low"],
-                    atr_mult_new=atr_mult_new,
-                    rr_new=rr_new,
-                    atr_mult_used=atr_mult_used,
-                )
-                if outcome == "TARGET HIT":
-                    wins += 1
-                total += 1
-            wr = wins / total if total else 0
-            if wr > best_wr:
-                best_wr = wr
-                best_atr = atr_mult_new
-                best_rr = rr_new
-
-    set_model_param("atr_multiplier", best_atr)
-    set_model_param("risk_reward_ratio", best_rr)
-    logger.info(
-        "RETRAIN: Updated model params — atr_multiplier=%.2f, risk_reward_ratio=%.2f "
-        "(simulated win rate %.1f%% on %s outcomes).",
-        best_atr,
-        best_rr,
-        best_wr * 100,
-        len(rows),
-    )
@@ -1,12 +1,33 @@
+import hashlib
+import json
 import logging
 from datetime import date
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Mapping
 
 import numpy as np
 import pandas as pd
 
-from config import NIFTY_200_TICKERS
-from data_fetcher import fetch_daily_ohlcv
-from database import get_all_model_params, insert_predictions
+from config import ENABLED_STRATEGIES, NIFTY_200_TICKERS, TICKER_OUTAGE_FRACTION
+from data_fetcher import fetch_daily_ohlcv, live_tickers
+from database import (
+    DEFAULT_PROFILE,
+    DEFAULT_STRATEGY,
+    FEATURE_COLUMNS,
+    STRATEGY_THRESHOLD_PREFIX,
+    get_features,
+    get_features_as_of,
+    get_model_params_version,
+    get_prediction_cache,
+    get_profile_params,
+    get_skipped_tickers,
+    insert_features,
+    insert_predictions,
+    record_ticker_results,
+    save_prediction_cache,
+)
+from diversify import correlation_tracker, select_diversified
+from trading_calendar import prev_session
 
 logger = logging.getLogger(__name__)
 
@@ -33,81 +54,407 @@ def _compute_ema(series: pd.Series, span: int) -> pd.Series:
     return series.ewm(span=span, adjust=False).mean()
 
 
-def _compute_macd(series: pd.Series) -> tuple[pd.Series, pd.Series]:
-    ema12 = _compute_ema(series, 12)
-    ema26 = _compute_ema(series, 26)
-    macd_line = ema12 - ema26
-    signal_line = _compute_ema(macd_line, 9)
-    return macd_line, signal_line
-
-
 def _compute_volume_sma(df: pd.DataFrame, period: int = 20) -> pd.Series:
     return df["Volume"].rolling(window=period).mean()
 
 
-def _score_stock(df: pd.DataFrame) -> float | None:
-    if len(df) < 30:
+# Points added by each scoring rule when it fires. _score_stock and the
+# vectorized _score_frame both read these, so a tuned set can be passed in.
+SCORE_WEIGHTS = {
+    "rsi_sweet_spot": 2.0,  # RSI 40-60: momentum building, not overbought
+    "rsi_strong": 1.0,  # RSI 60-70
+    "macd_cross": 2.0,  # MACD above signal line
+    "macd_positive": 1.0,  # MACD above zero
+    "volume_surge": 2.0,  # volume > 1.5x 20-day average
+    "volume_rising": 1.0,  # volume 1.2x-1.5x 20-day average
+    "above_ema20": 1.5,  # close above 20-EMA (trend confirmation)
+    "breakout_near": 2.0,  # close within 1 ATR of 20-day high
+}
+
+# Minimum bars of history before a stock can be scored
+MIN_HISTORY = 30
+
+# Tickers per feature-store write (and per resume checkpoint)
+FEATURE_BATCH_SIZE = 20
+
+
+# Indicator registry: name -> (indicators it is derived from, fn(bars, computed
+# columns) -> Series over every bar). Strategies declare the names they read;
+# _compute_indicators builds the union once per ticker, each name at most once.
+INDICATORS: dict[str, tuple[tuple[str, ...], Callable[[pd.DataFrame, dict], pd.Series]]] = {
+    "close": ((), lambda df, ind: df["Close"]),
+    "open": ((), lambda df, ind: df["Open"]),
+    "high": ((), lambda df, ind: df["High"]),
+    "low": ((), lambda df, ind: df["Low"]),
+    "volume": ((), lambda df, ind: df["Volume"]),
+    "prev_close": (("close",), lambda df, ind: ind["close"].shift(1)),
+    "atr": ((), lambda df, ind: _compute_atr(df)),
+    "rsi": (("close",), lambda df, ind: _compute_rsi(ind["close"])),
+    "macd": (("close",), lambda df, ind: _compute_ema(ind["close"], 12) - _compute_ema(ind["close"], 26)),
+    "macd_signal": (("macd",), lambda df, ind: _compute_ema(ind["macd"], 9)),
+    "vol_sma20": ((), lambda df, ind: _compute_volume_sma(df)),
+    "ema9": (("close",), lambda df, ind: _compute_ema(ind["close"], 9)),
+    "ema20": (("close",), lambda df, ind: _compute_ema(ind["close"], 20)),
+    "ema21": (("close",), lambda df, ind: _compute_ema(ind["close"], 21)),
+    "high_20": ((), lambda df, ind: df["High"].rolling(window=20, min_periods=1).max()),
+    "sma20": (("close",), lambda df, ind: ind["close"].rolling(window=20).mean()),
+    "std20": (("close",), lambda df, ind: ind["close"].rolling(window=20).std()),
+}
+
+# Always computed: the feature store columns and the level inputs
+BASE_INDICATORS = (
+    "close", "volume", "atr", "rsi", "macd", "macd_signal", "vol_sma20", "ema9", "ema20", "ema21", "high_20",
+)
+
+
+@lru_cache(maxsize=32)
+def _indicator_plan(names: frozenset[str]) -> tuple[str, ...]:
+    """BASE_INDICATORS plus names and everything they derive from, dependencies first."""
+    order: list[str] = []
+
+    def visit(name: str):
+        if name in order:
+            return
+        if name not in INDICATORS:
+            raise KeyError(f"unknown indicator {name!r}")
+        for dep in INDICATORS[name][0]:
+            visit(dep)
+        order.append(name)
+
+    for name in (*BASE_INDICATORS, *sorted(names)):
+        visit(name)
+    return tuple(order)
+
+
+def _compute_indicators(df: pd.DataFrame, names: Iterable[str] | None = None) -> pd.DataFrame:
+    """
+    Scoring and level inputs for every bar of df, in one pass: BASE_INDICATORS
+    plus names (default: whatever the enabled strategies declare).
+    """
+    if names is None:
+        names = {n for s in enabled_strategies() for n in s.indicators}
+    ind: dict[str, pd.Series] = {}
+    for name in _indicator_plan(frozenset(names)):
+        ind[name] = INDICATORS[name][1](df, ind)
+    return pd.DataFrame(ind, index=df.index)
+
+
+def _score_signals(ind: pd.DataFrame) -> pd.DataFrame:
+    """Boolean frame with one column per SCORE_WEIGHTS rule."""
+    rsi = ind["rsi"]
+    vol_ratio = ind["volume"] / ind["vol_sma20"].where(ind["vol_sma20"] > 0)
+    return pd.DataFrame(
+        {
+            "rsi_sweet_spot": (rsi >= 40) & (rsi <= 60),
+            "rsi_strong": (rsi > 60) & (rsi <= 70),
+            "macd_cross": ind["macd"] > ind["macd_signal"],
+            "macd_positive": ind["macd"] > 0,
+            "volume_surge": vol_ratio > 1.5,
+            "volume_rising": (vol_ratio > 1.2) & (vol_ratio <= 1.5),
+            "above_ema20": ind["close"] > ind["ema20"],
+            "breakout_near": (ind["high_20"] - ind["close"]) <= ind["atr"],
+        },
+        index=ind.index,
+    )
+
+
+def _score_frame(ind: pd.DataFrame, weights: dict[str, float] | None = None) -> pd.Series:
+    """Score for every bar; NaN where the stock cannot be scored yet."""
+    weights = weights or SCORE_WEIGHTS
+    signals = _score_signals(ind)
+    names = list(weights)
+    score = pd.Series(
+        signals[names].to_numpy(dtype=float) @ np.array([weights[n] for n in names]),
+        index=ind.index,
+    )
+    valid = ind["rsi"].notna() & ind["atr"].notna() & (ind["atr"] != 0)
+    valid &= np.arange(len(ind)) >= MIN_HISTORY - 1
+    return score.where(valid)
+
+
+def _score_stock(df: pd.DataFrame, weights: dict[str, float] | None = None) -> float | None:
+    if len(df) < MIN_HISTORY:
         return None
-
-    close = df["Close"]
-    atr = _compute_atr(df)
-    rsi = _compute_rsi(close)
-    macd_line, signal_line = _compute_macd(close)
-    vol_sma = _compute_volume_sma(df)
-
-    latest = df.iloc[-1]
-    latest_rsi = rsi.iloc[-1]
-    latest_macd = macd_line.iloc[-1]
-    latest_signal = signal_line.iloc[-1]
-    latest_vol = latest["Volume"]
-    latest_vol_sma = vol_sma.iloc[-1]
-    latest_atr = atr.iloc[-1]
-
-    if pd.isna(latest_rsi) or pd.isna(latest_atr) or latest_atr == 0:
-        return None
-
-    score = 0.0
-
-    # RSI sweet spot (40-60 = momentum building, not overbought)
-    if 40 <= latest_rsi <= 60:
-        score += 2.0
-    elif 60 < latest_rsi <= 70:
-        score += 1.0
-
-    # MACD bullish crossover
-    if latest_macd > latest_signal:
-        score += 2.0
-    if latest_macd > 0:
-        score += 1.0
-
-    # Volume surge
-    if latest_vol_sma and latest_vol_sma > 0:
-        vol_ratio = latest_vol / latest_vol_sma
-        if vol_ratio > 1.5:
-            score += 2.0
-        elif vol_ratio > 1.2:
-            score += 1.0
-
-    # Price above 20-EMA (trend confirmation)
-    ema20 = _compute_ema(close, 20).iloc[-1]
-    if latest["Close"] > ema20:
-        score += 1.5
-
-    # Breakout proximity: price within 1 ATR of 20-day high
-    high_20 = df["High"].tail(20).max()
-    if (high_20 - latest["Close"]) <= latest_atr:
-        score += 2.0
-
-    return score
-
-
-def _calculate_levels(df: pd.DataFrame, atr_multiplier: float, risk_reward_ratio: float) -> dict:
-    atr_series = _compute_atr(df)
-    atr = float(atr_series.iloc[-1])
-    latest_close = float(df["Close"].iloc[-1])
-    high_20 = float(df["High"].tail(20).max())
-
-    entry = round(max(high_20, latest_close + atr * 0.3), 2)
+    score = _score_frame(_compute_indicators(df), weights).iloc[-1]
+    return None if pd.isna(score) else float(score)
+
+
+def _breakout_entry(row: Mapping) -> float:
+    """Trigger above the 20-day high (or 0.3 ATR over the close when that is higher)."""
+    return max(float(row["high_20"]), float(row["close"]) + float(row["atr"]) * 0.3)
+
+
+def _rebound_entry(row: Mapping) -> float:
+    """Trigger a little above the close: buy the first sign of the bounce."""
+    return float(row["close"]) + float(row["atr"]) * 0.2
+
+
+class Strategy:
+    """
+    A named scoring rule set: the indicators it reads, a vectorized score
+    (indicator frame -> score per bar), the entry trigger its levels use
+    (from a stored feature row, see database.FEATURE_COLUMNS) and the score
+    a pick must beat. Scores are on each strategy's own scale, so threshold
+    None (momentum only) means the profile's score_threshold, the one
+    retraining tunes; a profile can override any strategy's with
+    "score_threshold.<strategy>".
+    """
+
+    def __init__(
+        self,
+        name: str,
+        indicators: tuple[str, ...],
+        score: Callable[[pd.DataFrame], pd.Series],
+        entry: Callable[[Mapping], float] = _breakout_entry,
+        threshold: float | None = None,
+    ):
+        self.name = name
+        self.indicators = indicators
+        self.score = score
+        self.entry = entry
+        self.threshold = threshold
+
+    def threshold_for(self, params: Mapping[str, float]) -> float:
+        """The score this strategy's picks must beat under a profile's merged params."""
+        override = params.get(f"{STRATEGY_THRESHOLD_PREFIX}{self.name}")
+        if override is not None:
+            return float(override)
+        return params["score_threshold"] if self.threshold is None else self.threshold
+
+    def __repr__(self) -> str:
+        return f"Strategy({self.name!r})"
+
+
+STRATEGIES: dict[str, Strategy] = {}
+
+
+def register_strategy(
+    name: str,
+    indicators: Iterable[str],
+    entry: Callable[[Mapping], float] = _breakout_entry,
+    threshold: float | None = None,
+) -> Callable:
+    """Decorator adding a score function to STRATEGIES; enable it by name in ENABLED_STRATEGIES."""
+    unknown = set(indicators) - set(INDICATORS)
+    if unknown:
+        raise KeyError(f"strategy {name!r} reads unknown indicators: {', '.join(sorted(unknown))}")
+
+    def register(fn: Callable[[pd.DataFrame], pd.Series]):
+        STRATEGIES[name] = Strategy(name, tuple(indicators), fn, entry, threshold)
+        return fn
+
+    return register
+
+
+@register_strategy(
+    DEFAULT_STRATEGY,
+    ("rsi", "macd", "macd_signal", "volume", "vol_sma20", "close", "ema20", "high_20", "atr"),
+)
+def _momentum_score(ind: pd.DataFrame) -> pd.Series:
+    """Breakout momentum: the SCORE_WEIGHTS rules (the features table's score)."""
+    return _score_frame(ind)
+
+
+# Mean reversion: oversold names stretched below their 20-day mean
+MEAN_REVERSION_WEIGHTS = {
+    "rsi_oversold": 3.0,  # RSI below 30
+    "rsi_weak": 1.5,  # RSI 30-35
+    "below_lower_band": 3.0,  # close more than 2 std under the 20-day mean
+    "stretched": 1.5,  # close 1-2 std under the 20-day mean
+    "up_close": 1.0,  # closed above the previous close: selling may be exhausted
+}
+
+
+# Out of 7: two of oversold / under the band / up close
+@register_strategy(
+    "mean_reversion", ("rsi", "close", "prev_close", "sma20", "std20"), entry=_rebound_entry, threshold=3.0
+)
+def _mean_reversion_score(ind: pd.DataFrame) -> pd.Series:
+    rsi = ind["rsi"]
+    z = (ind["close"] - ind["sma20"]) / ind["std20"].where(ind["std20"] > 0)
+    rules = {
+        "rsi_oversold": rsi < 30,
+        "rsi_weak": (rsi >= 30) & (rsi < 35),
+        "below_lower_band": z < -2,
+        "stretched": (z >= -2) & (z < -1),
+        "up_close": ind["close"] > ind["prev_close"],
+    }
+    return sum(rules[k].astype(float) * w for k, w in MEAN_REVERSION_WEIGHTS.items())
+
+
+# Gap and go: gapped up on volume and held the gap into the close
+GAP_WEIGHTS = {
+    "gap_up": 2.0,  # opened at least 0.5 ATR above the previous close
+    "gap_held": 2.0,  # closed above the open and the previous close
+    "strong_close": 1.5,  # close in the top quarter of the day's range
+    "volume_surge": 2.0,  # volume > 1.5x 20-day average
+}
+
+
+# Out of 7.5: two of gap up / gap held / volume surge
+@register_strategy(
+    "gap", ("open", "prev_close", "close", "high", "low", "atr", "volume", "vol_sma20"), threshold=3.5
+)
+def _gap_score(ind: pd.DataFrame) -> pd.Series:
+    day_range = (ind["high"] - ind["low"]).where(ind["high"] > ind["low"])
+    rules = {
+        "gap_up": ind["open"] - ind["prev_close"] >= 0.5 * ind["atr"],
+        "gap_held": (ind["close"] > ind["open"]) & (ind["close"] > ind["prev_close"]),
+        "strong_close": (ind["close"] - ind["low"]) / day_range >= 0.75,
+        "volume_surge": ind["volume"] / ind["vol_sma20"].where(ind["vol_sma20"] > 0) > 1.5,
+    }
+    return sum(rules[k].astype(float) * w for k, w in GAP_WEIGHTS.items())
+
+
+def enabled_strategies() -> list[Strategy]:
+    """The strategies named in ENABLED_STRATEGIES, in that order (unknown names are skipped)."""
+    out = []
+    for name in ENABLED_STRATEGIES:
+        if name in STRATEGIES:
+            out.append(STRATEGIES[name])
+        else:
+            logger.warning(f"Unknown strategy {name!r} in ENABLED_STRATEGIES — skipped")
+    return out
+
+
+def _strategy_frame(ind: pd.DataFrame, strategies: list[Strategy]) -> pd.DataFrame:
+    """One score column per strategy for every bar; NaN where the stock cannot be scored yet."""
+    valid = ind["atr"].notna() & (ind["atr"] != 0) & (np.arange(len(ind)) >= MIN_HISTORY - 1)
+    return pd.DataFrame({s.name: s.score(ind).where(valid) for s in strategies}, index=ind.index)
+
+
+def _strategy_score(features: Mapping, name: str) -> float | None:
+    """A stored feature row's score under one strategy."""
+    if name == DEFAULT_STRATEGY:
+        return features["score"]
+    return (features.get("strategy_scores") or {}).get(name)
+
+
+def _feature_frame(
+    ind: pd.DataFrame, weights: dict[str, float] | None = None, score: pd.Series | None = None
+) -> pd.DataFrame:
+    """
+    Stored features (database.FEATURE_COLUMNS) for every bar of an indicator
+    frame. score: the momentum score when the caller already has it.
+    """
+    atr = ind["atr"].where(ind["atr"] != 0)
+    feats = ind.assign(
+        vol_ratio=ind["volume"] / ind["vol_sma20"].where(ind["vol_sma20"] > 0),
+        ema_gap_prev=(ind["ema9"] - ind["ema21"]).shift(1),
+        ema20_dist=ind["close"] / ind["ema20"] - 1,
+        breakout_dist=(ind["high_20"] - ind["close"]) / atr,
+        score=_score_frame(ind, weights) if score is None else score,
+    )
+    return feats[list(FEATURE_COLUMNS)]
+
+
+def _feature_row(session_date: date, ticker: str, feats: pd.Series, strategy_scores: pd.Series | None = None) -> dict:
+    """One feature row as stored: NaN becomes None. strategy_scores: one bar of _strategy_frame."""
+    row = {"session_date": session_date.isoformat(), "stock": ticker}
+    for col, value in feats.items():
+        row[col] = None if pd.isna(value) else (int(value) if col == "volume" else float(value))
+    if strategy_scores is not None:
+        row["strategy_scores"] = {k: None if pd.isna(v) else float(v) for k, v in strategy_scores.items()}
+    return row
+
+
+def compute_daily_features(
+    session_date: date, tickers: list[str] | None = None, progress=None, provisional: bool = False
+) -> dict[str, dict]:
+    """
+    Score every ticker on its daily bars up to and including session_date
+    and write the features in batches, keyed by the date of the last bar.
+    A ticker whose last bar is older than session_date (halted, or Yahoo
+    has not published the session yet) is skipped as having no data. Each
+    ticker's indicators are computed once (the union of what the enabled
+    strategies declare) and every enabled strategy is scored from them.
+    Returns the feature rows keyed by ticker.
+
+    progress: optional daily_pipeline.StageProgress. Tickers it already lists
+    are read back from the feature store instead of downloaded, and each
+    written batch is checkpointed, so a rerun resumes where this one stopped.
+
+    Tickers the failure registry is skipping are not downloaded; the scan's
+    empty or failing tickers (and the ones that recovered) are recorded
+    there, unless so many failed that it looks like a Yahoo outage.
+
+    provisional: session_date is still trading, so its bar is partial. The
+    rows are returned but nothing is written: no features, no checkpoints,
+    no failure records.
+    """
+    if provisional:
+        progress = None
+    universe = live_tickers(tickers or NIFTY_200_TICKERS, session_date)
+    strategies = enabled_strategies()
+    indicator_names = {n for s in strategies for n in s.indicators}
+    done = progress.completed() if progress else {}
+    stored = get_features(session_date, [t for t in universe if t in done]) if done else {}
+    if done:
+        logger.info(f"Features: {len(done)} tickers already processed for {session_date}")
+
+    rows: dict[str, dict] = {}
+    batch: dict[str, dict] = {}
+    finished: dict[str, Any] = {}
+    # Failures of checkpointed tickers count too, so a resumed run records them
+    failed = {t: "no data" for t, payload in done.items() if payload == {"skipped": "no data"}}
+    succeeded = [t for t in done if t not in failed]
+
+    def flush():
+        if not provisional:
+            insert_features(list(batch.values()))
+        if progress:
+            progress.record(finished)
+        batch.clear()
+        finished.clear()
+
+    for ticker in universe:
+        if ticker in done:
+            if ticker in stored:
+                rows[ticker] = stored[ticker]
+            continue
+        try:
+            df = fetch_daily_ohlcv(ticker, through=session_date)
+            bar_date = df.index[-1].date() if not df.empty else None
+            if bar_date != session_date:
+                failed[ticker] = "no data" if bar_date is None else f"no bar for {session_date} (last {bar_date})"
+                finished[ticker] = {"skipped": "no data"}
+                continue
+            succeeded.append(ticker)
+            if len(df) < MIN_HISTORY:
+                finished[ticker] = {"skipped": "insufficient history"}
+                continue
+            ind = _compute_indicators(df, indicator_names)
+            scores = _strategy_frame(ind, strategies)
+            feats = _feature_frame(ind, score=scores.get(DEFAULT_STRATEGY))
+            rows[ticker] = batch[ticker] = _feature_row(bar_date, ticker, feats.iloc[-1], scores.iloc[-1])
+            finished[ticker] = None
+        except Exception as e:
+            # Not checkpointed: a transient failure is retried on the next run
+            logger.warning(f"Skipping {ticker}: {e}")
+            failed[ticker] = f"{type(e).__name__}: {e}"
+        if len(finished) >= FEATURE_BATCH_SIZE:
+            flush()
+    flush()
+    if provisional:
+        logger.info(f"Scored {len(rows)} tickers on {session_date}'s partial bar (not stored)")
+        return rows
+    logger.info(f"Stored features for {len(rows)} tickers on {session_date}")
+
+    attempted = len(failed) + len(succeeded)
+    if attempted and len(failed) > TICKER_OUTAGE_FRACTION * attempted:
+        logger.warning(f"{len(failed)}/{attempted} tickers failed — looks like an outage, not recording failures")
+    else:
+        record_ticker_results(failed, succeeded, session_date)
+    return rows
+
+
+def _levels_from_indicators(
+    latest: Mapping, atr_multiplier: float, risk_reward_ratio: float, entry_rule: Callable[[Mapping], float] = _breakout_entry
+) -> dict:
+    """Entry/target/SL from one indicator or feature row; entry_rule is the strategy's trigger."""
+    atr = float(latest["atr"])
+
+    entry = round(entry_rule(latest), 2)
     sl = round(entry - (atr_multiplier * atr), 2)
     risk = entry - sl
     target = round(entry + (risk_reward_ratio * risk), 2)
@@ -115,47 +462,164 @@ def _calculate_levels(df: pd.DataFrame, atr_multiplier: float, risk_reward_ratio
     return {"entry": entry, "target": target, "sl": sl, "atr": round(atr, 2)}
 
 
-def generate_predictions(target_date: date, prediction_date: date) -> list[dict]:
-    params = get_all_model_params()
-    atr_mult = params["atr_multiplier"]
-    rr_ratio = params["risk_reward_ratio"]
-    score_threshold = params["score_threshold"]
-    prediction_count = int(params["prediction_count"])
-
-    scored: list[tuple[str, float, pd.DataFrame]] = []
-
-    for ticker in NIFTY_200_TICKERS:
-        try:
-            df = fetch_daily_ohlcv(ticker)
-            if df.empty:
-                continue
-            s = _score_stock(df)
-            if s is not None and s > score_threshold:
-                scored.append((ticker, s, df))
-        except Exception as e:
-            logger.warning(f"Skipping {ticker}: {e}")
-
-    scored.sort(key=lambda x: x[1], reverse=True)
-    top = scored[:prediction_count]
-
-    predictions = []
-    for ticker, score, df in top:
-        levels = _calculate_levels(df, atr_mult, rr_ratio)
-        predictions.append(
-            {
-                "prediction_date": prediction_date.isoformat(),
-                "target_date": target_date.isoformat(),
-                "stock": ticker,
-                "predicted_entry": levels["entry"],
-                "predicted_target": levels["target"],
-                "predicted_sl": levels["sl"],
-                "score": round(score, 2),
-                "atr": levels["atr"],
-            }
+def _calculate_levels(df: pd.DataFrame, atr_multiplier: float, risk_reward_ratio: float) -> dict:
+    return _levels_from_indicators(_compute_indicators(df).iloc[-1], atr_multiplier, risk_reward_ratio)
+
+
+def _prediction_row(
+    ticker: str,
+    score: float,
+    levels: dict,
+    target_date: date,
+    prediction_date: date,
+    profile: str = DEFAULT_PROFILE,
+    strategy: str = DEFAULT_STRATEGY,
+) -> dict:
+    return {
+        "prediction_date": prediction_date.isoformat(),
+        "target_date": target_date.isoformat(),
+        "stock": ticker,
+        "predicted_entry": levels["entry"],
+        "predicted_target": levels["target"],
+        "predicted_sl": levels["sl"],
+        "score": round(score, 2),
+        "atr": levels["atr"],
+        "profile": profile,
+        "strategy": strategy,
+    }
+
+
+def _prediction_cache_key(prediction_date: date, profiles: dict[str, dict]) -> dict | None:
+    """
+    What a prediction result depends on: when prediction_date's features were
+    written, the params version, every profile's merged params and the enabled
+    strategies, and the live universe. None while the day has no features.
+    """
+    data_as_of = get_features_as_of(prediction_date)
+    if data_as_of is None:
+        return None
+    version = get_model_params_version()
+    universe = sorted(set(NIFTY_200_TICKERS) - get_skipped_tickers(prediction_date))
+    parts = {
+        "data_as_of": data_as_of,
+        "params_version": version["version"] if version else None,
+        "universe_hash": hashlib.sha1("\n".join(universe).encode()).hexdigest(),
+    }
+    strategies = {s.name: s.threshold for s in enabled_strategies()}
+    inputs = {**parts, "prediction_date": prediction_date.isoformat(), "profiles": profiles, "strategies": strategies}
+    return {**parts, "cache_key": hashlib.sha1(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()}
+
+
+def cached_profile_predictions(
+    target_date: date, prediction_date: date, profiles: dict[str, dict] | None = None
+) -> dict[str, list[dict]] | None:
+    """target_date's stored result if it was generated from the current inputs, else None."""
+    cached = get_prediction_cache(target_date)
+    if cached is None:
+        return None
+    key = _prediction_cache_key(prediction_date, profiles or get_profile_params())
+    if key is None or key["cache_key"] != cached["cache_key"]:
+        return None
+    logger.info(
+        f"Predictions for {target_date} served from cache "
+        f"(features as of {key['data_as_of']}, params v{key['params_version']})"
+    )
+    return cached["result"]
+
+
+def generate_profile_predictions(
+    target_date: date,
+    prediction_date: date,
+    features: dict[str, dict] | None = None,
+    force: bool = False,
+    provisional: bool = False,
+) -> dict[str, list[dict]]:
+    """
+    Picks for target_date under every profile (see database.get_profiles) and
+    every enabled strategy: {profile: predictions}, default profile first,
+    each row tagged with its strategy. The universe is scored once and each
+    strategy's ranking sorted once; each (profile, strategy) pair then only
+    applies the strategy's threshold under that profile
+    (Strategy.threshold_for), takes its diversified top-k and computes
+    levels with the profile's multipliers and the strategy's entry, and all
+    rows are stored in one write. features: rows from compute_daily_features
+    for prediction_date, when the caller already has them; otherwise they
+    are computed (and stored) here.
+
+    Without features, a result cached for target_date from the same inputs
+    (cached_profile_predictions) is returned instead; force skips the cache.
+    Every generated result is cached.
+
+    provisional: prediction_date is still trading. The picks are returned
+    but neither stored nor cached, and correlations stop at the previous
+    session (the tracker would otherwise save the partial close).
+    """
+    profiles = get_profile_params()
+    if features is None and not force and not provisional:
+        cached = cached_profile_predictions(target_date, prediction_date, profiles)
+        if cached is not None:
+            return cached
+    strategies = enabled_strategies()
+    if features is None:
+        features = compute_daily_features(prediction_date, provisional=provisional)
+
+    rankings: dict[str, list[tuple[str, float, dict]]] = {}
+    for strategy in strategies:
+        scored = ((ticker, _strategy_score(f, strategy.name), f) for ticker, f in features.items())
+        rankings[strategy.name] = sorted(
+            ((t, score, f) for t, score, f in scored if score is not None), key=lambda x: x[1], reverse=True
         )
-
-    if predictions:
-        insert_predictions(predictions)
-        logger.info(f"Stored {len(predictions)} predictions for {target_date}")
-
-    return predictions
+    tracker = None
+    out: dict[str, list[dict]] = {}
+    for name, params in profiles.items():
+        prediction_count = int(params["prediction_count"])
+        out[name] = []
+        for strategy in strategies:
+            ranked = rankings[strategy.name]
+            threshold = strategy.threshold_for(params)
+            # ranked is descending, so the names above a threshold are a prefix
+            cut = next((i for i, (_, score, _) in enumerate(ranked) if score <= threshold), len(ranked))
+            scored = ranked[:cut]
+            if len(scored) > prediction_count and tracker is None:
+                tracker = correlation_tracker(prev_session(prediction_date) if provisional else prediction_date)
+            picked = set(select_diversified([t for t, _, _ in scored], prediction_count, tracker))
+            out[name].extend(
+                _prediction_row(
+                    ticker,
+                    score,
+                    _levels_from_indicators(latest, params["atr_multiplier"], params["risk_reward_ratio"], strategy.entry),
+                    target_date,
+                    prediction_date,
+                    name,
+                    strategy.name,
+                )
+                for ticker, score, latest in scored
+                if ticker in picked
+            )
+
+    rows = [p for preds in out.values() for p in preds]
+    if provisional:
+        logger.info(f"Provisional picks for {target_date}: {len(rows)} (not stored)")
+        return out
+    if rows:
+        insert_predictions(rows)
+        logger.info(
+            f"Stored {len(rows)} predictions for {target_date} across {len(out)} profiles "
+            f"and {len(strategies)} strategies ({', '.join(f'{name}: {len(preds)}' for name, preds in out.items())})"
+        )
+    key = _prediction_cache_key(prediction_date, profiles)
+    if key is not None:
+        save_prediction_cache(target_date, prediction_date, key, out)
+    return out
+
+
+def generate_predictions(
+    target_date: date, prediction_date: date, features: dict[str, dict] | None = None, force: bool = False
+) -> list[dict]:
+    """
+    Pick the top-scoring tickers for target_date, skipping names too
+    correlated with a higher-ranked pick (see diversify). Runs every profile
+    and strategy (generate_profile_predictions) and returns the default
+    profile's picks.
+    """
+    return generate_profile_predictions(target_date, prediction_date, features, force)[DEFAULT_PROFILE]
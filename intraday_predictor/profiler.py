@@ -0,0 +1,261 @@
+"""
+Whole-run profiling for the daily job (main.py --now --profile,
+/predict?profile=1).
+
+One profiled run writes a directory under PROFILE_DIR:
+
+    cpu.prof          cProfile stats (pstats / snakeviz)
+    cpu.txt           functions by cumulative and by own time
+    stacks.collapsed  sampled stacks, one "frame;frame;frame count" line each
+                      (flamegraph.pl, speedscope, inferno)
+    memory.snapshot   tracemalloc snapshot at the run's peak (Snapshot.load,
+                      compare_to)
+    memory.txt        top allocation sites at the peak, overall and inside
+                      FOCUS_FUNCTIONS, plus what was still held at the end
+    summary.json      wall time, peak memory and the top entries of the above
+
+cProfile only sees the calling thread; the stack sampler also covers threads
+started during the run (yfinance download workers). tracemalloc with deep
+tracebacks slows allocation-heavy code several times, so compare profiled
+runs with profiled runs.
+"""
+import cProfile
+import importlib
+import io
+import json
+import logging
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from config import PROFILE_DIR, PROFILE_SAMPLE_INTERVAL, PROFILE_TRACEMALLOC_FRAMES
+
+logger = logging.getLogger(__name__)
+
+# Allocation sites are also reported per function for these. compute_daily_features
+# is the universe scoring pass (it replaced per-ticker _score_stock calls in the
+# daily job); _score_stock still runs for ad-hoc scoring.
+FOCUS_FUNCTIONS = (
+    "prediction_engine.compute_daily_features",
+    "prediction_engine._score_stock",
+    "why_generator.generate_reason",
+)
+TOP_N = 30
+
+# tracemalloc and the profiler hooks are process-wide: one profiled run at a time
+_run_lock = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Another profiled run is in progress in this process."""
+
+
+class _StackSampler(threading.Thread):
+    """
+    Samples the stacks of the given threads every interval seconds, and
+    keeps a tracemalloc snapshot of the highest traced memory seen (retaken
+    whenever it grows by PEAK_GROWTH).
+    """
+
+    PEAK_GROWTH = 1.1
+
+    def __init__(self, interval: float, thread_ids: set[int]):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.baseline = {t.ident for t in threading.enumerate()} - thread_ids
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self.peak_snapshot: tracemalloc.Snapshot | None = None
+        self._peak_size = 1024 * 1024
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                # The run's own thread plus anything it started; not the server's idle threads
+                if tid == own or tid in self.baseline:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(tid, f"thread-{tid}"))
+                self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+            current, _ = tracemalloc.get_traced_memory()
+            if current > self._peak_size * self.PEAK_GROWTH:
+                self.peak_snapshot = tracemalloc.take_snapshot()
+                self._peak_size = current
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _function_span(qualified: str) -> tuple[str, int, int] | None:
+    module_name, func_name = qualified.rsplit(".", 1)
+    try:
+        func = getattr(importlib.import_module(module_name), func_name)
+    except (ImportError, AttributeError):
+        return None
+    code = func.__code__
+    lines = [line for _, _, line in code.co_lines() if line is not None]
+    return code.co_filename, code.co_firstlineno, max(lines, default=code.co_firstlineno)
+
+
+def _site(frame) -> str:
+    return f"{frame.filename}:{frame.lineno}"
+
+
+def _allocation_report(snapshot: tracemalloc.Snapshot) -> tuple[list[dict], dict[str, list[dict]]]:
+    """Top allocation sites overall, and per focus function (any frame inside it)."""
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
+    overall = [
+        {"site": _site(s.traceback[0]), "size_kb": round(s.size / 1024, 1), "count": s.count}
+        for s in snapshot.statistics("lineno")[:TOP_N]
+    ]
+    spans = {name: span for name in FOCUS_FUNCTIONS if (span := _function_span(name))}
+    focus: dict[str, Counter] = {name: Counter() for name in spans}
+    focus_counts: dict[str, Counter] = {name: Counter() for name in spans}
+    for trace in snapshot.traces:
+        frames = trace.traceback
+        for name, (filename, first, last) in spans.items():
+            if any(f.filename == filename and first <= f.lineno <= last for f in frames):
+                # Traceback frames run oldest to most recent: the last is the allocating line
+                site = _site(frames[-1])
+                focus[name][site] += trace.size
+                focus_counts[name][site] += 1
+    by_function = {
+        name: [
+            {"site": site, "size_kb": round(size / 1024, 1), "count": focus_counts[name][site]}
+            for site, size in sizes.most_common(TOP_N)
+        ]
+        for name, sizes in focus.items()
+    }
+    return overall, by_function
+
+
+def _cpu_report(profile: cProfile.Profile) -> tuple[str, list[dict]]:
+    out = io.StringIO()
+    stats = pstats.Stats(profile, stream=out)
+    stats.sort_stats("cumulative").print_stats(60)
+    stats.sort_stats("tottime").print_stats(TOP_N)
+    top = sorted(stats.stats.items(), key=lambda kv: kv[1][3], reverse=True)[:TOP_N]
+    rows = [
+        {
+            "function": f"{Path(filename).name}:{lineno}({func})",
+            "calls": nc,
+            "cumtime": round(ct, 4),
+            "tottime": round(tt, 4),
+        }
+        for (filename, lineno, func), (cc, nc, tt, ct, _callers) in top
+    ]
+    return out.getvalue(), rows
+
+
+class RunProfiler:
+    """
+    Context manager that profiles everything run inside it and writes the
+    report directory on exit. summary holds the summary.json content.
+
+        with RunProfiler("daily_job") as prof:
+            daily_job()
+        prof.summary["dir"]
+    """
+
+    def __init__(self, label: str, directory: Path | None = None):
+        self.label = label
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.directory = Path(directory or PROFILE_DIR) / f"{label}-{stamp}"
+        self.summary: dict = {}
+
+    def __enter__(self) -> "RunProfiler":
+        if not _run_lock.acquire(blocking=False):
+            raise ProfilerBusy("a profiled run is already in progress")
+        self._started_tracemalloc = not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        self._sampler = _StackSampler(PROFILE_SAMPLE_INTERVAL, {threading.get_ident()})
+        self._sampler.start()
+        self._profile = cProfile.Profile()
+        self._t0 = time.perf_counter()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._profile.disable()
+        wall = time.perf_counter() - self._t0
+        self._sampler.stop()
+        try:
+            end_snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+            self._write(wall, self._sampler.peak_snapshot or end_snapshot, end_snapshot, peak, failed=exc_type is not None)
+        finally:
+            _run_lock.release()
+        return False
+
+    def _write(self, wall: float, peak_snapshot, end_snapshot, peak: int, failed: bool):
+        d = self.directory
+        n = 1
+        while d.exists():  # two runs within the same second
+            n += 1
+            d = self.directory.with_name(f"{self.directory.name}-{n}")
+        self.directory = d
+        d.mkdir(parents=True)
+        self._profile.dump_stats(str(d / "cpu.prof"))
+        cpu_text, cpu_top = _cpu_report(self._profile)
+        (d / "cpu.txt").write_text(cpu_text)
+
+        with open(d / "stacks.collapsed", "w") as f:
+            for stack, count in sorted(self._sampler.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+        peak_snapshot.dump(str(d / "memory.snapshot"))
+        overall, by_function = _allocation_report(peak_snapshot)
+        retained, _ = _allocation_report(end_snapshot)
+
+        def write_sites(f, sites):
+            for a in sites:
+                f.write(f"  {a['size_kb']:>10.1f} KiB {a['count']:>8}  {a['site']}\n")
+            if not sites:
+                f.write("  (no live allocations)\n")
+
+        with open(d / "memory.txt", "w") as f:
+            f.write(f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB\n\nTop allocation sites at the peak:\n")
+            write_sites(f, overall)
+            for name, sites in by_function.items():
+                f.write(f"\nInside {name} at the peak:\n")
+                write_sites(f, sites)
+            f.write("\nStill allocated at the end of the run:\n")
+            write_sites(f, retained)
+
+        self.summary = {
+            "label": self.label,
+            "dir": str(d),
+            "failed": failed,
+            "wall_seconds": round(wall, 3),
+            "stack_samples": self._sampler.samples,
+            "peak_memory_mb": round(peak / 1024 / 1024, 1),
+            "cpu_top": cpu_top[:15],
+            "allocations_top": overall[:15],
+            "focus_allocations": {name: sites[:10] for name, sites in by_function.items()},
+        }
+        (d / "summary.json").write_text(json.dumps(self.summary, indent=2))
+        logger.info(
+            f"Profile written to {d} ({wall:.1f}s wall, {self._sampler.samples} stack samples, "
+            f"peak {peak / 1024 / 1024:.1f} MiB traced)"
+        )
@@ -0,0 +1,291 @@
+"""
+Retraining worker.
+
+The post-mortem only queues a retrain (retrain_jobs); this module drains the
+queue outside the daily job, so tomorrow's predictions never wait on the
+parameter search.
+
+The search is walk-forward cross-validated, so a pair is never judged on the
+rows it was fitted to. Resolved predictions are split by session into
+rolling folds: fit on RETRAIN_TRAIN_SESSIONS sessions, score on the next
+RETRAIN_TEST_SESSIONS, step forward by the test size. Within a fold every
+(atr_multiplier, risk_reward_ratio) pair of the grid is simulated on all the
+fold's rows in one broadcast numpy comparison. Folds run in a process pool,
+newest first, until RETRAIN_TIME_BUDGET runs out.
+
+The pair that fits the latest RETRAIN_TRAIN_SESSIONS best is published as one
+new model_params version, but only if picking the best pair on each fold's
+training sessions beat the live pair on the test sessions that followed.
+"""
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import numpy as np
+
+from config import (
+    RETRAIN_HISTORY_ROWS,
+    RETRAIN_TEST_SESSIONS,
+    RETRAIN_TIME_BUDGET,
+    RETRAIN_TRAIN_SESSIONS,
+    RETRAIN_WORKERS,
+)
+from database import (
+    claim_retrain_job,
+    finish_retrain_job,
+    get_all_model_params,
+    get_predictions_with_outcomes,
+    publish_model_params,
+)
+
+logger = logging.getLogger(__name__)
+
+# Search bounds (the range the old fixed grid covered) and grid step for
+# (atr_multiplier, risk_reward_ratio)
+ATR_BOUNDS = (1.2, 2.0)
+RR_BOUNDS = (1.5, 2.5)
+GRID_STEP = 0.05
+MIN_OUTCOMES = 10
+# Pairs kept in the job result, best out-of-sample first
+REPORT_PAIRS = 20
+
+# Arrays shared by every worker (set once per process by _init_worker)
+_ARRAYS: dict[str, np.ndarray] = {}
+
+
+def _grid(live: tuple[float, float]) -> np.ndarray:
+    """Every (atr_multiplier, risk_reward_ratio) pair in the bounds, plus the live pair."""
+    atr = np.round(np.arange(ATR_BOUNDS[0], ATR_BOUNDS[1] + GRID_STEP / 2, GRID_STEP), 2)
+    rr = np.round(np.arange(RR_BOUNDS[0], RR_BOUNDS[1] + GRID_STEP / 2, GRID_STEP), 2)
+    a, r = np.meshgrid(atr, rr, indexing="ij")
+    return np.unique(np.vstack([np.column_stack([a.ravel(), r.ravel()]), [live]]), axis=0)
+
+
+def build_arrays(rows: list[dict], atr_mult_used: float, live: tuple[float, float]) -> dict[str, np.ndarray]:
+    """
+    Outcome rows as chronological arrays, with the session index of each row.
+    Rows written before predictions kept their ATR back-derive it from the stop
+    distance, as performance_analyzer._simulate_outcome does.
+    """
+    rows = sorted(rows, key=lambda r: (str(r["target_date"]), r["id"]))
+    entry = np.array([r["predicted_entry"] for r in rows], dtype=np.float64)
+    sl = np.array([r["predicted_sl"] for r in rows], dtype=np.float64)
+    atr = np.array([np.nan if r["atr"] is None else r["atr"] for r in rows], dtype=np.float64)
+    derived = (entry - sl) / atr_mult_used if atr_mult_used > 0 else np.zeros_like(entry)
+    dates, session = np.unique([str(r["target_date"])[:10] for r in rows], return_inverse=True)
+    pairs = _grid(live)
+    return {
+        "entry": entry,
+        "high": np.array([r["actual_high"] for r in rows], dtype=np.float64),
+        "low": np.array([r["actual_low"] for r in rows], dtype=np.float64),
+        "atr": np.where(np.isnan(atr), derived, atr),
+        "session": session.reshape(-1),
+        "dates": dates,
+        "pairs": pairs,
+        # Ties go to the pair nearest the live one, so parameters only move for a real gain
+        "distance": np.abs(pairs - np.array(live)).sum(axis=1),
+        "live": np.array(int(np.flatnonzero((pairs == np.array(live)).all(axis=1))[0])),
+    }
+
+
+def simulate_wins(arrays: dict[str, np.ndarray], rows: slice) -> np.ndarray:
+    """
+    (pair, row) booleans: whether each pair's levels hit the target on each
+    row. The vectorized form of performance_analyzer._simulate_outcome.
+    """
+    entry, atr = arrays["entry"][rows], arrays["atr"][rows]
+    high, low = arrays["high"][rows], arrays["low"][rows]
+    pairs = arrays["pairs"]
+    sl_new = entry - pairs[:, :1] * atr
+    target_new = entry + pairs[:, 1:] * (entry - sl_new)
+    entered = (high >= entry) & (atr > 0)
+    return entered & (low > sl_new) & (high >= target_new)
+
+
+def walk_forward_folds(n_sessions: int, train: int, test: int) -> list[tuple[int, int, int]]:
+    """(train_start, test_start, test_end) session indices of each fold, newest first."""
+    folds = []
+    test_end = n_sessions
+    while test_end - test - train >= 0:
+        folds.append((test_end - test - train, test_end - test, test_end))
+        test_end -= test
+    return folds
+
+
+def _row_slice(arrays: dict[str, np.ndarray], first: int, last: int) -> slice:
+    # Rows of sessions [first, last); rows are sorted by session
+    start, stop = np.searchsorted(arrays["session"], [first, last])
+    return slice(int(start), int(stop))
+
+
+def evaluate_fold(arrays: dict[str, np.ndarray], fold: tuple[int, int, int]) -> dict:
+    """Wins of every pair on the fold's training and test rows."""
+    train_start, test_start, test_end = fold
+    train = _row_slice(arrays, train_start, test_start)
+    test = _row_slice(arrays, test_start, test_end)
+    return {
+        "fold": fold,
+        "train_rows": train.stop - train.start,
+        "test_rows": test.stop - test.start,
+        "train_wins": simulate_wins(arrays, train).sum(axis=1),
+        "test_wins": simulate_wins(arrays, test).sum(axis=1),
+    }
+
+
+def _init_worker(arrays: dict[str, np.ndarray]):
+    _ARRAYS.update(arrays)
+
+
+def _evaluate_fold(fold: tuple[int, int, int]) -> dict:
+    return evaluate_fold(_ARRAYS, fold)
+
+
+def cross_validate(
+    arrays: dict[str, np.ndarray],
+    folds: list[tuple[int, int, int]],
+    workers: int = RETRAIN_WORKERS,
+    budget: float = RETRAIN_TIME_BUDGET,
+) -> list[dict]:
+    """
+    evaluate_fold for each fold (given newest first), across a process pool.
+    Stops collecting when budget seconds have passed; the newest folds are
+    always the ones kept.
+    """
+    deadline = time.monotonic() + budget
+    results: list[dict] = []
+    if workers <= 1 or len(folds) == 1:
+        for fold in folds:
+            if results and time.monotonic() > deadline:
+                break
+            results.append(evaluate_fold(arrays, fold))
+        return results
+
+    # spawn, not fork: this runs on the retrain-worker thread of a threaded server,
+    # and a forked child could inherit a lock (DB pool, stats, logging) held mid-update
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(arrays,),
+    )
+    try:
+        futures = [pool.submit(_evaluate_fold, fold) for fold in folds]
+        for fut in futures:
+            try:
+                # The newest fold is always waited for, so there is something to decide on
+                timeout = None if not results else max(deadline - time.monotonic(), 0)
+                results.append(fut.result(timeout=timeout))
+            except FutureTimeout:
+                break
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+def _pick(wins: np.ndarray, distance: np.ndarray) -> int:
+    # Most wins; among equals, the pair nearest the live one
+    return int(np.lexsort((distance, -wins))[0])
+
+
+def retrain_model() -> dict:
+    """
+    Re-optimize atr_multiplier and risk_reward_ratio by walk-forward
+    cross-validation over the resolved outcome history. Returns a summary dict
+    with the out-of-sample win rate of the best pairs; publishes only if
+    fold-by-fold picks beat the live pair out of sample.
+    """
+    rows = get_predictions_with_outcomes(limit=RETRAIN_HISTORY_ROWS)
+    params = get_all_model_params()
+    atr_mult_used = params["atr_multiplier"]
+    live = (round(atr_mult_used, 2), round(params["risk_reward_ratio"], 2))
+    arrays = build_arrays(rows, atr_mult_used, live)
+    n_sessions = len(arrays["dates"])
+    folds = walk_forward_folds(n_sessions, RETRAIN_TRAIN_SESSIONS, RETRAIN_TEST_SESSIONS)
+    if len(rows) < MIN_OUTCOMES or not folds:
+        logger.warning(
+            f"RETRAIN: Insufficient history ({len(rows)} outcomes over {n_sessions} sessions). Need at least "
+            f"{RETRAIN_TRAIN_SESSIONS + RETRAIN_TEST_SESSIONS} sessions for one walk-forward fold. Skipping."
+        )
+        return {"status": "skipped", "outcomes": len(rows), "sessions": n_sessions}
+
+    t0 = time.perf_counter()
+    results = cross_validate(arrays, folds)
+    pairs, distance, live_i = arrays["pairs"], arrays["distance"], int(arrays["live"])
+    test_rows = sum(r["test_rows"] for r in results)
+    test_wins = np.sum([r["test_wins"] for r in results], axis=0)
+    picks = [_pick(r["train_wins"], distance) for r in results]
+    picked_wr = sum(int(r["test_wins"][i]) for r, i in zip(results, picks)) / test_rows if test_rows else 0.0
+    live_wr = test_wins[live_i] / test_rows if test_rows else 0.0
+    pair_wr = test_wins / test_rows if test_rows else np.zeros(len(pairs))
+
+    # The pair to publish is fitted on the latest training window
+    latest = _row_slice(arrays, max(n_sessions - RETRAIN_TRAIN_SESSIONS, 0), n_sessions)
+    latest_wins = simulate_wins(arrays, latest).sum(axis=1)
+    best_i = _pick(latest_wins, distance)
+    best = (float(pairs[best_i, 0]), float(pairs[best_i, 1]))
+    latest_rows = latest.stop - latest.start
+
+    def pair_dict(i: int) -> dict:
+        return {"atr_multiplier": float(pairs[i, 0]), "risk_reward_ratio": float(pairs[i, 1])}
+
+    summary = {
+        "status": "unchanged",
+        "outcomes": len(rows),
+        "sessions": n_sessions,
+        "folds": len(results),
+        "folds_planned": len(folds),
+        "evaluated": len(pairs),
+        "seconds": round(time.perf_counter() - t0, 3),
+        "oos_win_rate": round(picked_wr, 4),
+        "start": {**pair_dict(live_i), "oos_win_rate": round(float(live_wr), 4)},
+        "best": {
+            **pair_dict(best_i),
+            "win_rate": round(float(latest_wins[best_i]) / latest_rows, 4) if latest_rows else 0.0,
+            "oos_win_rate": round(float(pair_wr[best_i]), 4),
+        },
+        "pairs": [
+            {**pair_dict(i), "oos_win_rate": round(float(pair_wr[i]), 4), "picked": picks.count(i)}
+            for i in np.argsort(-pair_wr, kind="stable")[:REPORT_PAIRS]
+        ],
+    }
+    if len(results) < len(folds):
+        logger.warning(f"RETRAIN: time budget ({RETRAIN_TIME_BUDGET}s) reached after {len(results)}/{len(folds)} folds")
+    if best_i != live_i and picked_wr > live_wr:
+        summary["version"] = publish_model_params(
+            {"atr_multiplier": best[0], "risk_reward_ratio": best[1]},
+            source="retrain",
+            metrics={
+                "oos_win_rate": round(picked_wr, 4),
+                "baseline_oos_win_rate": round(float(live_wr), 4),
+                "train_win_rate": summary["best"]["win_rate"],
+                "outcomes": len(rows),
+                "folds": len(results),
+            },
+        )
+        summary["status"] = "published"
+    logger.info(
+        f"RETRAIN: {summary['status']} — atr_multiplier={best[0]:.2f}, risk_reward_ratio={best[1]:.2f} "
+        f"(walk-forward win rate {picked_wr:.1%} vs live {live_wr:.1%} on {test_rows} out-of-sample outcomes, "
+        f"{len(results)} folds × {len(pairs)} pairs in {summary['seconds']:.2f}s)"
+    )
+    return summary
+
+
+def process_retrain_queue() -> int:
+    """Run queued retrain jobs until the queue is empty. Returns how many ran."""
+    processed = 0
+    while True:
+        job = claim_retrain_job()
+        if job is None:
+            return processed
+        logger.info(f"Running retrain job {job['id']} ({job['reason']})")
+        try:
+            result = retrain_model()
+        except Exception as e:
+            logger.exception(f"Retrain job {job['id']} failed")
+            finish_retrain_job(job["id"], "failed", error=str(e))
+        else:
+            finish_retrain_job(job["id"], "done", result=result)
+        processed += 1
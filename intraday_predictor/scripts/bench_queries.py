@@ -0,0 +1,163 @@
+"""
+Benchmark the hot read queries at history scale (10 years x 200 stocks).
+
+Seeds a throwaway SQLite database with one resolved prediction per stock per
+weekday plus one model_metrics row per day, then times each query before and
+after the migrations' indexes are built. The schema is fully migrated first
+(the queries read columns later migrations add); only the secondary indexes
+on the queried tables are dropped for the "before" timings.
+
+Run from intraday_predictor: python scripts/bench_queries.py [--years 10] [--stocks 200]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+# Always benchmark against a scratch SQLite file, never the configured database,
+# and without the query profiler's overhead (or its stats files)
+os.environ["POSTGRES_HOST"] = ""
+os.environ["DB_PROFILE"] = "0"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import database  # noqa: E402
+
+OUTCOMES = ["TARGET HIT", "STOP LOSS HIT", "NO ENTRY", "STAGNANT"]
+INDEXED_TABLES = ("predictions", "model_metrics")
+
+
+def _weekdays(years: int) -> list[date]:
+    end = date.today()
+    d = end - timedelta(days=365 * years)
+    days = []
+    while d < end:
+        if d.weekday() < 5:
+            days.append(d)
+        d += timedelta(days=1)
+    return days
+
+
+def _seed(days: list[date], stocks: int):
+    rnd = random.Random(42)
+    tickers = [f"STOCK{i:03d}.NS" for i in range(stocks)]
+    with database._connect() as conn:
+        cur = conn.cursor()
+        rows = []
+        for d in days:
+            for t in tickers:
+                entry = round(rnd.uniform(100, 3000), 2)
+                rows.append(
+                    (
+                        d.isoformat(), d.isoformat(), t, entry, entry * 1.04, entry * 0.98,
+                        entry * 0.99, entry * 1.02, entry * 0.97, entry * 1.01, 100000,
+                        rnd.choice(OUTCOMES),
+                    )
+                )
+        cur.executemany(
+            """INSERT INTO predictions
+               (prediction_date, target_date, stock, predicted_entry, predicted_target, predicted_sl,
+                actual_open, actual_high, actual_low, actual_close, actual_volume, outcome)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            rows,
+        )
+        # Leave the latest day unresolved, like a fresh batch of predictions
+        cur.execute("UPDATE predictions SET outcome = NULL WHERE target_date = ?", (days[-1].isoformat(),))
+        cur.executemany(
+            """INSERT INTO model_metrics
+               (eval_date, total_predictions, target_hit, sl_hit, no_entry, stagnant, win_rate, retrained)
+               VALUES (?, 5, 2, 1, 1, 1, ?, 0)""",
+            [(d.isoformat(), rnd.uniform(0.2, 0.6)) for d in days],
+        )
+
+
+def _drop_indexes() -> list[str]:
+    """Drop the explicit indexes on INDEXED_TABLES; returns their CREATE statements."""
+    with database._connect() as conn:
+        cur = conn.cursor()
+        marks = ", ".join("?" for _ in INDEXED_TABLES)
+        cur.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({marks})",
+            INDEXED_TABLES,
+        )
+        indexes = cur.fetchall()
+        for r in indexes:
+            cur.execute(f'DROP INDEX "{r["name"]}"')
+    return [r["sql"] for r in indexes]
+
+
+def _create_indexes(statements: list[str]):
+    with database._connect() as conn:
+        cur = conn.cursor()
+        for stmt in statements:
+            cur.execute(stmt)
+        cur.execute("ANALYZE")
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def _stock_history(stock: str):
+    with database._connect() as conn:
+        return conn.cursor().execute(
+            "SELECT * FROM predictions WHERE stock = ? ORDER BY target_date DESC LIMIT 250",
+            (stock,),
+        ).fetchall()
+
+
+def _unresolved(day: date):
+    with database._connect() as conn:
+        return conn.cursor().execute(
+            "SELECT id FROM predictions WHERE target_date = ? AND outcome IS NULL",
+            (day.isoformat(),),
+        ).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--stocks", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = Path(tmp) / "bench.db"
+        database.init_db()
+        indexes = _drop_indexes()
+        days = _weekdays(args.years)
+        t0 = time.perf_counter()
+        _seed(days, args.stocks)
+        print(f"Seeded {len(days) * args.stocks:,} predictions over {len(days):,} days "
+              f"in {time.perf_counter() - t0:.1f}s")
+
+        queries = {
+            "get_predictions_with_outcomes(60)": lambda: database.get_predictions_with_outcomes(60),
+            "get_model_metrics_history(20)": lambda: database.get_model_metrics_history(days[-1], 20),
+            "get_predictions_for_date(last)": lambda: database.get_predictions_for_date(days[-1]),
+            "unresolved predictions (last day)": lambda: _unresolved(days[-1]),
+            "per-stock history (250 rows)": lambda: _stock_history(f"STOCK{args.stocks // 2:03d}.NS"),
+        }
+
+        before = {name: _time(fn, args.repeat) for name, fn in queries.items()}
+        t0 = time.perf_counter()
+        _create_indexes(indexes)
+        print(f"Built {len(indexes)} indexes in {time.perf_counter() - t0:.1f}s\n")
+        after = {name: _time(fn, args.repeat) for name, fn in queries.items()}
+
+        print(f"{'query':<38}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+        for name in queries:
+            b, a = before[name], after[name]
+            print(f"{name:<38}{b:>12.2f}{a:>12.2f}{b / a if a else float('inf'):>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Load test for the API's read endpoints.
+
+Runs N concurrent clients against each endpoint for a fixed duration and
+prints p50/p90/p99 latency, throughput and error counts. Uses only the
+standard library; start the server first (python app.py or gunicorn).
+
+Usage (from intraday_predictor):
+    python scripts/load_test.py --url http://localhost:5000 --concurrency 16 --duration 20
+    python scripts/load_test.py --endpoints /performance /params?x=1
+"""
+import argparse
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_ENDPOINTS = ["/health", "/performance", "/performance?stock=all", "/params", "/retrain", "/predictions"]
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    k = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def _client(url: str, deadline: float, timeout: float) -> tuple[list[float], int]:
+    latencies: list[float] = []
+    errors = 0
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as resp:
+                resp.read()
+        except (urllib.error.URLError, OSError):
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - t0)
+    return latencies, errors
+
+
+def run(base_url: str, endpoint: str, concurrency: int, duration: float, timeout: float) -> dict:
+    url = base_url.rstrip("/") + endpoint
+    # One warm-up request so first-hit costs in the worker don't skew the numbers
+    try:
+        urllib.request.urlopen(url, timeout=timeout).read()
+    except (urllib.error.URLError, OSError):
+        pass
+    start = time.perf_counter()
+    deadline = start + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: _client(url, deadline, timeout), range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(x for lat, _ in results for x in lat)
+    return {
+        "endpoint": endpoint,
+        "requests": len(latencies),
+        "errors": sum(e for _, e in results),
+        "rps": len(latencies) / elapsed,
+        "p50": _percentile(latencies, 50) * 1000,
+        "p90": _percentile(latencies, 90) * 1000,
+        "p99": _percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API read endpoints.")
+    parser.add_argument("--url", default="http://localhost:5000", help="server base URL")
+    parser.add_argument("--endpoints", nargs="+", default=DEFAULT_ENDPOINTS)
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients per endpoint")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per endpoint")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout (s)")
+    args = parser.parse_args()
+
+    print(f"{args.concurrency} clients x {args.duration:.0f}s per endpoint against {args.url}\n")
+    print(f"{'endpoint':<28} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9}")
+    for endpoint in args.endpoints:
+        r = run(args.url, endpoint, args.concurrency, args.duration, args.timeout)
+        print(
+            f"{r['endpoint']:<28} {r['requests']:>9} {r['errors']:>7} {r['rps']:>9.1f} "
+            f"{r['p50']:>9.2f} {r['p90']:>9.2f} {r['p99']:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Parallel strategy/parameter sweep.
+
+Backtests every point of a parameter space (score weights, score_threshold,
+prediction_count, atr_multiplier, risk_reward_ratio) over one cached daily
+panel. Indicator signals are computed once up front as dense arrays, so each
+configuration is a handful of numpy operations; configurations are evaluated
+in batches across a process pool.
+
+Poor configurations are pruned by successive halving: every configuration is
+first scored on the earliest slice of sessions, only the best 1/eta advance to
+a longer slice, and so on until the survivors have seen the full range.
+
+Usage (from intraday_predictor):
+    python sweep.py --from 2025-01-01 --to 2025-12-31 --space space.json --workers 8
+
+space.json maps parameter names to lists of values; score weights use the
+"weights.<rule>" form (see prediction_engine.SCORE_WEIGHTS), e.g.
+    {"score_threshold": [3, 4, 5], "atr_multiplier": [1.2, 1.5, 2.0],
+     "weights.volume_surge": [1, 2, 3]}
+Parameters not listed keep their current model_params / SCORE_WEIGHTS value.
+"""
+import argparse
+import csv
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from backfill import WARMUP_SESSIONS
+from config import DATA_DIR, NIFTY_200_TICKERS
+from data_fetcher import load_daily_panel
+from database import get_all_model_params
+from prediction_engine import MIN_HISTORY, SCORE_WEIGHTS, _compute_indicators, _score_signals
+from trading_calendar import sessions_back
+
+logger = logging.getLogger(__name__)
+
+SWEEP_DIR = DATA_DIR / "sweeps"
+
+# Outcome codes used in the vectorized simulation
+NO_ENTRY, SL_HIT, TARGET_HIT, STAGNANT = 0, 1, 2, 3
+
+_RULES = list(SCORE_WEIGHTS)
+
+# Arrays shared by every worker (set once per process by _init_worker)
+_ARRAYS: dict[str, np.ndarray] = {}
+
+
+def build_arrays(panel: dict[str, pd.DataFrame]) -> dict[str, np.ndarray]:
+    """
+    Dense (day, ticker) arrays for the backtest. Row i holds the signals known
+    at the close of session i and the next session's high/low/close, i.e. the
+    outcome of a prediction made on day i.
+    """
+    tickers = list(panel)
+    index = sorted(set().union(*(df.index for df in panel.values())))
+    signals, valid, close, high_20, atr, nxt_high, nxt_low, nxt_close = ([] for _ in range(8))
+    for t in tickers:
+        df = panel[t].reindex(index)
+        ind = _compute_indicators(df)
+        sig = _score_signals(ind)
+        signals.append(sig[_RULES].to_numpy(dtype=bool))
+        ok = ind["rsi"].notna() & ind["atr"].notna() & (ind["atr"] != 0) & df["Close"].notna()
+        ok &= df["Close"].notna().cumsum() >= MIN_HISTORY
+        valid.append(ok.to_numpy())
+        close.append(ind["close"].to_numpy())
+        high_20.append(ind["high_20"].to_numpy())
+        atr.append(ind["atr"].to_numpy())
+        nxt_high.append(df["High"].shift(-1).to_numpy())
+        nxt_low.append(df["Low"].shift(-1).to_numpy())
+        nxt_close.append(df["Close"].shift(-1).to_numpy())
+    has_next = ~np.isnan(np.stack(nxt_high, axis=1))
+    return {
+        "signals": np.stack(signals, axis=2).transpose(1, 0, 2).astype(np.float64),  # (rule, day, ticker)
+        "valid": np.stack(valid, axis=1) & has_next,
+        "close": np.stack(close, axis=1),
+        "high_20": np.stack(high_20, axis=1),
+        "atr": np.stack(atr, axis=1),
+        "next_high": np.stack(nxt_high, axis=1),
+        "next_low": np.stack(nxt_low, axis=1),
+        "next_close": np.stack(nxt_close, axis=1),
+        "dates": np.array(index, dtype="datetime64[D]"),
+    }
+
+
+def evaluate(point: dict, arrays: dict[str, np.ndarray], day_slice: slice) -> dict:
+    """Backtest one configuration over arrays[day_slice]; returns metrics."""
+    weights = np.array([point["weights"][r] for r in _RULES])
+    sig = arrays["signals"][:, day_slice]
+    valid = arrays["valid"][day_slice]
+    scores = np.tensordot(weights, sig, axes=1)
+    scores = np.where(valid & (scores > point["score_threshold"]), scores, -np.inf)
+
+    k = int(point["prediction_count"])
+    order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    picked = np.isfinite(np.take_along_axis(scores, order, axis=1))
+
+    def take(name: str) -> np.ndarray:
+        return np.take_along_axis(arrays[name][day_slice], order, axis=1)[picked]
+
+    close, high_20, atr = take("close"), take("high_20"), take("atr")
+    high, low, nxt_close = take("next_high"), take("next_low"), take("next_close")
+
+    entry = np.round(np.maximum(high_20, close + atr * 0.3), 2)
+    sl = np.round(entry - point["atr_multiplier"] * atr, 2)
+    target = np.round(entry + point["risk_reward_ratio"] * (entry - sl), 2)
+
+    outcome = np.full(entry.shape, STAGNANT)
+    outcome[high >= target] = TARGET_HIT
+    outcome[low <= sl] = SL_HIT
+    outcome[high < entry] = NO_ENTRY
+
+    risk = entry - sl
+    r_multiple = np.select(
+        [outcome == TARGET_HIT, outcome == SL_HIT, outcome == STAGNANT],
+        [point["risk_reward_ratio"], -1.0, (nxt_close - entry) / np.where(risk > 0, risk, np.nan)],
+        default=0.0,
+    )
+    trades = int(entry.size)
+    wins = int((outcome == TARGET_HIT).sum())
+    return {
+        "trades": trades,
+        "wins": wins,
+        "sl_hits": int((outcome == SL_HIT).sum()),
+        "no_entry": int((outcome == NO_ENTRY).sum()),
+        "win_rate": wins / trades if trades else 0.0,
+        "expectancy_r": float(np.nanmean(r_multiple)) if trades else 0.0,
+    }
+
+
+def _init_worker(arrays: dict[str, np.ndarray]):
+    _ARRAYS.update(arrays)
+
+
+def _evaluate_batch(batch: list[dict], day_slice: slice) -> list[dict]:
+    return [evaluate(point, _ARRAYS, day_slice) for point in batch]
+
+
+def expand_space(space: dict[str, list], base: dict, samples: int | None = None, seed: int = 0) -> list[dict]:
+    """Grid over `space` (or `samples` random points from it) on top of `base`."""
+    names = list(space)
+    grid = itertools.product(*(space[n] for n in names))
+    if samples:
+        total = int(np.prod([len(space[n]) for n in names])) if names else 1
+        if samples < total:
+            rnd = random.Random(seed)
+            grid = (tuple(rnd.choice(space[n]) for n in names) for _ in range(samples))
+    points = []
+    seen = set()
+    for values in grid:
+        if values in seen:
+            continue
+        seen.add(values)
+        point = {k: v for k, v in base.items() if k != "weights"}
+        point["weights"] = dict(base["weights"])
+        for name, value in zip(names, values):
+            if name.startswith("weights."):
+                rule = name.split(".", 1)[1]
+                if rule not in point["weights"]:
+                    raise ValueError(f"Unknown score rule '{rule}' (known: {', '.join(_RULES)})")
+                point["weights"][rule] = float(value)
+            else:
+                point[name] = value
+        points.append(point)
+    return points
+
+
+def run_sweep(
+    arrays: dict[str, np.ndarray],
+    points: list[dict],
+    workers: int | None = None,
+    eta: int = 3,
+    rungs: int = 3,
+    min_trades: int = 20,
+    metric: str = "win_rate",
+    batch_size: int = 64,
+) -> list[dict]:
+    """
+    Successive-halving sweep. Returns every point with its last-rung metrics,
+    best first; points pruned early carry the rung they stopped at.
+    """
+    n_days = arrays["valid"].shape[0]
+    alive = list(range(len(points)))
+    results: dict[int, dict] = {}
+
+    # spawn, not fork: a forked child could inherit a lock held by another thread
+    spawn = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=spawn, initializer=_init_worker, initargs=(arrays,)
+    ) as pool:
+        for rung in range(rungs):
+            # Rung r uses the earliest eta**(r - rungs + 1) share of sessions (full range last)
+            span = max(1, int(round(n_days * eta ** (rung - rungs + 1))))
+            day_slice = slice(0, span)
+            batches = [alive[i:i + batch_size] for i in range(0, len(alive), batch_size)]
+            futures = [pool.submit(_evaluate_batch, [points[i] for i in b], day_slice) for b in batches]
+            for b, fut in zip(batches, futures):
+                for i, metrics in zip(b, fut.result()):
+                    results[i] = {**metrics, "rung": rung, "sessions": span}
+
+            last = rung == rungs - 1
+            ranked = sorted(
+                alive,
+                key=lambda i: (results[i]["trades"] >= min_trades, results[i][metric]),
+                reverse=True,
+            )
+            logger.info(
+                f"Rung {rung}: {len(alive)} configs on {span} sessions — "
+                f"best {metric}={results[ranked[0]][metric]:.4f}"
+            )
+            if last:
+                break
+            keep = max(1, len(ranked) // eta)
+            alive = [i for i in ranked[:keep] if results[i]["trades"] >= min_trades] or ranked[:1]
+
+    rows = [{**_flatten(points[i]), **results[i]} for i in range(len(points))]
+    rows.sort(key=lambda r: (r["rung"], r["trades"] >= min_trades, r[metric]), reverse=True)
+    for rank, r in enumerate(rows, 1):
+        r["rank"] = rank
+    return rows
+
+
+def _flatten(point: dict) -> dict:
+    flat = {k: v for k, v in point.items() if k != "weights"}
+    flat.update({f"weights.{k}": v for k, v in point["weights"].items()})
+    return flat
+
+
+def write_results(rows: list[dict]) -> str:
+    SWEEP_DIR.mkdir(parents=True, exist_ok=True)
+    path = SWEEP_DIR / f"sweep_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    fields = ["rank"] + [k for k in rows[0] if k != "rank"]
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, required=True)
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, required=True)
+    parser.add_argument("--space", required=True, help="JSON file: parameter -> list of values")
+    parser.add_argument("--samples", type=int, help="random sample of N points instead of the full grid")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--eta", type=int, default=3, help="keep the best 1/eta configs per rung")
+    parser.add_argument("--rungs", type=int, default=3)
+    parser.add_argument("--min-trades", type=int, default=20)
+    parser.add_argument("--metric", choices=["win_rate", "expectancy_r"], default="win_rate")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+    with open(args.space) as f:
+        space = json.load(f)
+    params = get_all_model_params()
+    base = {
+        "score_threshold": params["score_threshold"],
+        "prediction_count": int(params["prediction_count"]),
+        "atr_multiplier": params["atr_multiplier"],
+        "risk_reward_ratio": params["risk_reward_ratio"],
+        "weights": dict(SCORE_WEIGHTS),
+    }
+    points = expand_space(space, base, args.samples)
+
+    t0 = time.perf_counter()
+    panel = load_daily_panel(NIFTY_200_TICKERS, sessions_back(args.start, WARMUP_SESSIONS), args.end)
+    arrays = build_arrays(panel)
+    # Drop the warm-up rows: only sessions inside [start, end] are traded
+    first = int(np.searchsorted(arrays["dates"], np.datetime64(args.start, "D")))
+    arrays = {k: (v[:, first:] if k == "signals" else v[first:]) for k, v in arrays.items()}
+    logger.info(
+        f"Panel ready: {arrays['valid'].shape[1]} tickers × {arrays['valid'].shape[0]} sessions "
+        f"in {time.perf_counter() - t0:.1f}s; sweeping {len(points)} configs"
+    )
+
+    t0 = time.perf_counter()
+    rows = run_sweep(arrays, points, args.workers, args.eta, args.rungs, args.min_trades, args.metric)
+    path = write_results(rows)
+    logger.info(f"Sweep finished in {time.perf_counter() - t0:.1f}s — results: {path}")
+    for r in rows[:10]:
+        print({k: r[k] for k in ("rank", "win_rate", "expectancy_r", "trades")} | {k: v for k, v in r.items() if k in space})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Shared test setup. Every test runs against a fresh SQLite database and its
+own data directories under tmp_path; nothing reaches PostgreSQL, Yahoo or
+SMTP (network calls are monkeypatched in the tests that would make them).
+"""
+import os
+import sys
+from datetime import date
+from pathlib import Path
+
+# Before config is imported: SQLite, no query-stats files, no email
+os.environ["POSTGRES_HOST"] = ""
+os.environ["DB_PROFILE"] = "0"
+os.environ["EMAIL_SENDER"] = ""
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import database
+import diversify
+import intraday_store
+from trading_calendar import sessions_between
+
+
+@pytest.fixture(autouse=True)
+def isolated_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "predictions.db")
+    monkeypatch.setattr(intraday_store, "INTRADAY_STORE_DIR", tmp_path / "intraday")
+    monkeypatch.setattr(diversify, "STATE_PATH", tmp_path / "correlation.npz")
+    monkeypatch.setattr(diversify, "_tracker", None)
+    database.init_db()
+    yield tmp_path
+
+
+def fake_panel(tickers: list[str], start: date, end: date, seed: int = 1) -> dict[str, pd.DataFrame]:
+    """Random-walk daily OHLCV for every session in [start, end], one frame per ticker."""
+    days = pd.to_datetime([str(d) for d in sessions_between(start, end)])
+    rng = np.random.default_rng(seed)
+    out = {}
+    for t in tickers:
+        n = len(days)
+        close = 100 + np.cumsum(rng.normal(0.1, 1, n))
+        out[t] = pd.DataFrame(
+            {
+                "Open": close + rng.normal(0, 0.5, n),
+                "High": close + rng.uniform(0.5, 3, n),
+                "Low": close - rng.uniform(0.5, 3, n),
+                "Close": close,
+                "Volume": rng.integers(1000, 5000, n).astype(float),
+            },
+            index=days,
+        )
+    return out
+
+
+def prediction(target: str, stock: str, **extra) -> dict:
+    """A minimal predictions row for target_date target."""
+    row = {
+        "prediction_date": target,
+        "target_date": target,
+        "stock": stock,
+        "predicted_entry": 100.0,
+        "predicted_target": 104.0,
+        "predicted_sl": 98.0,
+    }
+    row.update(extra)
+    return row
@@ -0,0 +1,59 @@
+from datetime import date
+
+import pytest
+
+import backfill
+import database
+from conftest import fake_panel, prediction
+from performance_analyzer import _classify_outcome
+from trading_calendar import prev_session, sessions_between
+
+TICKERS = ["A.NS", "B.NS", "C.NS", "D.NS"]
+START, END = date(2026, 1, 5), date(2026, 1, 30)
+
+
+@pytest.fixture
+def panel(monkeypatch):
+    panel = fake_panel(TICKERS, date(2025, 6, 1), END)
+    monkeypatch.setattr(backfill, "fetch_daily_panel", lambda tickers, start, end: {t: panel[t].copy() for t in tickers})
+    # Every scored ticker qualifies, so each session gets picks
+    params = {**database.get_all_model_params(), "score_threshold": -100.0}
+    monkeypatch.setattr(backfill, "get_all_model_params", lambda: params)
+    return panel
+
+
+def test_backfill_predicts_and_resolves_every_session(panel):
+    summary = backfill.run_backfill(START, END, TICKERS)
+    sessions = sessions_between(START, END)
+    assert summary["sessions"] == len(sessions)
+    assert summary["predictions"] == summary["resolved"] > 0
+
+    rows = database.get_predictions_between(START, END)
+    assert {r["target_date"] for r in rows} == {d.isoformat() for d in sessions}
+    for r in rows:
+        assert r["prediction_date"] == prev_session(date.fromisoformat(r["target_date"])).isoformat()
+        bar = panel[r["stock"]].loc[r["target_date"]]
+        actuals = {"high": bar["High"], "low": bar["Low"]}
+        assert r["outcome"] == _classify_outcome(r["predicted_entry"], r["predicted_target"], r["predicted_sl"], actuals)
+    # The picks were scored from features stored for their prediction date
+    assert sorted(database.get_features(prev_session(sessions[0]))) == TICKERS
+    assert len(database.get_model_metrics_history(END, 100)) == len(sessions) - 1  # END itself is excluded
+
+
+def test_rerun_replaces_the_default_book_and_keeps_named_profiles(panel):
+    database.insert_predictions([prediction("2026-01-15", "A.NS", profile="wide")])
+    backfill.run_backfill(START, END, TICKERS)
+    first = database.get_predictions_between(START, END, profile=database.DEFAULT_PROFILE)
+
+    backfill.run_backfill(START, END, TICKERS)
+    again = database.get_predictions_between(START, END, profile=database.DEFAULT_PROFILE)
+    assert [(r["target_date"], r["stock"], r["outcome"]) for r in again] == [
+        (r["target_date"], r["stock"], r["outcome"]) for r in first
+    ]
+    assert len(database.get_predictions_between(START, END, profile="wide")) == 1
+
+    incremental = database.get_performance_rollups()
+    database.rebuild_performance_rollups()
+    assert [(r["scope"], r["window_days"], r["total"]) for r in incremental] == [
+        (r["scope"], r["window_days"], r["total"]) for r in database.get_performance_rollups()
+    ]
@@ -0,0 +1,92 @@
+from datetime import date
+
+import pytest
+
+import daily_pipeline
+from database import get_job_stages, insert_features
+
+RUN_DATE = date(2026, 1, 15)
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """daily_pipeline with every network stage stubbed; calls records what ran."""
+    calls: dict[str, list] = {"capture": [], "features": [], "generate": [], "analyze": [], "emails": []}
+    state = {"closed": True, "crash": False}
+
+    monkeypatch.setattr(daily_pipeline, "session_closed", lambda d: state["closed"])
+    monkeypatch.setattr(daily_pipeline, "capture_session", lambda d, tickers: calls["capture"].append(d) or 0)
+    monkeypatch.setattr(daily_pipeline, "apply_retention", lambda: None)
+    monkeypatch.setattr(daily_pipeline, "cached_profile_predictions", lambda *a, **k: None)
+
+    def features(session_date, provisional=False, **kwargs):
+        calls["features"].append(session_date)
+        rows = {"A.NS": {"session_date": session_date.isoformat(), "stock": "A.NS", "score": 5.0}}
+        if not provisional:
+            insert_features(list(rows.values()))
+        return rows
+
+    def generate(target_date, prediction_date, features=None, **kwargs):
+        calls["generate"].append(sorted(features or ()))
+        if state["crash"]:
+            raise RuntimeError("crashed after scoring")
+        return {"default": [{"stock": "A.NS", "target_date": target_date.isoformat(), "profile": "default"}]}
+
+    def analyze(d, progress=None, force=False):
+        calls["analyze"].append(d)
+        return []
+
+    monkeypatch.setattr(daily_pipeline, "compute_daily_features", features)
+    monkeypatch.setattr(daily_pipeline, "generate_profile_predictions", generate)
+    monkeypatch.setattr(daily_pipeline, "analyze_predictions", analyze)
+    monkeypatch.setattr(daily_pipeline, "send_analysis_email", lambda *a, **k: calls["emails"].append("analysis"))
+    monkeypatch.setattr(daily_pipeline, "send_prediction_email", lambda *a, **k: calls["emails"].append("prediction"))
+    return calls, state
+
+
+def test_intraday_capture_waits_for_the_close(pipeline):
+    calls, state = pipeline
+    state["closed"] = False
+    daily_pipeline.run_daily_pipeline(RUN_DATE)
+    assert calls["capture"] == []
+    assert daily_pipeline.INTRADAY_CAPTURED not in get_job_stages(RUN_DATE)
+
+    state["closed"] = True
+    daily_pipeline.run_daily_pipeline(RUN_DATE)
+    assert calls["capture"] == [RUN_DATE]
+    assert daily_pipeline.INTRADAY_CAPTURED in get_job_stages(RUN_DATE)
+
+
+def test_run_before_the_close_keeps_nothing(pipeline):
+    calls, state = pipeline
+    state["closed"] = False
+    run = daily_pipeline.run_daily_pipeline(RUN_DATE)
+    assert run["provisional"]
+    assert run["predictions"]  # the provisional picks are still returned
+    assert get_job_stages(RUN_DATE) == {}
+    assert calls["emails"] == []
+
+    # The post-close run redoes the scan and the picks, then checkpoints them
+    state["closed"] = True
+    run = daily_pipeline.run_daily_pipeline(RUN_DATE)
+    assert not run["provisional"]
+    assert calls["features"] == [RUN_DATE, RUN_DATE]
+    assert calls["generate"] == [["A.NS"], ["A.NS"]]
+    stages = get_job_stages(RUN_DATE)
+    assert {daily_pipeline.SCORED, daily_pipeline.ANALYSIS_WRITTEN, daily_pipeline.PREDICTIONS_WRITTEN} <= set(stages)
+    assert calls["emails"] == ["analysis", "prediction"]
+
+
+def test_resume_after_scoring_reads_the_stored_features(pipeline):
+    calls, state = pipeline
+    state["crash"] = True
+    with pytest.raises(RuntimeError):
+        daily_pipeline.run_daily_pipeline(RUN_DATE)
+    assert daily_pipeline.SCORED in get_job_stages(RUN_DATE)
+
+    state["crash"] = False
+    run = daily_pipeline.run_daily_pipeline(RUN_DATE)
+    assert daily_pipeline.SCORED in run["resumed"]
+    assert calls["features"] == [RUN_DATE]  # no second scan
+    assert calls["generate"] == [["A.NS"], ["A.NS"]]
+    assert daily_pipeline.PREDICTIONS_WRITTEN in get_job_stages(RUN_DATE)
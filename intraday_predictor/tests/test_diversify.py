@@ -0,0 +1,104 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import diversify
+from config import CORRELATION_WINDOW
+from database import insert_features
+from diversify import RollingCorrelation, select_diversified
+from trading_calendar import sessions_between
+
+TICKERS = ["A.NS", "B.NS", "C.NS", "D.NS", "E.NS"]
+
+
+def _closes(n: int, seed: int = 3) -> pd.DataFrame:
+    """Random-walk closes; B tracks A closely and D mirrors C."""
+    rng = np.random.default_rng(seed)
+    days = sessions_between(date(2025, 1, 1), date(2026, 6, 30))[:n]
+    base = rng.normal(0, 0.01, (n, 3))
+    rets = np.column_stack([
+        base[:, 0],
+        base[:, 0] + rng.normal(0, 0.001, n),
+        base[:, 1],
+        -base[:, 1] + rng.normal(0, 0.001, n),
+        base[:, 2],
+    ])
+    return pd.DataFrame(100 * np.cumprod(1 + rets, axis=0), index=days, columns=TICKERS)
+
+
+def test_rank_one_updates_match_a_rebuild():
+    closes = _closes(200)
+    closes.iloc[120, 2] = np.nan  # a missing close counts as a flat day
+    tracker = RollingCorrelation.from_closes(closes.iloc[:40], window=30)
+    tracker.extend(closes)  # 160 updates: the window slides and resyncs several times
+    rebuilt = RollingCorrelation.from_closes(closes, window=30)
+
+    assert tracker.dates == rebuilt.dates
+    np.testing.assert_allclose(tracker.matrix(), rebuilt.matrix(), atol=1e-10)
+    clean = closes.iloc[-40:]
+    expected = clean.pct_change().iloc[1:].tail(30).corr().to_numpy()
+    np.testing.assert_allclose(rebuilt.matrix(), expected, atol=1e-10)
+
+    # Sessions already applied are ignored
+    tracker.extend(closes)
+    assert len(tracker) == 30
+
+
+def test_submatrix_and_rows_agree_with_the_full_matrix():
+    tracker = RollingCorrelation.from_closes(_closes(80), window=60)
+    full = tracker.matrix()
+    names = ["D.NS", "A.NS", "X.NS"]
+    sub = tracker.submatrix(names)
+    np.testing.assert_allclose(sub[:2, :2], full[np.ix_([3, 0], [3, 0])], atol=1e-12)
+    assert list(sub[2]) == [0.0, 0.0, 1.0]  # unknown names are uncorrelated
+
+    idx, known = tracker._lookup(names)
+    np.testing.assert_allclose(tracker._row(0, idx, known), [full[0, 3], full[0, 0], 0.0], atol=1e-12)
+
+
+def test_state_round_trips(tmp_path):
+    tracker = RollingCorrelation.from_closes(_closes(50), window=30)
+    tracker.save(tmp_path / "c.npz")
+    loaded = RollingCorrelation.load(tmp_path / "c.npz")
+    assert (loaded.tickers, loaded.dates, loaded.as_of) == (tracker.tickers, tracker.dates, tracker.as_of)
+    np.testing.assert_allclose(loaded.matrix(), tracker.matrix())
+    assert RollingCorrelation.load(tmp_path / "missing.npz") is None
+
+
+def test_select_diversified_skips_correlated_names():
+    tracker = RollingCorrelation.from_closes(_closes(80), window=60)
+    # B moves with A; D moves against C, which is not a concentration
+    assert select_diversified(TICKERS, 3, tracker) == ["A.NS", "C.NS", "D.NS"]
+    assert select_diversified(["B.NS", "A.NS", "E.NS"], 2, tracker) == ["B.NS", "E.NS"]
+    # Fallbacks: no tracker, filter off, fewer candidates than k, k of 0
+    assert select_diversified(TICKERS, 3, None) == TICKERS[:3]
+    assert select_diversified(TICKERS, 3, tracker, max_corr=1.0) == TICKERS[:3]
+    assert select_diversified(TICKERS[:2], 3, tracker) == TICKERS[:2]
+    assert select_diversified(TICKERS, 0, tracker) == []
+    # Too little history to trust the correlations
+    assert select_diversified(TICKERS, 3, RollingCorrelation.from_closes(_closes(5))) == TICKERS[:3]
+
+
+def test_daily_tracker_applies_only_new_sessions(monkeypatch):
+    closes = _closes(CORRELATION_WINDOW + 20)
+    insert_features([
+        {"session_date": d.isoformat(), "stock": t, "close": float(closes.at[d, t])}
+        for d in closes.index for t in TICKERS
+    ])
+    first, last = closes.index[CORRELATION_WINDOW + 5], closes.index[-1]
+    diversify.correlation_tracker(first, TICKERS)
+
+    rebuilt = []
+    original = RollingCorrelation.from_closes
+    monkeypatch.setattr(RollingCorrelation, "from_closes", classmethod(lambda cls, c, **k: rebuilt.append(c) or original(c, **k)))
+    tracker = diversify.correlation_tracker(last, TICKERS)
+    assert rebuilt == []  # advanced by rank-one updates
+    assert tracker.as_of == last
+
+    monkeypatch.setattr(diversify, "_tracker", None)
+    diversify.STATE_PATH.unlink()
+    fresh = diversify.correlation_tracker(last, TICKERS)
+    assert len(rebuilt) == 1
+    assert fresh.dates == tracker.dates
+    np.testing.assert_allclose(tracker.matrix(), fresh.matrix(), atol=1e-10)
@@ -0,0 +1,107 @@
+import io
+import json
+from datetime import date
+
+import pytest
+
+import app
+from conftest import prediction
+from database import insert_features, insert_predictions
+from trading_calendar import sessions_between
+
+SESSIONS = sessions_between(date(2026, 1, 1), date(2026, 1, 31))
+
+
+@pytest.fixture
+def client():
+    return app.create_app(preload=False).test_client()
+
+
+@pytest.fixture
+def history():
+    # Several rows per date, so pages split inside a date as well as between them
+    insert_predictions([prediction(d.isoformat(), f"S{i}.NS") for d in SESSIONS for i in range(3)])
+    insert_features([{"session_date": d.isoformat(), "stock": f"S{i}.NS", "close": 100.0 + i} for d in SESSIONS for i in range(3)])
+
+
+def _pages(client, path: str, limit: int, query: str = "") -> list[list[dict]]:
+    pages, cursor = [], None
+    while True:
+        url = f"{path}?limit={limit}{query}" + (f"&cursor={cursor}" if cursor else "")
+        body = client.get(url).get_json()
+        pages.append(body["rows"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("path, keys", [("/predictions", ("target_date", "id")), ("/features", ("session_date", "stock"))])
+def test_keyset_pages_cover_every_row_once_in_order(client, history, path, keys):
+    everything = client.get(f"{path}?limit=5000").get_json()["rows"]
+    assert len(everything) == 3 * len(SESSIONS)
+    assert [tuple(r[k] for k in keys) for r in everything] == sorted(tuple(r[k] for k in keys) for r in everything)
+
+    pages = _pages(client, path, 4)
+    assert all(len(p) == 4 for p in pages[:-1])
+    assert [r for p in pages for r in p] == everything
+
+
+def test_filters_apply_to_every_page(client, history):
+    pages = _pages(client, "/predictions", 5, "&stock=S1.NS")
+    rows = [r for p in pages for r in p]
+    assert len(rows) == len(SESSIONS)
+    assert {r["stock"] for r in rows} == {"S1.NS"}
+
+
+@pytest.mark.parametrize("limit", ["0", "-3", "ten"])
+def test_bad_limit_is_rejected(client, history, limit):
+    assert client.get(f"/predictions?limit={limit}").status_code == 400
+
+
+def test_bad_cursor_is_rejected(client, history):
+    assert client.get("/predictions?cursor=not-a-cursor").status_code == 400
+
+
+def _json_rows(client, path: str) -> list[dict]:
+    return client.get(f"{path}{'&' if '?' in path else '?'}limit=5000").get_json()["rows"]
+
+
+@pytest.mark.parametrize("path", ["/predictions", "/features", "/predictions?stock=S2.NS"])
+def test_arrow_stream_matches_the_json_rows(client, history, path):
+    pa = pytest.importorskip("pyarrow")
+    resp = client.get(path, headers={"Accept": "application/vnd.apache.arrow.stream"})
+    assert resp.mimetype == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(resp.data).read_all()
+
+    rows = _json_rows(client, path)
+    date_col = "session_date" if path.startswith("/features") else "target_date"
+    assert table.schema.field(date_col).type == pa.date32()
+    assert table.num_rows == len(rows)
+    got = table.to_pylist()
+    assert [r[date_col].isoformat() for r in got] == [r[date_col] for r in rows]
+    assert [r["stock"] for r in got] == [r["stock"] for r in rows]
+
+
+def test_msgpack_stream_matches_the_json_rows(client, history):
+    msgpack = pytest.importorskip("msgpack")
+    resp = client.get("/predictions?format=msgpack&from=2026-01-10")
+    assert resp.mimetype == "application/x-msgpack"
+    columns: dict[str, list] = {}
+    for chunk in msgpack.Unpacker(io.BytesIO(resp.data), raw=False):
+        for k, values in chunk.items():
+            columns.setdefault(k, []).extend(values)
+
+    rows = _json_rows(client, "/predictions?from=2026-01-10")
+    assert rows and columns["id"] == [r["id"] for r in rows]
+    assert columns["target_date"] == [r["target_date"] for r in rows]
+
+
+def test_streams_honour_limit_and_cursor(client, history):
+    first = client.get("/predictions?limit=4").get_json()
+    ndjson = client.get(f"/predictions?format=ndjson&limit=4&cursor={first['next_cursor']}").data.decode()
+    streamed = [json.loads(line) for line in ndjson.splitlines()]
+    assert [r["id"] for r in streamed] == [r["id"] for r in _json_rows(client, "/predictions")[4:8]]
+
+
+def test_unknown_format_is_rejected(client, history):
+    assert client.get("/predictions?format=xml").status_code == 400
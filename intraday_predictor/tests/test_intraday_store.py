@@ -0,0 +1,38 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import intraday_store
+
+SESSION = date(2026, 1, 15)
+
+
+def _bars(volume=(10.0, 20.0)) -> pd.DataFrame:
+    index = pd.date_range("2026-01-15 09:15", periods=len(volume), freq="15min", tz="Asia/Kolkata")
+    return pd.DataFrame(
+        {"Open": 100.0, "High": 101.0, "Low": 99.0, "Close": 100.5, "Volume": list(volume)}, index=index
+    )
+
+
+def test_write_and_read_round_trip():
+    intraday_store.write_bars(SESSION, "A.NS", _bars())
+    out = intraday_store.read_bars(SESSION, "A.NS")
+    assert list(out["Volume"]) == [10, 20]
+    assert out.index[0] == pd.Timestamp("2026-01-15 09:15", tz="Asia/Kolkata")
+
+
+def test_missing_volume_is_stored_as_zero():
+    arrays = intraday_store._frame_to_arrays(_bars(volume=(np.nan, 5.0)))
+    assert list(arrays["volume"]) == [0, 5]
+
+
+def test_capture_skips_a_session_still_trading(monkeypatch):
+    monkeypatch.setattr(intraday_store, "session_closed", lambda d: False)
+
+    def download(*args, **kwargs):
+        raise AssertionError("must not download before the close")
+
+    monkeypatch.setattr(intraday_store.yf, "download", download)
+    assert intraday_store.capture_session(SESSION, ["A.NS"]) == 0
+    assert intraday_store.stored_tickers(SESSION) == set()
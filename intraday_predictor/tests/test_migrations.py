@@ -0,0 +1,59 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+import database
+from conftest import prediction
+
+
+@pytest.fixture
+def baseline_db(tmp_path, monkeypatch):
+    """A database with only the original tables and one resolved prediction, as before any migration."""
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "baseline.db")
+    database._init_sqlite()
+    conn = sqlite3.connect(str(database.DB_PATH))
+    conn.execute(
+        """INSERT INTO predictions
+           (prediction_date, target_date, stock, predicted_entry, predicted_target, predicted_sl,
+            actual_open, actual_high, actual_low, actual_close, actual_volume, outcome, reason)
+           VALUES ('2026-01-14', '2026-01-15', 'A.NS', 100, 104, 98, 100, 105, 99, 103, 1000, 'TARGET HIT', 'old')"""
+    )
+    conn.commit()
+    conn.close()
+
+
+def _indexes(table: str) -> set[str]:
+    with database._connect() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,))
+        return {r["name"] for r in cur.fetchall()}
+
+
+def test_fresh_database_reaches_the_latest_version():
+    latest = max(version for version, *_ in database._MIGRATIONS)
+    assert database.get_schema_version() == latest
+    assert database._apply_migrations() == []  # a second init is a no-op
+
+
+def test_migration_versions_are_unique_and_ordered():
+    versions = [version for version, *_ in database._MIGRATIONS]
+    assert versions == sorted(set(versions))
+
+
+def test_chain_upgrades_a_baseline_database_in_place(baseline_db):
+    applied = database._apply_migrations()
+    assert applied == [version for version, *_ in database._MIGRATIONS]
+
+    # The old row survives the predictions rebuilds and belongs to the default book
+    (row,) = database.get_predictions_for_date(date(2026, 1, 15))
+    assert (row["stock"], row["outcome"], row["profile"], row["strategy"]) == (
+        "A.NS", "TARGET HIT", database.DEFAULT_PROFILE, database.DEFAULT_STRATEGY,
+    )
+    assert database.get_rolling_win_rate(5) == 1.0
+    assert {"idx_predictions_target_date_id", "idx_model_metrics_eval_date_id"} <= _indexes("predictions") | _indexes("model_metrics")
+
+    # The widened unique key takes another profile's pick of the same stock
+    database.insert_predictions([prediction("2026-01-15", "A.NS", profile="wide")])
+    assert len(database.get_predictions_for_date(date(2026, 1, 15))) == 2
+    assert database._apply_migrations() == []
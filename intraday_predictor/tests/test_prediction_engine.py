@@ -0,0 +1,45 @@
+from datetime import date
+
+import pandas as pd
+
+import prediction_engine
+from conftest import fake_panel
+from database import get_features, get_prediction_cache, get_predictions_for_date, get_ticker_failures
+
+SESSION = date(2026, 1, 15)
+TICKERS = ["A.NS", "B.NS", "C.NS"]
+
+
+def _feed(monkeypatch, panel):
+    def fetch(ticker, days=60, through=None):
+        df = panel[ticker]
+        return df[df.index <= pd.Timestamp(through)].tail(days)
+
+    monkeypatch.setattr(prediction_engine, "fetch_daily_ohlcv", fetch)
+
+
+def test_features_are_keyed_by_their_bar_and_stale_tickers_skipped(monkeypatch):
+    panel = fake_panel(TICKERS, date(2025, 6, 1), SESSION)
+    panel["A.NS"] = panel["A.NS"][panel["A.NS"].index <= "2026-01-05"]  # halted
+    _feed(monkeypatch, panel)
+
+    rows = prediction_engine.compute_daily_features(SESSION, TICKERS)
+    assert sorted(rows) == ["B.NS", "C.NS"]
+    assert {r["session_date"] for r in rows.values()} == {SESSION.isoformat()}
+    assert sorted(get_features(SESSION)) == ["B.NS", "C.NS"]
+    assert [f["stock"] for f in get_ticker_failures()] == ["A.NS"]
+
+
+def test_provisional_run_stores_nothing(monkeypatch):
+    _feed(monkeypatch, fake_panel(TICKERS, date(2025, 6, 1), SESSION))
+    target = date(2026, 1, 16)
+
+    features = prediction_engine.compute_daily_features(SESSION, TICKERS, provisional=True)
+    assert sorted(features) == TICKERS
+    picks = prediction_engine.generate_profile_predictions(
+        target, SESSION, features=features, provisional=True
+    )
+    assert "default" in picks
+    assert get_features(SESSION) == {}
+    assert get_predictions_for_date(target) == []
+    assert get_prediction_cache(target) is None
@@ -0,0 +1,25 @@
+import json
+import os
+import subprocess
+import sys
+
+import database
+
+
+def _snapshot(pid: int, calls: int) -> dict:
+    stats = {"calls": calls, "errors": 0, "rows": calls, "total_ms": 1.0, "max_ms": 1.0,
+             "buckets": [calls] + [0] * len(database.QUERY_BUCKETS_MS)}
+    return {"pid": pid, "since": "2026-01-01 00:00:00", "statements": {"SELECT 1": stats}, "slow": []}
+
+
+def test_snapshots_of_exited_processes_are_dropped(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_STATS_DIR", tmp_path)
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    (tmp_path / f"{dead.pid}-dead.json").write_text(json.dumps(_snapshot(dead.pid, 7)))
+    (tmp_path / f"{os.getppid()}-live.json").write_text(json.dumps(_snapshot(os.getppid(), 3)))
+
+    stats = database.get_query_stats()
+    select = [s for s in stats["statements"] if s["statement"] == "SELECT 1"]
+    assert select and select[0]["calls"] == 3
+    assert not (tmp_path / f"{dead.pid}-dead.json").exists()
@@ -0,0 +1,89 @@
+import pytest
+
+import database
+import performance_analyzer
+import retrainer
+
+
+def test_enqueue_returns_the_pending_job():
+    first = database.enqueue_retrain("win rate low")
+    assert database.enqueue_retrain("still low") == first
+
+    job = database.claim_retrain_job()
+    assert job["id"] == first
+    # Once it runs, a new request queues a new job
+    assert database.enqueue_retrain("low again") != first
+
+
+def test_claim_and_finish():
+    job_id = database.enqueue_retrain("test")
+    assert database.claim_retrain_job()["id"] == job_id
+    assert database.claim_retrain_job() is None  # nothing else pending
+
+    database.finish_retrain_job(job_id, "done", result={"status": "unchanged"})
+    (job,) = database.get_retrain_jobs()
+    assert (job["status"], job["result"]) == ("done", {"status": "unchanged"})
+    assert job["finished_at"] is not None
+
+
+def test_stale_running_job_is_failed_on_the_next_claim():
+    job_id = database.enqueue_retrain("test")
+    database.claim_retrain_job()
+    with database._connect() as conn:
+        conn.cursor().execute("UPDATE retrain_jobs SET started_at = '2000-01-01 00:00:00.000000' WHERE id = ?", (job_id,))
+
+    assert database.claim_retrain_job() is None
+    (job,) = database.get_retrain_jobs()
+    assert job["status"] == "failed"
+    assert "presumed dead" in job["error"]
+
+
+def test_process_queue_records_results_and_failures(monkeypatch):
+    outcomes = iter([{"status": "published", "version": 2}, RuntimeError("no history")])
+
+    def retrain():
+        result = next(outcomes)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(retrainer, "retrain_model", retrain)
+    database.enqueue_retrain("first")
+    database.enqueue_retrain("first again")
+
+    assert retrainer.process_retrain_queue() == 1
+    jobs = {j["reason"]: j for j in database.get_retrain_jobs()}
+    assert jobs["first"]["status"] == "done"
+    assert jobs["first"]["result"] == {"status": "published", "version": 2}
+
+    database.enqueue_retrain("second")
+    assert retrainer.process_retrain_queue() == 1
+    jobs = {j["reason"]: j for j in database.get_retrain_jobs()}
+    assert (jobs["second"]["status"], jobs["second"]["error"]) == ("failed", "no history")
+
+
+def test_publish_merges_and_versions_params():
+    before = database.get_all_model_params()
+    start = database.get_model_params_version()["version"]
+
+    version = database.publish_model_params({"atr_multiplier": 1.8}, source="test", metrics={"oos_win_rate": 0.5})
+    assert version == start + 1
+    after = database.get_all_model_params()
+    assert after["atr_multiplier"] == 1.8
+    assert {k: v for k, v in after.items() if k != "atr_multiplier"} == {
+        k: v for k, v in before.items() if k != "atr_multiplier"
+    }
+    live = database.get_model_params_version()
+    assert (live["version"], live["source"], live["metrics"]) == (version, "test", {"oos_win_rate": 0.5})
+    assert live["params"]["atr_multiplier"] == 1.8
+
+
+def test_analysis_queues_the_retrain_instead_of_running_it(monkeypatch):
+    monkeypatch.setattr(retrainer, "retrain_model", lambda: pytest.fail("retrain ran on the analysis path"))
+    degraded = {"win_rate": 0.1, "sessions": 20, "ci_low": 0.05, "ci_high": 0.15, "prob_below": 1.0}
+    assert performance_analyzer._check_and_retrain(0.1, degraded)
+    assert performance_analyzer._check_and_retrain(0.1, degraded)  # the pending job absorbs a repeat
+    assert [j["status"] for j in database.get_retrain_jobs()] == ["pending"]
+
+    too_few = {**degraded, "sessions": 2}
+    assert not performance_analyzer._check_and_retrain(0.1, too_few)
@@ -0,0 +1,64 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+import retrainer
+from performance_analyzer import _simulate_outcome
+
+LIVE = (1.5, 2.0)
+
+
+def _rows(sessions: int, per_session: int = 5, seed: int = 7) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    rows = []
+    for s in range(sessions):
+        day = (date(2025, 1, 1) + timedelta(days=s)).isoformat()
+        for _ in range(per_session):
+            entry = float(rng.uniform(100, 200))
+            atr = float(rng.uniform(1, 4))
+            rows.append({
+                "id": len(rows) + 1,
+                "target_date": day,
+                "predicted_entry": entry,
+                "predicted_sl": entry - LIVE[0] * atr,
+                "atr": atr if rng.random() > 0.2 else None,  # some rows predate the atr column
+                "actual_high": entry + float(rng.uniform(-2, 12)),
+                "actual_low": entry - float(rng.uniform(0, 8)),
+            })
+    return rows
+
+
+def test_simulate_wins_matches_the_scalar_classifier():
+    rows = _rows(12)
+    arrays = retrainer.build_arrays(rows, LIVE[0], LIVE)
+    wins = retrainer.simulate_wins(arrays, slice(0, len(rows)))
+    ordered = sorted(rows, key=lambda r: (r["target_date"], r["id"]))
+    for p, (atr_mult, rr) in enumerate(arrays["pairs"]):
+        expected = [
+            _simulate_outcome(
+                r["predicted_entry"], r["predicted_sl"], 0.0, r["actual_high"], r["actual_low"],
+                atr_mult, rr, LIVE[0], r["atr"],
+            ) == "TARGET HIT"
+            for r in ordered
+        ]
+        assert list(wins[p]) == expected
+
+
+def test_walk_forward_folds_tile_the_history_newest_first():
+    folds = retrainer.walk_forward_folds(100, train=40, test=10)
+    assert folds[0] == (50, 90, 100)
+    assert folds[-1] == (0, 40, 50)
+    assert all(a[1] - b[1] == 10 for a, b in zip(folds, folds[1:]))
+    assert retrainer.walk_forward_folds(49, train=40, test=10) == []
+
+
+def test_parallel_cross_validation_matches_serial():
+    arrays = retrainer.build_arrays(_rows(70), LIVE[0], LIVE)
+    folds = retrainer.walk_forward_folds(len(arrays["dates"]), train=40, test=10)
+    serial = retrainer.cross_validate(arrays, folds, workers=1, budget=60)
+    parallel = retrainer.cross_validate(arrays, folds, workers=2, budget=60)
+    assert len(serial) == len(parallel) == len(folds)
+    for a, b in zip(serial, parallel):
+        assert a["fold"] == b["fold"]
+        assert np.array_equal(a["train_wins"], b["train_wins"])
+        assert np.array_equal(a["test_wins"], b["test_wins"])
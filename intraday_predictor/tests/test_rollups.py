@@ -0,0 +1,57 @@
+from datetime import date
+
+import email_notifier
+from conftest import prediction
+from database import (
+    ROLLUP_SCOPE_ALL,
+    get_performance_rollups,
+    get_predictions_for_date,
+    get_rolling_win_rate,
+    insert_predictions,
+    rebuild_performance_rollups,
+    update_prediction_outcome,
+)
+from trading_calendar import sessions_between
+
+ACTUALS = {"open": 100.0, "high": 105.0, "low": 97.0, "close": 101.0}
+OUTCOMES = ["TARGET HIT", "STOP LOSS HIT", "NO ENTRY", "STAGNANT"]
+
+
+def _resolve_sessions(n: int):
+    sessions = sessions_between(date(2026, 1, 1), date(2026, 4, 30))[:n]
+    for i, day in enumerate(sessions):
+        insert_predictions([
+            prediction(day.isoformat(), "A.NS"),
+            prediction(day.isoformat(), "B.NS"),
+            prediction(day.isoformat(), "C.NS", profile="wide"),
+        ])
+        for j, p in enumerate(get_predictions_for_date(day)):
+            update_prediction_outcome(p["id"], ACTUALS, OUTCOMES[(i + j) % len(OUTCOMES)], "test")
+    return sessions
+
+
+def _rollups() -> list[tuple]:
+    keys = ("scope", "window_days", "target_hit", "sl_hit", "no_entry", "stagnant", "total", "win_rate", "as_of")
+    return [tuple(r[k] for k in keys) for r in get_performance_rollups()]
+
+
+def test_incremental_rollups_match_a_rebuild():
+    _resolve_sessions(25)
+    # A corrected outcome moves a trade from one bucket to another
+    first = get_predictions_for_date(date(2026, 1, 1))[0]
+    update_prediction_outcome(first["id"], ACTUALS, "TARGET HIT", "corrected")
+
+    incremental = _rollups()
+    rebuild_performance_rollups()
+    assert incremental == _rollups()
+    # The rollups follow the default profile only
+    assert {r[0] for r in incremental} == {"A.NS", "B.NS", ROLLUP_SCOPE_ALL}
+
+
+def test_analysis_email_reads_the_rollups():
+    _resolve_sessions(6)
+    five = get_rolling_win_rate(5)
+    assert five is not None
+    html = email_notifier._rolling_html(None)
+    assert f"5d {five:.0%}" in html
+    assert email_notifier._rolling_html("wide") == ""
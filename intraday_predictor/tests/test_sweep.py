@@ -0,0 +1,97 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+import sweep
+from conftest import fake_panel
+from performance_analyzer import _classify_outcome
+from prediction_engine import MIN_HISTORY, SCORE_WEIGHTS, _compute_indicators, _levels_from_indicators, _score_signals
+
+TICKERS = [f"T{i}.NS" for i in range(6)]
+BASE = {
+    "weights": dict(SCORE_WEIGHTS),
+    "score_threshold": 3.0,
+    "prediction_count": 3,
+    "atr_multiplier": 1.5,
+    "risk_reward_ratio": 2.0,
+}
+
+
+@pytest.fixture(scope="module")
+def panel():
+    return fake_panel(TICKERS, date(2025, 1, 1), date(2025, 12, 31), seed=7)
+
+
+@pytest.fixture(scope="module")
+def arrays(panel):
+    return sweep.build_arrays(panel)
+
+
+def _reference(point: dict, panel) -> dict:
+    """The same backtest one day and one ticker at a time, through the live scoring and outcome code."""
+    frames = {}
+    for t, df in panel.items():
+        ind = _compute_indicators(df)
+        sig = _score_signals(ind)
+        score = sum(point["weights"][r] * sig[r].astype(float) for r in SCORE_WEIGHTS)
+        frames[t] = (df, ind, score)
+    outcomes = []
+    for i in range(len(next(iter(panel.values()))) - 1):
+        day = []
+        for t, (df, ind, score) in frames.items():
+            row = ind.iloc[i]
+            if i + 1 < MIN_HISTORY or np.isnan(row["rsi"]) or np.isnan(row["atr"]) or row["atr"] == 0:
+                continue
+            if score.iloc[i] > point["score_threshold"]:
+                day.append((score.iloc[i], t))
+        # Highest score first; ties keep ticker order, as the stable argsort does
+        day.sort(key=lambda s: -s[0])
+        for _, t in day[: point["prediction_count"]]:
+            df, ind, _ = frames[t]
+            levels = _levels_from_indicators(ind.iloc[i], point["atr_multiplier"], point["risk_reward_ratio"])
+            nxt = {"high": df["High"].iloc[i + 1], "low": df["Low"].iloc[i + 1]}
+            outcomes.append(_classify_outcome(levels["entry"], levels["target"], levels["sl"], nxt))
+    return {
+        "trades": len(outcomes),
+        "wins": outcomes.count("TARGET HIT"),
+        "sl_hits": outcomes.count("STOP LOSS HIT"),
+        "no_entry": outcomes.count("NO ENTRY"),
+    }
+
+
+@pytest.mark.parametrize("overrides", [{}, {"score_threshold": 5.0, "prediction_count": 2}, {"atr_multiplier": 0.8, "risk_reward_ratio": 1.2}])
+def test_vectorized_backtest_matches_the_live_outcome_rules(panel, arrays, overrides):
+    point = {**BASE, **overrides}
+    result = sweep.evaluate(point, arrays, slice(None))
+    assert result["trades"] > 0
+    assert {k: result[k] for k in ("trades", "wins", "sl_hits", "no_entry")} == _reference(point, panel)
+
+
+def test_expand_space_grid_and_samples():
+    space = {"score_threshold": [3, 4], "weights.volume_surge": [1, 2, 3]}
+    grid = sweep.expand_space(space, BASE)
+    assert len(grid) == 6
+    assert {(p["score_threshold"], p["weights"]["volume_surge"]) for p in grid} == {(s, w) for s in (3, 4) for w in (1, 2, 3)}
+    assert BASE["weights"]["volume_surge"] == SCORE_WEIGHTS["volume_surge"]  # base is not mutated
+
+    sampled = sweep.expand_space(space, BASE, samples=4, seed=1)
+    assert len(sampled) <= 4
+    assert len({(p["score_threshold"], p["weights"]["volume_surge"]) for p in sampled}) == len(sampled)
+
+    with pytest.raises(ValueError):
+        sweep.expand_space({"weights.no_such_rule": [1]}, BASE)
+
+
+def test_successive_halving_ranks_survivors_on_the_full_range(arrays):
+    points = sweep.expand_space({"score_threshold": [2, 3, 4, 5, 6], "atr_multiplier": [1.0, 2.0]}, BASE)
+    rows = sweep.run_sweep(arrays, points, workers=2, eta=2, rungs=3, min_trades=1)
+    assert [r["rank"] for r in rows] == list(range(1, len(points) + 1))
+
+    n_days = arrays["valid"].shape[0]
+    finalists = [r for r in rows if r["rung"] == 2]
+    assert finalists and all(r["sessions"] == n_days for r in finalists)
+    assert rows[: len(finalists)] == finalists
+    best = rows[0]
+    point = next(p for p in points if (p["score_threshold"], p["atr_multiplier"]) == (best["score_threshold"], best["atr_multiplier"]))
+    assert best["win_rate"] == sweep.evaluate(point, arrays, slice(None))["win_rate"]
@@ -0,0 +1,123 @@
+"""
+NSE trading calendar.
+
+Sessions are precomputed once as a sorted numpy array (weekdays minus the
+exchange holidays listed in HOLIDAY_FILE), so next/previous lookups are a
+binary search and lookback offsets for many dates are one vectorized
+searchsorted call.
+"""
+import logging
+from datetime import date, datetime, time as dtime
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pytz
+
+from config import CALENDAR_END_YEAR, CALENDAR_START_YEAR, HOLIDAY_FILE, MARKET_CLOSE, TIMEZONE
+
+logger = logging.getLogger(__name__)
+
+IST = pytz.timezone(TIMEZONE)
+
+_SESSIONS: np.ndarray | None = None
+
+
+def _load_holidays(path: Path) -> list[date]:
+    if not path.exists():
+        logger.warning(f"Holiday file {path} not found — only weekends will be skipped.")
+        return []
+    holidays = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        holidays.append(date.fromisoformat(line.split()[0]))
+    return holidays
+
+
+def _build_sessions() -> np.ndarray:
+    start = np.datetime64(f"{CALENDAR_START_YEAR}-01-01", "D")
+    end = np.datetime64(f"{CALENDAR_END_YEAR + 1}-01-01", "D")
+    days = np.arange(start, end, dtype="datetime64[D]")
+    weekdays = np.is_busday(days)  # Mon–Fri
+    holidays = np.array(_load_holidays(HOLIDAY_FILE), dtype="datetime64[D]")
+    return days[weekdays & ~np.isin(days, holidays)]
+
+
+def sessions() -> np.ndarray:
+    """Sorted datetime64[D] array of every trading session in the calendar range."""
+    global _SESSIONS
+    if _SESSIONS is None:
+        _SESSIONS = _build_sessions()
+    return _SESSIONS
+
+
+def reload():
+    """Drop the cached sessions so the holiday file is read again."""
+    global _SESSIONS
+    _SESSIONS = None
+
+
+def _index(d: date, side: str) -> int:
+    return int(np.searchsorted(sessions(), np.datetime64(d, "D"), side=side))
+
+
+def _to_date(value: np.datetime64) -> date:
+    return value.astype("datetime64[D]").item()
+
+
+def is_session(d: date) -> bool:
+    """True if the exchange is open on d."""
+    s = sessions()
+    idx = _index(d, "left")
+    return idx < len(s) and s[idx] == np.datetime64(d, "D")
+
+
+def session_closed(d: date, now: datetime | None = None) -> bool:
+    """Whether d's market close (IST) has passed."""
+    now = now or datetime.now(IST)
+    return now >= IST.localize(datetime.combine(d, dtime(*MARKET_CLOSE)))
+
+
+def next_session(d: date) -> date:
+    """First session strictly after d."""
+    s = sessions()
+    idx = _index(d, "right")
+    if idx >= len(s):
+        raise ValueError(f"{d} is beyond the trading calendar (ends {CALENDAR_END_YEAR})")
+    return _to_date(s[idx])
+
+
+def prev_session(d: date) -> date:
+    """Last session strictly before d."""
+    s = sessions()
+    idx = _index(d, "left") - 1
+    if idx < 0:
+        raise ValueError(f"{d} is before the trading calendar (starts {CALENDAR_START_YEAR})")
+    return _to_date(s[idx])
+
+
+def sessions_back(dates: Iterable[date] | date, n: int) -> np.ndarray | date:
+    """
+    The session n sessions before each date (n=1 is the previous session).
+
+    Accepts a single date or any iterable of dates; the iterable form is one
+    vectorized lookup and returns a datetime64[D] array.
+    """
+    s = sessions()
+    single = isinstance(dates, date)
+    arr = np.array([dates] if single else list(dates), dtype="datetime64[D]")
+    idx = np.searchsorted(s, arr, side="left") - n
+    if (idx < 0).any():
+        raise ValueError(f"Lookback of {n} sessions runs before the calendar start ({CALENDAR_START_YEAR})")
+    out = s[idx]
+    return _to_date(out[0]) if single else out
+
+
+def sessions_between(start: date, end: date) -> list[date]:
+    """All sessions with start <= session <= end."""
+    s = sessions()
+    lo = _index(start, "left")
+    hi = _index(end, "right")
+    return [_to_date(v) for v in s[lo:hi]]
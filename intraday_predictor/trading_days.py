@@ -1,18 +1,14 @@
-"""Trading-day helpers: next/previous weekday (Mon–Fri)."""
-from datetime import date, timedelta
+"""Trading-day helpers: next/previous NSE session (weekends and exchange holidays skipped)."""
+from datetime import date
+
+from trading_calendar import next_session, prev_session
 
 
 def next_trading_day(from_date: date) -> date:
-    """Return the next weekday (Mon–Fri) after from_date."""
-    nxt = from_date + timedelta(days=1)
-    while nxt.weekday() >= 5:  # Sat=5, Sun=6
-        nxt += timedelta(days=1)
-    return nxt
+    """Return the next trading session after from_date."""
+    return next_session(from_date)
 
 
 def prev_trading_day(from_date: date) -> date:
-    """Return the most recent weekday (Mon–Fri) before from_date."""
-    prev = from_date - timedelta(days=1)
-    while prev.weekday() >= 5:
-        prev -= timedelta(days=1)
-    return prev
+    """Return the most recent trading session before from_date."""
+    return prev_session(from_date)
@@ -8,17 +8,23 @@ import logging
 import pandas as pd
 
 from data_fetcher import fetch_daily_ohlcv, fetch_intraday_ohlcv
+from database import get_features
 
 logger = logging.getLogger(__name__)
 
 
-def _volume_context(ticker: str, actual_volume: int) -> str:
+def _volume_context(
+    ticker: str, actual_volume: int, history: pd.DataFrame | None = None, features: dict | None = None
+) -> str:
     """Compare today's volume to the 20-day average."""
-    df = fetch_daily_ohlcv(ticker, days=25)
-    if df.empty or len(df) < 20:
-        return "average volume"
+    if features and features.get("vol_sma20") is not None:
+        avg_vol = features["vol_sma20"]
+    else:
+        df = fetch_daily_ohlcv(ticker, days=25) if history is None else history.tail(25)
+        if df.empty or len(df) < 20:
+            return "average volume"
+        avg_vol = df["Volume"].tail(20).mean()
 
-    avg_vol = df["Volume"].tail(20).mean()
     if avg_vol == 0:
         return "average volume"
 
@@ -34,17 +40,21 @@ def _volume_context(ticker: str, actual_volume: int) -> str:
     return "average volume"
 
 
-def _trend_context(ticker: str) -> str:
+def _trend_context(ticker: str, history: pd.DataFrame | None = None, features: dict | None = None) -> str:
     """Determine short-term trend from the 9-EMA vs 21-EMA relationship."""
-    df = fetch_daily_ohlcv(ticker, days=30)
-    if df.empty or len(df) < 21:
-        return "indeterminate trend"
+    if features and None not in (features.get("ema9"), features.get("ema21"), features.get("ema_gap_prev")):
+        latest_gap = features["ema9"] - features["ema21"]
+        prev_gap = features["ema_gap_prev"]
+    else:
+        df = fetch_daily_ohlcv(ticker, days=30) if history is None else history.tail(30)
+        if df.empty or len(df) < 21:
+            return "indeterminate trend"
 
-    ema9 = df["Close"].ewm(span=9, adjust=False).mean()
-    ema21 = df["Close"].ewm(span=21, adjust=False).mean()
+        ema9 = df["Close"].ewm(span=9, adjust=False).mean()
+        ema21 = df["Close"].ewm(span=21, adjust=False).mean()
 
-    latest_gap = ema9.iloc[-1] - ema21.iloc[-1]
-    prev_gap = ema9.iloc[-2] - ema21.iloc[-2]
+        latest_gap = ema9.iloc[-1] - ema21.iloc[-1]
+        prev_gap = ema9.iloc[-2] - ema21.iloc[-2]
 
     if latest_gap > 0 and prev_gap > 0 and latest_gap > prev_gap:
         return "strong uptrend (EMA9 widening above EMA21)"
@@ -82,10 +92,24 @@ def generate_reason(
     predicted_sl: float,
     actuals: dict,
     target_date,
+    history: pd.DataFrame | None = None,
+    intraday: bool = True,
+    features: dict | None = None,
 ) -> str:
-    vol_ctx = _volume_context(ticker, actuals.get("volume", 0))
-    trend_ctx = _trend_context(ticker)
-    intraday_note = _intraday_pattern(ticker, target_date)
+    """
+    history: daily bars before target_date, when the caller already has them
+             (skips the per-ticker downloads).
+    intraday: set False to skip the 15m pattern check, e.g. for dates older
+              than Yahoo's intraday retention.
+    features: the stored feature row for (target_date, ticker); looked up in
+              the feature store when neither it nor history is given, and
+              the bars are downloaded only if the store has no row.
+    """
+    if features is None and history is None:
+        features = get_features(target_date, [ticker]).get(ticker)
+    vol_ctx = _volume_context(ticker, actuals.get("volume", 0), history, features)
+    trend_ctx = _trend_context(ticker, history, features)
+    intraday_note = _intraday_pattern(ticker, target_date) if intraday else ""
 
     if outcome == "NO ENTRY":
         gap = round(predicted_entry - actuals["high"], 2)
@@ -0,0 +1,9 @@
+"""
+WSGI entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app      # Linux / macOS
+    waitress-serve --port=5000 wsgi:app        # Windows
+"""
+from app import create_app
+
+app = create_app()